@@ -5,8 +5,25 @@ import io
 from datetime import datetime, date, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import calendar
 import os
+import time
+from idp_data import (EXCEL_FILE, MINS_FILE, SEASON_FILE, EVENTS_FILE, IMAGES_FOLDER, player_id_for, read_training_log,
+                      load_bios, load_availability, load_season_data, load_player_events, load_player_matches, load_form_series,
+                      load_hex_counts, load_event_bitmaps, load_match_teams, load_comp_data, load_comparison_ratings, load_metric_distributions, load_squad_ratings, load_card_metrics, load_image_manifest, cached, cached_on_disk, cache_info, clear_cache, calculate_age, season_overview)
+from idp_bitmaps import PRESETS, describe, flag_labels
+from idp_form import FORM_RATINGS, FORM_WINDOWS
+from idp_maps import CARD_OPTIONS
+from idp_pitch import HEX_MAP_VIEWS, MAP_BACKEND, card_map, figure_png, hex_map, mpl_hex_map
+from idp_ratings import ALL_RATINGS, POSITION_RATINGS, position_minutes, ratings_for_positions
+from idp_training import TRAINING_COLUMNS, TrainingCalendar, TrainingSearch, TrainingVocabulary, VOCABULARY_ORDERS, training_index
+import idp_api
+import idp_import
+import idp_memory
+import idp_prefetch
+import idp_watch
+import idp_training
 
 # Set page config
 st.set_page_config(
@@ -15,106 +32,437 @@ st.set_page_config(
     layout="wide"
 )
 
-player_id_matching = {
-   
-    'Courtney Petersen': 49057,
-    'Lauren Milliet': 33367,
-
-    
-    'Arin Wright': 4942,
-    'Ellie Jean': 62960,
-    'Angela Baron': 403272,
-    'Elli Pikkujamsa': 225161,
-    'Allie George': 451020,
-
-    'Taylor Flint': 428578,
-    'Avery Kalitta': 454905,
-    'Marisa DiGrande': 30524,
-    'Ary Borges': 389488,
-    "Katie O'Kane": 469677,
-    "Jordan Baggett": 30652,
-
-    
-    'Ella Hase': 453203,
-
-    'Janine Sonis': 4992,
-    'Emma Sears': 428576,
-    'Sarah Weber': 454724,
-    'Kayla Fischer': 389487,
-    'Savannah DeMelo': 218506,
-    'Uchenna Kanu': 25461
-
-}
-
-
-# File path for the Excel workbook
-EXCEL_FILE = "MitchIDPs.xlsx"
-df2 = pd.read_excel(EXCEL_FILE, sheet_name = 'Player Bios')
+df2 = load_bios()
+
+
+@st.cache_resource
+def start_api_server():
+    """Serve the JSON API from this process when IDP_API_PORT is set, sharing its caches"""
+    port = os.environ.get('IDP_API_PORT')
+    if port:
+        return idp_api.start_in_background(os.environ.get('IDP_API_HOST', '127.0.0.1'), int(port))
+
+
+@st.cache_resource
+def start_watcher():
+    """Refresh the caches in this process when the data files change, unless IDP_WATCH=0"""
+    if idp_watch.WATCH_ENABLED:
+        return idp_watch.start_watcher()
+
+
+def player_page_steps(page):
+    """The cold work of a player page with its default controls, for the prefetcher (one yield per step)"""
+    raw_player_name = page.removeprefix("👤").strip()
+    sb_player_id = player_id_for(raw_player_name)
+    player_mins = season_overview(raw_player_name)['Minutes']
+    minutes_by_position = {} if sb_player_id is None else position_minutes(load_season_data(), sb_player_id)
+    yield 'overview'
+    if sb_player_id is None:
+        return
+
+    if player_mins > 100 and minutes_by_position:
+        positions = [next(iter(minutes_by_position))]
+        comp_data = load_comp_data(positions, sb_player_id)
+        # from here the page keys its maps by the season-file minutes of the radar, not Racing Mins
+        player_mins = comp_data[comp_data['player_id'] == sb_player_id].iloc[0].get('Minutes', 0)
+        yield 'radar'
+        cached(('metric_strips', tuple(positions), sb_player_id), [SEASON_FILE],
+               lambda: create_metric_strips(load_metric_distributions(positions), sb_player_id, raw_player_name))
+        yield 'metric strips'
+        load_form_series().rolling(sb_player_id, 5)
+        yield 'form'
+
+    load_player_matches(sb_player_id)
+    load_player_events(sb_player_id)
+    load_card_metrics(sb_player_id, player_mins)
+    yield 'card metrics'
+    if MAP_BACKEND != 'plotly':
+        hex_map_png('Touches', sb_player_id, player_mins, HEX_MAP_VIEWS[0])
+        yield 'touch map'
+
+
+@st.cache_resource
+def start_prefetcher():
+    """Warm the next player pages in the background while one is shown, unless IDP_PREFETCH=0"""
+    if idp_prefetch.PREFETCH_ENABLED:
+        return idp_prefetch.Prefetcher(player_page_steps)
 
 
 def load_data():
     """Load data from Excel file, create sample data if file doesn't exist"""
     if os.path.exists(EXCEL_FILE):
-        df = pd.read_excel(EXCEL_FILE, sheet_name = 'Sheet1')
-
-        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', dayfirst=False)
-        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
-        
-
-        return df
+        return read_training_log(EXCEL_FILE)
 
-def save_data(df):
-    """Save data to Excel file"""
+def add_training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id=None):
+    """Add a new training entry to the data - returns True/False for success"""
     try:
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Sheet1', index=False)
-            df2.to_excel(writer, sheet_name='Player Bios', index=False)
-        
-            #df.to_excel(EXCEL_FILE, index=False)
+        idp_training.add_training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id)
         return True
     except Exception as e:
         st.error(f"Error saving data: {e}")
         return False
 
-def add_training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id=None):
-    """Add a new training entry to the data - returns True/False for success"""
-    df = load_data()
-    
-    if session_id is None:
-        if 'Session_ID' in df.columns and not df.empty:
-            # Get the highest existing session ID and add 1
-            session_id = df['Session_ID'].max() + 1
-        else:
-            # First entry or no Session_ID column exists
-            session_id = 1
-
-    new_entry = {
-        "Player": player_name,
-        "Type": training_type,
-        "Detail": training_detail,
-        "Date": training_date.strftime("%Y-%m-%d"),
-        "Coach": coach_name,
-        "Notes": notes,
-        "Session_ID": session_id
-    }
-    
-    # Add new entry to DataFrame
-    new_row = pd.DataFrame([new_entry])
-    df = pd.concat([df, new_row], ignore_index=True)
-    
-    # Sort by date (newest first)
-    df = df.sort_values("Date", ascending=False)
-    
-    # Save to Excel and return result
-    return save_data(df)
-
 
+def add_group_session(player_names, training_type, training_detail, training_date, coach_name, notes):
+    """Add one entry per player under a shared session ID - returns the number saved"""
+    entries = [idp_training.training_entry(player, training_type, training_detail, training_date, coach_name, notes)
+               for player in player_names]
+    try:
+        idp_training.add_training_entries(entries)
+        return len(entries)
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+        return 0
 
 
 def remove_entry(df, index_to_remove):
     """Remove an entry from the dataframe"""
-    df = df.drop(index=index_to_remove).reset_index(drop=True)
-    return save_data(df)
+    try:
+        return idp_training.remove_training_entry(df.loc[index_to_remove].to_dict())
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+        return False
+
+
+def create_form_trend_chart(trend, n):
+    """Create a line chart of the form ratings over the trailing n-match window"""
+    fig = go.Figure()
+    for rating in FORM_RATINGS:
+        fig.add_trace(go.Scatter(
+            x=trend['Match'],
+            y=trend[rating].round(1),
+            mode='lines+markers',
+            name=rating,
+        ))
+
+    fig.update_layout(
+        title=f"Form Ratings (last {n} matches)",
+        yaxis=dict(range=[0, 100], title='Percentile'),
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white', size=14),
+        height=450,
+    )
+    return fig
+
+
+def create_calendar_heatmap(days, counts, title_text):
+    """Create a calendar heatmap (weekday x week) of sessions per day"""
+    lead = pd.Timestamp(days[0]).weekday()
+    grid = np.r_[np.full(lead, np.nan), counts.astype(float)]
+    grid = np.r_[grid, np.full(-len(grid) % 7, np.nan)].reshape(-1, 7).T
+    week_starts = days[0] - lead + 7 * np.arange(grid.shape[1])
+
+    fig = go.Figure(go.Heatmap(
+        z=grid,
+        x=pd.to_datetime(week_starts),
+        y=['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+        colorscale=[[0, '#2a0a2a'], [1, '#c03a1d']],
+        xgap=2, ygap=2,
+        hoverongaps=False,
+        hovertemplate='Week of %{x|%Y-%m-%d} %{y}: %{z} sessions<extra></extra>',
+    ))
+    fig.update_layout(
+        title=title_text,
+        yaxis=dict(autorange='reversed'),
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white'),
+        height=260,
+        margin=dict(l=40, r=20, t=50, b=30)
+    )
+    return fig
+
+
+def create_squad_calendar_heatmap(days, players, counts, title_text):
+    """Create a player x day heatmap of sessions for the whole squad"""
+    fig = go.Figure(go.Heatmap(
+        z=counts.T,
+        x=pd.to_datetime(days),
+        y=players,
+        colorscale=[[0, '#2a0a2a'], [1, '#c03a1d']],
+        ygap=1,
+        hovertemplate='%{y} %{x|%Y-%m-%d}: %{z} sessions<extra></extra>',
+    ))
+    fig.update_layout(
+        title=title_text,
+        yaxis=dict(autorange='reversed'),
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white'),
+        height=max(300, 22 * len(players)),
+    )
+    return fig
+
+
+def map_hex_counts(player_id, match_ids=None):
+    """League hex counts, with the player's own counts from only `match_ids` when given"""
+    if match_ids is None:
+        return load_hex_counts()
+    return load_hex_counts().for_events(player_id, load_player_events(player_id, match_ids))
+
+
+def hex_map_png(layer, player_id, player_mins, view, match_ids=None):
+    """Rendered hex map, shared with other server processes through the on-disk result cache"""
+    if match_ids is None:
+        return cached_on_disk(('hex_map', layer, player_id, player_mins, view), [EVENTS_FILE, MINS_FILE],
+                              lambda: figure_png(mpl_hex_map(load_hex_counts(), layer, player_id, player_mins, view)))
+    match_ids = tuple(sorted(match_ids))
+    return cached(('hex_map', layer, player_id, player_mins, view, match_ids), [EVENTS_FILE, MINS_FILE],
+                  lambda: figure_png(mpl_hex_map(map_hex_counts(player_id, match_ids), layer, player_id, player_mins, view)))
+
+
+def show_card_map(card, events):
+    """Draw a card's pitch map with the deployment's map backend"""
+    if MAP_BACKEND == 'plotly':
+        st.plotly_chart(card_map(card, events, load_match_teams()), width='stretch')
+    else:
+        import matplotlib.pyplot as plt
+        fig = card_map(card, events)
+        st.pyplot(fig)
+        plt.close(fig)
+
+
+def show_hex_map(layer, player_id, player_mins, view, match_ids=None):
+    if MAP_BACKEND == 'plotly':
+        st.plotly_chart(hex_map(map_hex_counts(player_id, match_ids), layer, player_id, player_mins, view), width='stretch')
+    else:
+        st.image(hex_map_png(layer, player_id, player_mins, view, match_ids), width='stretch')
+
+
+MAP_SCOPES = ['Season', 'Match', 'Date Range']
+
+
+def match_label(match):
+    date = match['match_date'].strftime('%m/%d') if pd.notna(match['match_date']) else f"Match {match['match_id']}"
+    return f"{date} - {match['Opponent']}" if pd.notna(match['Opponent']) else date
+
+
+def map_matches(raw_player_name, player_id, player_mins):
+    """(match_ids, minutes) the Activity Maps cover: the season (None) or the matches picked above them
+
+    'Match' starts on the match open in the player's Match Reports.
+    """
+    matches = load_player_matches(player_id)
+    if matches.empty:
+        return None, player_mins
+    scope = st.radio("Matches", MAP_SCOPES, horizontal=True, key=f"map_scope_{raw_player_name}")
+    if scope == 'Match':
+        labels = [match_label(match) for _, match in matches.iterrows()][::-1]
+        match_ids = matches['match_id'].tolist()[::-1]
+        report = st.session_state.get(f"match_report_{raw_player_name}")
+        report_ids = [int(image['match_id']) for image in load_image_manifest()
+                      if image['player_name'] == raw_player_name and f"{image['match_date']} - {image['opponent']}" == report]
+        index = match_ids.index(report_ids[0]) if report_ids and report_ids[0] in match_ids else 0
+        selected = [match_ids[labels.index(st.selectbox("Match", labels, index=index))]]
+    elif scope == 'Date Range':
+        dated = matches.dropna(subset=['match_date'])
+        if dated.empty:
+            st.info("No match dates for this player")
+            return None, player_mins
+        first, last = dated['match_date'].min().date(), dated['match_date'].max().date()
+        picked = st.date_input("Dates", value=(first, last), min_value=first, max_value=last, key=f"map_dates_{raw_player_name}")
+        picked = list(picked) if isinstance(picked, (list, tuple)) else [picked]
+        start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[-1])
+        selected = dated.loc[dated['match_date'].between(start, end), 'match_id'].tolist()
+    else:
+        return None, player_mins
+
+    minutes = int(matches.loc[matches['match_id'].isin(selected), 'Minutes'].fillna(0).sum())
+    st.caption(f"{len(selected)} match{'es' if len(selected) != 1 else ''} | {minutes} mins")
+    return selected, minutes
+
+
+MAP_FILTERS = ['All events'] + list(PRESETS) + ['Custom']
+
+
+def map_filter(raw_player_name, player_id, match_ids):
+    """Events the card maps draw: all of them, or those matching a preset or custom flag filter
+
+    Filters are evaluated on the player's precomputed event bitsets (idp_bitmaps),
+    so changing one never scans the events.
+    """
+    choice = st.selectbox("Event filter", MAP_FILTERS, key=f"map_filter_{raw_player_name}")
+    if choice == 'All events':
+        return None
+    bitmaps = load_event_bitmaps()
+    labels = flag_labels(bitmaps.types)
+    if choice == 'Custom':
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            flags = st.multiselect("Flags", [flag for flag in labels if flag in bitmaps.flags],
+                                   format_func=labels.get, key=f"map_flags_{raw_player_name}")
+        with col2:
+            combine = st.radio("Combine", ['Match all', 'Match any'], key=f"map_combine_{raw_player_name}")
+        if not flags:
+            return None
+        spec = ('and' if combine == 'Match all' else 'or', flags)
+    else:
+        spec = PRESETS[choice]
+    events = bitmaps.select(player_id, spec, match_ids)
+    st.caption(f"{len(events)} event{'s' if len(events) != 1 else ''}: {describe(spec, labels)}")
+    return events
+
+
+SQUAD_RADAR_COLUMNS = 4
+
+
+def squad_rating_table(squad):
+    """Player x rating table for the Squad page, with only the ratings on each player's radar filled in"""
+    ratings = [rating for rating in ALL_RATINGS if rating in squad.columns]
+    rows = []
+    for _, player in squad.iterrows():
+        radar = ratings_for_positions([player['Position Group']])
+        row = {'Player': player['Player'], 'Position': player['Position Group'], 'Minutes': int(player['Minutes'])}
+        row.update({rating: player[rating] if rating in radar else np.nan for rating in ratings})
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    return table.dropna(axis=1, how='all')
+
+
+def create_squad_radar_grid(squad):
+    """Small-multiples radar of every squad player's position ratings"""
+    n_rows = max(1, -(-len(squad) // SQUAD_RADAR_COLUMNS))
+    titles = [f"{player['Player']} ({player['Position Group']}, {int(player['Minutes'])} mins)" for _, player in squad.iterrows()]
+    fig = make_subplots(rows=n_rows, cols=SQUAD_RADAR_COLUMNS,
+                        specs=[[{'type': 'polar'}] * SQUAD_RADAR_COLUMNS] * n_rows,
+                        subplot_titles=titles, vertical_spacing=0.3 / n_rows, horizontal_spacing=0.08)
+
+    for i, (_, player) in enumerate(squad.iterrows()):
+        ratings = ratings_for_positions([player['Position Group']])
+        fig.add_trace(go.Scatterpolar(
+            r=[player[rating] for rating in ratings] + [player[ratings[0]]],
+            theta=ratings + [ratings[0]],
+            fill='toself',
+            name=player['Player'],
+            line=dict(color='#00ff00', width=2),
+            fillcolor='rgba(0, 255, 0, 0.3)',
+        ), row=i // SQUAD_RADAR_COLUMNS + 1, col=i % SQUAD_RADAR_COLUMNS + 1)
+
+    fig.update_polars(
+        bgcolor='#200020',
+        radialaxis=dict(visible=True, range=[0, 100], showticklabels=False, gridcolor='white', tickvals=[25, 50, 75, 100]),
+        angularaxis=dict(tickfont=dict(size=9, color='white'), gridcolor='white', linecolor='white'),
+    )
+    fig.update_annotations(font=dict(size=13, color='white'))
+    fig.update_layout(
+        showlegend=False,
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white', size=12),
+        height=340 * n_rows,
+        margin=dict(l=60, r=60, t=60, b=40),
+    )
+    return fig
+
+
+METRIC_STRIP_COLUMNS = 2
+
+
+def metric_text(metric, value):
+    """A raw metric as shown on the strips: ratios as percentages, everything else per 90"""
+    if pd.isna(value):
+        return '-'
+    if metric == 'Top Speed':
+        return f"{value:.1f} km/h"
+    if '%' in metric or 'Conversion' in metric:
+        return f"{100 * value:.0f}%"
+    if metric == 'Average Defensive Action Distance':
+        return f"{value:.1f}m"
+    if metric == 'HI Distance':
+        return f"{value:.0f}m p90"
+    return f"{value:.2f} p90"
+
+
+def ordinal(n):
+    n = int(round(n))
+    return f"{n}{'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')}"
+
+
+def create_metric_strips(distributions, player_id, player_name):
+    """Beeswarm strip of the league pool for each raw metric, with the player highlighted"""
+    metrics = distributions.metrics
+    n_rows = max(1, -(-len(metrics) // METRIC_STRIP_COLUMNS))
+    titles = []
+    for metric in metrics:
+        percentile = distributions.percentile(player_id, metric)
+        titles.append(f"{metric}: {metric_text(metric, distributions.value(player_id, metric))}"
+                      + ('' if pd.isna(percentile) else f" ({ordinal(percentile)} pct)"))
+    fig = make_subplots(rows=n_rows, cols=METRIC_STRIP_COLUMNS, subplot_titles=titles,
+                        vertical_spacing=0.35 / n_rows, horizontal_spacing=0.06)
+
+    for i, metric in enumerate(metrics):
+        values, names = distributions.sorted[metric]
+        row, col = i // METRIC_STRIP_COLUMNS + 1, i % METRIC_STRIP_COLUMNS + 1
+        fig.add_trace(go.Scatter(
+            x=values, y=distributions.offsets[metric],
+            mode='markers',
+            marker=dict(color='rgba(255, 255, 255, 0.45)', size=6),
+            text=[f"{name}: {metric_text(metric, value)}" for name, value in zip(names, values)],
+            hovertemplate='%{text}<extra></extra>',
+        ), row=row, col=col)
+        value = distributions.value(player_id, metric)
+        if pd.notna(value):
+            fig.add_trace(go.Scatter(
+                x=[value], y=[0],
+                mode='markers',
+                marker=dict(color='#c03a1d', size=13, line=dict(color='white', width=1.5)),
+                hovertemplate=f"{player_name}: {metric_text(metric, value)}<extra></extra>",
+            ), row=row, col=col)
+
+    fig.update_xaxes(showgrid=False, zeroline=False, showticklabels=False)
+    fig.update_yaxes(showgrid=False, zeroline=False, showticklabels=False)
+    fig.update_annotations(font=dict(size=13, color='white'))
+    fig.update_layout(
+        showlegend=False,
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white', size=12),
+        height=130 * n_rows + 40,
+        margin=dict(l=20, r=20, t=50, b=20),
+    )
+    return fig
+
+
+def create_availability_grid(availability, players):
+    """Player x match grid of minutes, with starts, sub appearances and unused subs marked"""
+    from idp_availability import CAME_ON, NOT_IN_SQUAD, STARTED, STATUS_LABELS, UNUSED
+    rows = [availability.player_rows[player] for player in players]
+    status, minutes = availability.status[rows], availability.minutes[rows]
+    matches = availability.matches
+    labels = [f"{d.strftime('%m/%d') if pd.notna(d) else match_id} {opponent}"
+              for d, match_id, opponent in zip(matches['match_date'], matches['match_id'], matches['Opponent'])]
+
+    text = np.full(status.shape, '', dtype=object)
+    text[status == STARTED] = minutes[status == STARTED].astype(str)
+    text[status == CAME_ON] = np.char.add('+', minutes[status == CAME_ON].astype(str))
+    text[status == UNUSED] = 'U'
+    text[status == NOT_IN_SQUAD] = '·'
+    hover = np.vectorize(STATUS_LABELS.get, otypes=[object])(status)
+
+    fig = go.Figure(go.Heatmap(
+        z=np.where(status >= CAME_ON, minutes, np.where(status == UNUSED, 0, np.nan)),
+        x=labels,
+        y=players,
+        text=text,
+        texttemplate='%{text}',
+        customdata=hover,
+        colorscale=[[0, '#2a0a2a'], [1, '#c03a1d']],
+        xgap=2, ygap=2,
+        hoverongaps=False,
+        hovertemplate='%{y} | %{x}: %{customdata}, %{z} mins<extra></extra>',
+        colorbar=dict(title='Mins'),
+    ))
+    fig.update_layout(
+        yaxis=dict(autorange='reversed'),
+        xaxis=dict(side='top'),
+        paper_bgcolor='#200020',
+        plot_bgcolor='#200020',
+        font=dict(color='white'),
+        height=max(300, 28 * len(players) + 80),
+        margin=dict(l=40, r=20, t=80, b=20),
+    )
+    return fig
 
 
 def create_training_pie_chart(df_player, col, title_text):
@@ -137,9 +485,6 @@ def display_player_page(player_name, df):
 
     
     raw_player_name = player_name.strip()
-    print("")
-    print(raw_player_name)
-    print("")
     player_row = df2[df2['Player'] == raw_player_name].iloc[0]
     # player_row = df2.loc[df2['Player'] == player_name]
 
@@ -151,14 +496,6 @@ def display_player_page(player_name, df):
     col1, col2, col3 = st.columns([0.45,0.45,0.8 ])
     
 
-    from datetime import datetime
-
-    def calculate_age(dob_str):
-        dob_1 = datetime.strptime(str(dob_str), "%Y.%m.%d")
-        today = datetime.today()
-        age = (today - dob_1).days / 365.25
-        return round(age, 1)
-
     dob = player_row['DOB']
     
     with col1:
@@ -194,252 +531,51 @@ def display_player_page(player_name, df):
     
     
     st.title(f"📈 Season Overview")
-    game_overview = pd.read_parquet("Racing Mins.parquet")
-    
-    poss_matches = game_overview['match_id'].nunique()
-    max_mins_per_match = game_overview.groupby('match_id')['Minutes'].max()
-    poss_mins =  max_mins_per_match.sum()
-
-    player_squad_apps = len(game_overview[(game_overview['Player'] == raw_player_name) & (game_overview['In Squad'] == True)])
-    player_starts = len(game_overview[(game_overview['Player'] == raw_player_name) & (game_overview['Started'] == True)])
-    player_came_on = len(game_overview[(game_overview['Player'] == raw_player_name) & (game_overview['Came On'] == True)])
-    player_apps = player_starts + player_came_on
-    player_mins = sum(game_overview[game_overview['Player'] == raw_player_name]['Minutes'])
-    pct_possible_mins = int((player_mins / poss_mins) * 100)
+    overview = season_overview(raw_player_name)
+    player_mins = overview['Minutes']
     col1, col2, col3, col4, col5 = st.columns(5)
 
-    with col1: st.metric("Made Squad", f"{player_squad_apps}/{poss_matches}")
-    with col2: st.metric("Played", f"{player_apps}")
-    with col3: st.metric("Started", f"{player_starts}")
+    with col1: st.metric("Made Squad", f"{overview['Made Squad']}/{overview['Possible Matches']}")
+    with col2: st.metric("Played", f"{overview['Played']}")
+    with col3: st.metric("Started", f"{overview['Started']}")
     with col4: st.metric("Minutes", f"{player_mins}")
-    with col5: st.metric("% of Mins", f"{pct_possible_mins}%")
-
-    if player_mins > 100:
-        sb_player_id = player_id_matching[raw_player_name]
-        season_data = pd.read_parquet("NWSL2025-AppPlayerSeasonPercentiles.parquet")
-        season_data.drop(['Matches Played','pctDistance','pctRunning Distance','pctHSR Distance','pctCount HSR', 'pctSprinting Distance', 'pctSprint Count', 'pctHI Distance', 'pctHI Count', 'pctMedium Accels','pctHigh Accels','pctMedium Decels', 'pctHigh Decels', 'pctWalking to HSR Count', 'pctWalking to Sprint Count', 'pctMatches Played', 'pctTop Speed', 'pctTime to Sprint', 'pctTime to HSR', 'pctWalking Distance', 'pct% of Distance Walking', 'pct% of Distance HI', 'pct% of Distance Sprinting', 'pct% of HI Distance Sprinting','Speed', 'Intensity', 'Explosiveness','Agility'],axis=1)
-
-        # pos_map = {
-        #     1: 'GK',
-        #     3: 'FB/WB',
-        #     4: 'CB',
-        #     6: 'CM',
-        #     10: 'AM',
-        #     7: 'W',
-        #     9: 'ST'
-
-        # }
-
-        #season_data['Position Group'] = season_data['pos_group'].apply(lambda x: pos_map.get(x, x))
-
-        player_data = season_data[season_data['player_id'] == sb_player_id]
-        #position_minutes = player_data.groupby('Position Group')['Minutes'].sum().to_dict()
-        position_minutes = {k: int(v) for k, v in player_data.groupby('Position Group')['Minutes'].sum().to_dict().items()}
-
-        #position_labels = [f"{position} ({position_minutes[position]} mins)" for position in sorted(player_data['Position Group'].unique())]
-        position_labels = [
-                f"{position} ({position_minutes[position]} mins)" 
-                for position in sorted(player_data['Position Group'].unique(), key=lambda pos: position_minutes[pos], reverse=True)
-        ]
+    with col5: st.metric("% of Mins", f"{overview['% of Mins']}%")
+
+    sb_player_id = player_id_for(raw_player_name)
+    minutes_by_position = {} if sb_player_id is None else position_minutes(load_season_data(), sb_player_id)
+
+    if player_mins > 100 and minutes_by_position:
+        position_labels = [f"{position} ({minutes} mins)" for position, minutes in minutes_by_position.items()]
 
         col1, col2, col3 = st.columns(3)
         with col1:
             positions = st.pills("Select Position(s)", 
-                                position_labels, #sorted(player_data['Position Group'].unique()), 
+                                position_labels,
                                 selection_mode = "multi", default = position_labels[0])
             
             positions = [label.split(' ')[0] for label in positions]
             if positions == []: st.error('Please select at least one position')
-            comp_data = season_data[season_data['Position Group'].isin(positions)].sort_values(by='Minutes',ascending=False)
-            #st.write(positions)
         with col2:
             compare = st.radio('Compare with another player?', ["No", "Yes"])
 
         with col3:
-            if compare == 'Yes': 
-                comp_player_name = st.selectbox('Player', comp_data[comp_data['Player'] != raw_player_name]['Player'].unique())
-            else: comp_player_name = '...'
-        
-        median_mins = np.median(comp_data['Minutes'])
-
-        comp_data = comp_data[(comp_data['player_id'] == sb_player_id) | (comp_data['Player'] == comp_player_name) | (comp_data['Minutes'] > median_mins)]
-        # highlight = comp_data[(comp_data['player_id'] == sb_player_id) | (comp_data['Player'] == comp_player_name)]
-        # #st.write(highlight[['Player', 'pos_group', 'Minutes', 'Top Speed']])
-        special_cols = ['Player', 'pos_group', 'Team', 'Competition', 'Season', 'Minutes', 'Number', 'Foot', 'player_id', 'Position', 'Detailed Position', 'Position Group', 'offline_player_id', 'statsbomb_id']
-        for col in comp_data.columns:
-            if col not in special_cols:#and col not in phys_cols:
-                comp_data[col] = comp_data[col] * comp_data['Minutes']
-
-
-        aggs = {col: 'sum' for col in comp_data.columns if col not in special_cols}
-        aggs['Position Group'] = 'first'
-        aggs['pos_group'] = 'first'
-        aggs['Team'] = 'first'
-        aggs['Competition'] = 'first'
-        aggs['Season'] = 'first'
-        aggs['Minutes'] = 'sum'
-        aggs['Number'] = 'first'
-        aggs['Foot'] = 'first'
-        aggs['player_id'] = 'first'
-        aggs['Position'] = 'first'
-        aggs['Detailed Position'] = 'first'
-        aggs['offline_player_id'] = 'first'
-        aggs['statsbomb_id'] = 'first'
-        
-        
-        phys_cols = [
-                    'Distance','Running Distance', 'HSR Distance', 'Count HSR',
-                    'Sprinting Distance', 'Sprint Count', 'HI Distance', 'HI Count',
-                    'Medium Accels', 'High Accels', 'Medium Decels', 'High Decels',
-                    'Walking to HSR Count', 'Walking to Sprint Count', 
-                    'Top Speed', 'Time to Sprint',
-                    'Time to HSR', 'Walking Distance', '% of Distance Walking',
-                    '% of Distance HI', '% of Distance Sprinting']
-        phys_pct_cols = [
-            'pctDistance',
-                'pctRunning Distance', 'pctHSR Distance',
-            'pctCount HSR', 'pctSprinting Distance', 'pctSprint Count',
-            'pctHI Distance', 'pctHI Count', 'pctMedium Accels', 'pctHigh Accels',
-            'pctMedium Decels', 'pctHigh Decels', 'pctWalking to HSR Count',
-            'pctWalking to Sprint Count', 'pctTop Speed',
-            'pctTime to Sprint', 'pctTime to HSR', 'pctWalking Distance',
-            'pct% of Distance Walking', 'pct% of Distance HI',
-            'pct% of Distance Sprinting', 'pct% of HI Distance Sprinting'
-        ]
-        
-            
-        comp_data = comp_data.groupby('Player').agg(aggs).reset_index()
-        for col in comp_data.columns:
-            if col not in special_cols and col != 'Top Speed':
-                comp_data[col] = comp_data[col] / comp_data['Minutes']    
-                if col not in phys_cols + phys_pct_cols: comp_data[f'pct{col}'] = round(comp_data[col].rank(pct=True) * 100,2)
-                #comp_data[f'pct{col}'].fillna(0)
-        
-        
-        important_metrics = []
-        selected_metrics = []
-
-        comp_data['Shot Stopping'] = (0.05 * comp_data['pctGK Shots on Target Faced']) + (0.1 * comp_data['pctBig Chances Save %']) + (0.7 * comp_data['pctGoals Prevented']) + (0.15 * comp_data['pctGK Save %'])
-        comp_data['Short Distribution'] = (0.15 * comp_data['pctForward Pass %']) + (0.2 * comp_data['pctPressured Pass %']) + (0.65 * comp_data['pctShort Pass %'])
-        comp_data['Long Distribution'] = (0.2 * comp_data['pctProgressive Passes']) + (0.1 * comp_data['pctPasses into Final Third']) +  (0.35 * comp_data['pctLong Passes Completed']) + (0.1 * comp_data['pctPass OBV']) + (0.25 * comp_data['pctLong Pass %'])
-        comp_data['Stepping Out'] = (0.1 * comp_data['pctGK Avg. Distance'])
-        comp_data['Saving Big Chances'] = (0.25 * comp_data['pctBig Chances Faced']) + (0.75 * comp_data['pctBig Chances Save %'] )
-        comp_data['1v1 Saving'] = (1 * comp_data['pctGK 1v1s Save Rate'])
-        
-        comp_data['Chance Creation'] = (0.3 * comp_data['pctxA']) + (0.15 * comp_data['pctKey Passes']) + (0.25 * comp_data['pctBig Chances Created']) + (0.1 * comp_data['pctPass OBV']) + (0.2 * comp_data['pctAssists'])
-        comp_data['Ball Progression'] = (0.2 * comp_data['pctPass OBV']) + (0.15 * comp_data['pctPasses into Final Third']) + (0.25 * comp_data['pctProgressive Carries']) + (0.3 * comp_data['pctProgressive Passes']) + (0.1 * comp_data['pctLong Passes Completed'])
-        comp_data['Ball Retention'] = (0.15 * comp_data['pctForward Pass %']) + (0.55 * comp_data['pctBall Retention %']) + (0.2 * comp_data['pctPressured Pass %']) + (0.1 * comp_data['pctShort Pass %'])
-        comp_data['Verticality'] = (0.25 * comp_data['pct% of Passes Progressive']) + (0.6 * comp_data['pct% of Passes Forward']) + (0.15 * (1- comp_data['pct% of Passes Backward']))
-        comp_data['Carrying'] = (0.25 * comp_data['pctTake Ons']) + (0.1 * comp_data['pctCarries']) + (0.5 * comp_data['pctProgressive Carries']) + (0.15 * comp_data['pctDribble %'])
-        comp_data['Poaching'] = (0.55 * comp_data['pctxG']) + (0.2 * comp_data['pctxG/Shot']) + (0.2 * comp_data['pctBox Receptions']) + (0.05 * comp_data['pctSix Yard Box Receptions'])
-        comp_data['Finishing'] = (0.25 * comp_data['pctGoals per xG']) + (0.15 * comp_data['pctxGOT per xG']) + (0.45 * comp_data['pctGoal Conversion']) + (0.15 * comp_data['pctGoals'])
-        comp_data['Goal Threat'] = (0.3 * comp_data['pctxG']) + (0.3 * comp_data['pctGoals']) + (0.2 * comp_data['pctBox Receptions']) + (0.1 * comp_data['pctGoal Conversion']) + (0.1 * comp_data['pctxGOT per xG'])
-        comp_data['Crossing'] = (0.3 * comp_data['pctCrosses Completed into Box']) + (0.2 * comp_data['pctCross into Box %']) + (0.25 * comp_data['pctCross Shot Assists']) + (0.25 * comp_data['pctCross Assists'])
-        comp_data['Heading'] = (0.7 * comp_data['pctAerial %']) + (0.3 * comp_data['pctAerial Wins'])
-        comp_data['Set Piece Threat'] = (0.75 * comp_data['pctAttacking SP Aerial Wins']) + (0.25 * comp_data['pctAttacking SP Aerial %'])
-
-        # comp_data['Speed'] = (0.4 * comp_data['pctPSV-99']) + (0.45 * comp_data['pctPSV-85']) + (0.15 * comp_data['pctSprinting Distance'])
-        # comp_data['HSR Distance'] = (0.4 * comp_data['pctDistance']) + (0.6 * comp_data['pctHI Running Distance'])
-
-        comp_data['High Pressing'] = (0.25 * comp_data['pctAttacking Half Pressures']) + (0.15 * comp_data['pctAttacking Third Pressures']) + (0.2 * comp_data['pctAttacking Half Pressure Regains']) + (0.1 * comp_data['pctPressure Regains Leading to Shots']) + (0.3 * comp_data['pctAverage Defensive Action Distance'])
-        comp_data['Defending High'] = (0.2 * comp_data['pctAttacking Half Pressures']) + (0.05 * comp_data['pctAttacking Half Pressure Regains']) + (0.75 * comp_data['pctAverage Defensive Action Distance'])
-        comp_data['Tackle Accuracy'] = (0.2 * (100 - comp_data['pctDribbled Past'])) + (0.65 * comp_data['pctTackle %']) + (0.15 * comp_data['pctTackles Won'])
-        comp_data['Defensive Output'] = (0.1 * comp_data['pctBlocks']) + (0.3 * comp_data['pctTackles Won']) + (0.4 * comp_data['pctBall Recoveries']) + (0.2 * comp_data['pctInterceptions'])
-        comp_data['Receiving Forward'] = (0.6 * comp_data['pctFinal Third Receptions']) + (0.15 * comp_data['pctBox Receptions']) + (0.15 * comp_data['pctShots']) + (0.1 * comp_data['pctxG'])
-
-        # for col in comp_data.columns:
-        #     print(col)
-        comp_data['Speed'] = (1 * comp_data['pctTop Speed'])
-        comp_data['Intensity'] = (0.1 * comp_data['pctDistance']) + (0.3 * comp_data['pctRunning Distance']) + (0.2 * comp_data['pctHSR Distance']) + (0.15 * comp_data['pctSprinting Distance']) + (0.15 * comp_data['pctSprint Count']) + (0.1 * comp_data['pct% of Distance HI'])
-        comp_data['Explosiveness'] = (0.3 * comp_data['pctWalking to Sprint Count']) + (0.3 * comp_data['pctWalking to HSR Count']) + (0.2 * (100 - comp_data['pctTime to HSR'])) + (0.2 * (100 - comp_data['pctTime to Sprint']))
-        comp_data['Agility'] = (0.2 * comp_data['pctHigh Decels']) + (0.2 * comp_data['pctHigh Accels']) + (0.3 * comp_data['pctMedium Decels']) + (0.3 * comp_data['pctMedium Accels'])
-
-
-        #highlight = comp_data[(comp_data['player_id'] == sb_player_id) | (comp_data['Player'] == comp_player_name)]
-        #st.write(comp_data[['Player', 'pos_group', 'Minutes', 'Top Speed','pctTop Speed', 'Speed']])
-
-
-        if 'CB' in positions:
-                #print('CB')
-                important_metrics.append(['Speed','Tackle Accuracy', 'Defending High', 'Defensive Output', 'Heading', 'Ball Retention', 'Ball Progression', 'Verticality'])
-                selected_metrics.append(['Top Speed', 'Average Defensive Action Distance', 
-                                         'Tackle %', 'Tackles Won',
-                                         'Interceptions', 'Blocks',
-                                         'Aerial Wins', 'Aerial %',
-                                         'Progressive Passes', 'Passes into Final Third', 
-                                         'Progressive Carries', 'Ball Retention %'])
-        if 'FB/WB' in positions:
-            #print('FB/WB')
-            important_metrics.append(['Crossing','Chance Creation','Receiving Forward','Speed', 'High Pressing', 'Tackle Accuracy', 'Defensive Output',  'Ball Retention', 'Ball Progression', 'Verticality', 'Heading',])
-            selected_metrics.append(['Top Speed', 'HI Distance',
-                                        'Key Passes', 'Big Chances Created',
-                                        'xA', 'Assists',
-                                        'Cross Shot Assists', 'Cross into Box %',
-                                        'Tackle %', 'Tackles Won',
-                                        'Attacking Third Pressures', 'Attacking Half Pressure Regains'
-                                        ])
-        if 'CM' in positions:
-            #print('CM')
-            important_metrics.append(['Tackle Accuracy', 'Defensive Output', 'High Pressing', 'Heading', 'Set Piece Threat', 'Ball Retention', 'Ball Progression', 'Carrying','Receiving Forward','Chance Creation','Speed', 'Intensity', 'Goal Threat', 'Verticality'])
-            selected_metrics.append(['Top Speed', 'HI Distance',
-                                        'xA', 'Assists',
-                                        'xG', 'Goals',
-                                        'Progressive Passes', 'Progressive Carries',
-                                        'Tackle %', 'Ball Recoveries',
-                                        'Attacking Third Pressures', 'Attacking Half Pressure Regains'
-                                        ])
-            
-
-        if 'AM' in positions:
-            #print('AM')
-            important_metrics.append(['Chance Creation', 'Carrying', 'Speed', 'Goal Threat', 'Defensive Output', 'High Pressing', 'Chance Creation', 'Ball Progression', 'Ball Retention', 'Crossing',  'Intensity', 'Poaching', 'Finishing'])
-            selected_metrics.append(['Top Speed', 'HI Distance',
-                                    'Goals', 'xG',
-                                    'Box Receptions', 'Goal Conversion',
-                                    'Assists', 'xA',
-                                    'Progressive Carries', 'Dribble %',
-                                    'Attacking Third Pressures', 'Ball Recoveries'])
-        if 'W' in positions:
-            #print('W')
-            important_metrics.append(['Chance Creation', 'Carrying', 'Speed', 'Goal Threat', 'Defensive Output', 'High Pressing', 'Chance Creation', 'Ball Progression', 'Ball Retention', 'Crossing',  'Intensity', 'Poaching', 'Finishing'])
-            selected_metrics.append(['Top Speed', 'HI Distance',
-                                    'Goals', 'xG',
-                                    'Box Receptions', 'Goal Conversion',
-                                    'Assists', 'xA',
-                                    'Progressive Carries', 'Dribble %',
-                                    'Attacking Third Pressures', 'Ball Recoveries'])
-            
-        if 'ST' in positions:
-            #print('ST')
-            important_metrics.append(['Finishing', 'Poaching', 'High Pressing', 'Speed', 'Intensity', 'Defensive Output', 'Chance Creation', 'Ball Retention', 'Carrying',  'Goal Threat', 'Heading', 'Set Piece Threat'])
-            selected_metrics.append(['Goals', 'xG',
-                                    'Shots', 'Box Receptions',
-                                    'Goal Conversion', 'Big Chance Conversion',
-                                    'Key Passes', 'Ball Retention %',
-                                    'Attacking Third Pressures', 'Ball Recoveries',
-                                    'Top Speed', 'HI Distance'])
-
-        #important_metrics = list(set(item for sublist in important_metrics for item in sublist))
-
-        all_ratings = ['Speed', 'Intensity', 'Explosivness', 'Agility', 'Defensive Output', 'Defending High', 'High Pressing', 'Tackle Accuracy', 'Heading', 'Ball Retention', 'Ball Progression', 'Verticality', 'Carrying', 'Chance Creation', 'Crossing', 'Poaching', 'Finishing', 'Goal Threat', 'Receiving Forward', 'Set Piece Threat','Shot Stopping', 'Short Distribution', 'Long Distribution', 'Stepping Out', 'Saving Big Chances', '1v1 Saving']
-        
-
-        important_ratings_unique = []
-        seen = set()
-        for sublist in important_metrics:
-            for item in sublist:
-                if item not in seen:
-                    seen.add(item)
-                    important_ratings_unique.append(item)
+            if compare == 'Yes':
+                st.caption("Pick the comparison player from the menu on the radar")
 
-        important_ratings = important_ratings_unique
+        comp_data = load_comp_data(positions, sb_player_id)
+        comparisons = load_comparison_ratings(positions, sb_player_id) if compare == 'Yes' else None
+        important_ratings = ratings_for_positions(positions)
 
         #st.write(important_ratings)
 
         import plotly.graph_objects as go
 
-        def create_comparison_radar(comp_data, player_name, important_ratings, compare=False, comp_player_name=None):
-            """Create radar chart for player comparison"""
+        def create_comparison_radar(comp_data, player_name, important_ratings, comparisons=None):
+            """Create radar chart for player comparison
+
+            Every comparison player is sent with the figure as a hidden trace and the menu on
+            the chart switches between them in the browser, without a rerun.
+            """
             
             # Get player data
             player_data = comp_data[comp_data['player_id'] == sb_player_id].iloc[0]
@@ -475,25 +611,27 @@ def display_player_page(player_name, df):
                 marker=dict(size=8, color='#00ff00')
             ))
             
-            # Initialize comp_player_mins
-            comp_player_mins = None
-            
-            # Add comparison player if needed
-            if compare == 'Yes' and comp_player_name:
-                comp_player_data = comp_data[comp_data['Player'] == comp_player_name].iloc[0]
-                comp_player_mins = comp_player_data.get('Minutes', 0)
-                comp_player_ratings = [comp_player_data[rating] for rating in important_ratings]
-                
+            # Rating vectors of every comparison player; the menu swaps them into one trace
+            comparison_names = [] if comparisons is None else comparisons.sort_values('Minutes', ascending=False)['Player'].tolist()
+            comparison_ratings, comparison_labels = [], []
+            for comp_player_name in comparison_names:
+                comp_player_data = comparisons[comparisons['Player'] == comp_player_name].iloc[0]
+                comp_player_mins = int(comp_player_data.get('Minutes', 0))
+                comparison_ratings.append([round(comp_player_data[rating], 1) for rating in important_ratings])
+                no_physical = " | no physical data" if comp_player_data['Top Speed'] == 0 else ""
+                comparison_labels.append(f"{comp_player_mins} mins{no_physical}")
+
+            if comparison_names:
                 fig.add_trace(go.Scatterpolar(
-                    r=comp_player_ratings,
+                    r=comparison_ratings[0],
                     theta=processed_metrics,
                     fill='toself',
-                    name=f'{comp_player_name}',
+                    name='Comparison',
                     line=dict(color='#ff0000', width=3),
                     fillcolor='rgba(255, 0, 0, 0.4)',
                     marker=dict(size=8, color='#ff0000')
                 ))
-            
+
             # Update layout to match your dark theme
             fig.update_layout(
                 polar=dict(
@@ -541,11 +679,12 @@ def display_player_page(player_name, df):
                 xref="paper", yref="paper"
             )
             
-            # Add comparison player annotations if needed
-            if compare == 'Yes' and comp_player_name and comp_player_mins is not None:
+            # Label the comparison player and let the menu swap its ratings and labels in the browser
+            if comparison_names:
+                name_index = len(fig.layout.annotations)
                 fig.add_annotation(
                     x=0.95, y=1.18,
-                    text=f"{comp_player_name}",
+                    text=comparison_names[0],
                     showarrow=False,
                     font=dict(size=20, color='#ff0000', family='Arial Black'),
                     xref="paper", yref="paper",
@@ -553,35 +692,71 @@ def display_player_page(player_name, df):
                 )
                 fig.add_annotation(
                     x=0.95, y=1.13,
-                    text=f"{comp_player_mins} mins",
+                    text=comparison_labels[0],
                     showarrow=False,
                     font=dict(size=15, color='#ff0000'),
                     xref="paper", yref="paper",
                     xanchor="right"
                 )
-    
+                fig.update_layout(updatemenus=[dict(
+                    buttons=[dict(
+                        label=name,
+                        method='update',
+                        args=[{'r': [ratings]},
+                              {f'annotations[{name_index}].text': name, f'annotations[{name_index + 1}].text': label},
+                              [1]],
+                    ) for name, ratings, label in zip(comparison_names, comparison_ratings, comparison_labels)],
+                    direction='down',
+                    x=0.95, y=1.08, xanchor='right', yanchor='top',
+                    bgcolor='#200020', bordercolor='white', font=dict(color='white', size=12),
+                )])
+
             #return fig, player_mins, comp_player_mins
             
-            return fig, player_mins, comp_player_mins if compare == 'Yes' and comp_player_name else None
+            return fig, player_mins
 
         
       
         # Create and display radar chart
-        if not compare or (compare and comp_player_name):
-            radar_fig, player_mins, comp_mins = create_comparison_radar(
-                comp_data, 
-                player_name, 
-                important_ratings, 
-                compare=compare, 
-                comp_player_name=comp_player_name
-            )
+        radar_fig, player_mins = create_comparison_radar(
+            comp_data,
+            player_name,
+            important_ratings,
+            comparisons=comparisons,
+        )
             # Display title and minutes like your original
        
-        st.plotly_chart(radar_fig, use_container_width=True)
+        st.plotly_chart(radar_fig, width='stretch')
         if comp_data[comp_data['player_id'] == sb_player_id].iloc[0]['Top Speed'] == 0:
             st.warning(f"Physical Data for {raw_player_name} not available")
-        if compare == 'Yes' and comp_data[comp_data['Player'] == comp_player_name].iloc[0]['Top Speed'] == 0:
-            st.warning(f"Physical Data for {comp_player_name} not available")
+
+        if positions:
+            st.subheader("Metric Distributions")
+            st.caption(f"Season values against every {'/'.join(positions)} player above the median minutes")
+            strips = cached(('metric_strips', tuple(sorted(positions)), sb_player_id), [SEASON_FILE],
+                            lambda: create_metric_strips(load_metric_distributions(positions), sb_player_id, player_name))
+            st.plotly_chart(strips, width='stretch')
+
+        st.subheader("Form")
+        form_window = st.pills("Matches", FORM_WINDOWS, default=5, key=f"form_window_{raw_player_name}") or 5
+        form = load_form_series()
+        trend = form.rolling(sb_player_id, form_window)
+
+        if trend.empty:
+            st.info(f"No match data for {raw_player_name}")
+        else:
+            opponents = load_availability().opponents()
+            trend['Match'] = [
+                f"{d.strftime('%m/%d') if pd.notna(d) else i + 1} {opponents.get(m, '')}".strip()
+                for i, (d, m) in enumerate(zip(trend['match_date'], trend['match_id']))
+            ]
+
+            latest = trend.iloc[-1]
+            cols = st.columns(len(FORM_RATINGS))
+            for col, rating in zip(cols, FORM_RATINGS):
+                with col: st.metric(rating, int(latest[rating]))
+
+            st.plotly_chart(create_form_trend_chart(trend, form_window), width='stretch')
         
 
 
@@ -590,344 +765,158 @@ def display_player_page(player_name, df):
 
 
     st.title("Activity Maps")
-    p_events = pd.read_parquet(f"NWSL2025-AppLeagueEvents.parquet")
-    events = p_events[p_events['player_id'] == sb_player_id]
-    card_options = ['Touches', 'Pressures', 'Defensive Duels', 'Ball Carrying', 'Progressive Actions', 'Key Passes', 'Shots']
+    if sb_player_id is None:
+        st.info(f"No league event data for {raw_player_name}")
+    else:
+        match_ids, map_mins = map_matches(raw_player_name, sb_player_id, player_mins)
+        events = load_player_events(sb_player_id, match_ids)
+        idp_memory.track_table('player_events', events)
 
 
-    selected_card = st.pills("Selected Visuals",
-                                card_options, default = 'Touches')
-    import matplotlib.patches as patches
-    import matplotlib.pyplot as plt
-    from mplsoccer import VerticalPitch, Pitch
-    from PIL import Image
-    from matplotlib.colors import LinearSegmentedColormap
+        selected_card = st.pills("Selected Visuals",
+                                    CARD_OPTIONS, default = 'Touches')
 
-    def safe_div(a, b):
-        return a / b if b != 0 else 0
-    
-    if selected_card == 'Shots':
-        st.header("Shots")
-        
-        shots = events[(events['type'] == 'Shot') & (events['shot_type'] != 'Penalty')]
-        goals_scored = len(events[events['shot_outcome'] == 'Goal'])
-        xg_total = round(np.nansum(events['shot_statsbomb_xg']),2)
-        shots_taken = len(shots)
-        xg_per_shot = round(safe_div(xg_total, shots_taken),2)
-        goal_conversion = int(safe_div(goals_scored, shots_taken) * 100)
-        pens_taken = len(events[(events['shot_type'] == 'Penalty')])
-        pens_scored = len(events[(events['shot_outcome'] == 'Goal') & (events['shot_type'] == 'Penalty')])
-
-        transition_xg = round(np.nansum(events[(events['pressure_in_prev_15s'] == True) | (events['counter_shot'] == True)]['shot_statsbomb_xg']),2)
-        sp_xg = round(np.nansum(events[(events['shot_from_corner'] == True) | (events['shot_from_fk'] == True)]['shot_statsbomb_xg']),2)
-
-        # Display stats
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Goals", goals_scored)
-            st.metric("xG", xg_total)
-        with col2:
-            st.metric("Shots", shots_taken)
-            st.metric("xG/Shot", xg_per_shot)
-        with col3:
-            st.metric("Conversion", f"{goal_conversion}%")
-            st.metric("Transition xG | Set Piece xG", f"{transition_xg}  |  {sp_xg}")
+        map_events = events
+        if selected_card not in ('Touches', 'Pressures'):
+            filtered = map_filter(raw_player_name, sb_player_id, match_ids)
+            if filtered is not None:
+                map_events = filtered
 
-        #st.write(f"**Shots:** {shots_taken}  |  **Goals:** {goals_scored}  |  **Conversion:** {goal_conversion}%")
-        #st.write(f"**xG:** {xg_total} | **xG/Shot:** {xg_per_shot}  | **Transition xG:** {transition_xg} | **Set Piece xG:** {sp_xg}")
-        st.write("🟢 Goal | 🟡 Saved | 🔴 Off Target/Blocked")
-        #st.write(f"**Transition xG:** {transition_xg} | **Set Piece xG:** {sp_xg}")
+        if selected_card == 'Shots':
+            st.header("Shots")
 
-        # Create shot map
-        pitch = VerticalPitch(pitch_type='statsbomb', pitch_color='#200020', line_color='#c7d5cc',
-                    half=True, pad_top=6, corner_arcs=True,)
-        
-        fig, ax = pitch.draw(figsize=(8,12))
-        
-        shots = events[events['type'] == 'Shot']
-        for _, row in shots.iterrows():
-            x = row['x']
-            y = row['y']
-            outcome = row['shot_outcome']
-            xg = row['shot_statsbomb_xg']
-
-            color = 'red' 
-            if outcome == 'Goal': color = 'green'
-            elif outcome == 'Saved': color = 'yellow'
-            elif outcome == 'Saved to Post': color = 'yellow'
-            
-            pitch.scatter(x, y, ax=ax, color=color, marker='.', s=min(xg*2050, 500))
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Shots']
 
-        
+            # Display stats
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Goals", metrics['Goals'])
+                st.metric("xG", metrics['xG'])
+            with col2:
+                st.metric("Shots", metrics['Shots'])
+                st.metric("xG/Shot", metrics['xG/Shot'])
+            with col3:
+                st.metric("Conversion", f"{metrics['Conversion %']}%")
+                st.metric("Transition xG | Set Piece xG", f"{metrics['Transition xG']}  |  {metrics['Set Piece xG']}")
 
-        st.pyplot(fig)
-        plt.close(fig)
+            #st.write(f"**Shots:** {shots_taken}  |  **Goals:** {goals_scored}  |  **Conversion:** {goal_conversion}%")
+            #st.write(f"**xG:** {xg_total} | **xG/Shot:** {xg_per_shot}  | **Transition xG:** {transition_xg} | **Set Piece xG:** {sp_xg}")
+            st.write("🟢 Goal | 🟡 Saved | 🔴 Off Target/Blocked")
+            #st.write(f"**Transition xG:** {transition_xg} | **Set Piece xG:** {sp_xg}")
 
-    elif selected_card == 'Key Passes':
-        st.header("Key Passes")
-        
-        kps = events[(events['type'] == 'Pass') & ((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True))]
-        assists = len(events[events['pass_goal_assist'] == True])
-        xa_total = round(np.nansum(events['xA']),2)
-        kps_num = len(kps)
-        big_chances_created = len(events[events['xA'] > 0.1])
-        sp_kps = len(events[(events['pass_type'].isin(['Free Kick', 'Corner'])) & ((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True))])
-        cross_att = len(events[events['pass_cross'] == True])
-        cross_succ = len(events[(events['completed_pass'] == True) & (events['pass_cross'] == True)])
-        cross_shot_assists = len(events[((events['pass_shot_assist'] == True)  | (events['pass_goal_assist'] == True)) & (events['pass_cross'] == True)])
-
-        # Display stats
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Assists", assists)
-            st.metric("Big Chances", big_chances_created)
-        with col2:
-            st.metric("xA", xa_total)
-            st.metric("Key Passes", kps_num)
-        with col3:
-            st.metric("Crosses", f"{cross_succ}/{cross_att}")
-            st.metric("Cross Shot Assists", cross_shot_assists)
+            show_card_map('Shots', map_events)
 
-        # Create key passes map
-        pitch = VerticalPitch(pitch_type='statsbomb', pitch_color='#200020', line_color='#c7d5cc',
-                    half=True, pad_top=6, corner_arcs=True,)
-        
-        fig, ax = pitch.draw(figsize=(8,12))
-        
-        for _, row in kps.iterrows():
-            x1 = row['x']
-            y1 = row['y']
-            x2 = row['pass_end_x']
-            y2 = row['pass_end_y']
-            outcome = row['pass_goal_assist']
-
-            color = 'green' if outcome == True else 'orange'
-            
-            pitch.scatter(x1, y1, ax=ax, color='white', marker='.', s=80)
-            pitch.scatter(x2, y2, ax=ax, color=color, marker='.', s=250)
-            pitch.lines(linewidth=3, xstart=x1, ystart=y1, xend=x2, yend=y2, comet=True, ax=ax, color=color)
+        elif selected_card == 'Key Passes':
+            st.header("Key Passes")
 
-        st.pyplot(fig)
-        plt.close(fig)
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Key Passes']
 
-    elif selected_card == 'Ball Carrying':
-        st.header("1v1 Dribbling & Carrying")
-        
-        take_on_att = len(events[(events['type'] == 'Dribble')])
-        take_on_succ = len(events[(events['type'] == 'Dribble') & (events['dribble_outcome'] == 'Complete')])
-        box_take_on_att = len(events[(events['type'] == 'Dribble') & (events['x'] > 102) & (events['y'] > 17) & (events['y'] < 62)])
-        box_take_on_succ = len(events[(events['type'] == 'Dribble') & (events['dribble_outcome'] == 'Complete') & (events['x'] > 102) & (events['y'] > 17) & (events['y'] < 62)])
-        dribble_succ = int(safe_div(take_on_succ, take_on_att) * 100)
-        box_dribble_succ = int(safe_div(box_take_on_succ, box_take_on_att) * 100)
-        prog_carries = len(events[events['is_progressive_carry'] == True])
-        carries_into_box = len(events[(events['type'] == 'Carry') & (events['is_box_entry'] == True)])
-
-        # Display stats
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Take Ons", f"{take_on_succ}/{take_on_att} ({dribble_succ}%)")
-            st.metric("Progressive Carries", prog_carries)
-        with col2:
-            st.metric("Inside Box", f"{box_take_on_succ}/{box_take_on_att}")
-            st.metric("Box Entries", carries_into_box)
+            # Display stats
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Assists", metrics['Assists'])
+                st.metric("Big Chances", metrics['Big Chances'])
+            with col2:
+                st.metric("xA", metrics['xA'])
+                st.metric("Key Passes", metrics['Key Passes'])
+            with col3:
+                st.metric("Crosses", f"{metrics['Crosses Completed']}/{metrics['Crosses Attempted']}")
+                st.metric("Cross Shot Assists", metrics['Cross Shot Assists'])
 
-        # Create carrying map
-        dribbles = events[(events['type'].isin(['Carry', 'Dribble']))]
-        pitch = Pitch(pitch_type='statsbomb', pitch_color='#200020', line_color='#c7d5cc',
-                    pad_top=6, corner_arcs=True,)
-        
-        fig, ax = pitch.draw(figsize=(8,12))
-        
-        for _, row in dribbles.iterrows():
-            if row['is_progressive_carry'] == True:
-                x1 = row['x']
-                y1 = row['y']
-                x2 = row['carry_end_x']
-                y2 = row['carry_end_y']
-                
-                pitch.lines(transparent=True, linewidth=2, comet=True, xstart=x1, ystart=y1, xend=x2, yend=y2, ax=ax, color='orange')
+            show_card_map('Key Passes', map_events)
 
-            if row['type'] == 'Dribble':
-                x1 = row['x']
-                y1 = row['y']
-                color = 'green' if row['dribble_outcome'] == 'Complete' else 'red'
-                pitch.scatter(x1, y1, ax=ax, color=color, marker='.', s=250)
+        elif selected_card == 'Ball Carrying':
+            st.header("1v1 Dribbling & Carrying")
 
-        st.pyplot(fig)
-        plt.close(fig)
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Ball Carrying']
 
-    elif selected_card == 'Progressive Actions':
-        st.header("Progressive Passes & Carries")
-        
-        prog_actions = events[(events['is_progressive'] == True) | (events['is_progressive_carry'] == True)]
-        succ_prog_passes = len(events[(events['type'] == 'Pass') & (events['is_progressive'] == True) & (events['completed_pass'] == True)])
-        att_prog_passes = len(events[(events['type'] == 'Pass') & (events['is_progressive'] == True)])
-        prog_carries = len(events[(events['type'] == 'Carry') & (events['is_progressive_carry'] == True)])
-        prog_pass_rate = int(safe_div(succ_prog_passes, att_prog_passes) * 100)
-        total_actions = len(events[events['type'].isin(['Pass', 'Carry'])])
-        pct_prog = int(safe_div(len(prog_actions), total_actions) * 100)
-
-        # Display stats
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Progressive Passes", f"{succ_prog_passes}/{att_prog_passes} ({prog_pass_rate}%)")
-        with col2:
-            st.metric("Progressive Carries", prog_carries)
-        
-        with col3:
-            st.metric("% of Actions Progressive", f"{pct_prog}%")
+            # Display stats
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Take Ons", f"{metrics['Take Ons Completed']}/{metrics['Take Ons Attempted']} ({metrics['Dribble %']}%)")
+                st.metric("Progressive Carries", metrics['Progressive Carries'])
+            with col2:
+                st.metric("Inside Box", f"{metrics['Box Take Ons Completed']}/{metrics['Box Take Ons Attempted']}")
+                st.metric("Box Entries", metrics['Box Entries'])
 
-        st.write("🟠 Progressive Passes | 🟣 Progressive Carries")
+            # Create carrying map
+            show_card_map('Ball Carrying', map_events)
 
-        # Create progressive actions map
-        pitch = Pitch(pitch_type='statsbomb', pitch_color='#200020', line_color='#c7d5cc',
-                    pad_top=6, corner_arcs=True,)
-        
-        fig, ax = pitch.draw(figsize=(8,12))
-        
-        for _, row in prog_actions.iterrows():
-            if row['type'] == 'Carry':
-                x1 = row['x']
-                y1 = row['y']
-                x2 = row['carry_end_x']
-                y2 = row['carry_end_y']
-                
-                pitch.lines(transparent=True, linewidth=2, comet=True, xstart=x1, ystart=y1, xend=x2, yend=y2, ax=ax, color='magenta')
+        elif selected_card == 'Progressive Actions':
+            st.header("Progressive Passes & Carries")
 
-            if row['type'] == 'Pass' and row['completed_pass'] == True:
-                x1 = row['x']
-                y1 = row['y']
-                x2 = row['pass_end_x']
-                y2 = row['pass_end_y']
-                
-                pitch.lines(transparent=True, linewidth=2, comet=True, xstart=x1, ystart=y1, xend=x2, yend=y2, ax=ax, color='orange')
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Progressive Actions']
 
-        st.pyplot(fig)
-        plt.close(fig)
+            # Display stats
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Progressive Passes", f"{metrics['Progressive Passes Completed']}/{metrics['Progressive Passes Attempted']} ({metrics['Progressive Pass %']}%)")
+            with col2:
+                st.metric("Progressive Carries", metrics['Progressive Carries'])
 
-    elif selected_card == 'Touches':
-        st.header("Touches")
-        
-        touches_p90 = round(len(events[(events['type'].isin(['Pass', 'Ball Receipt*', 'Shot']))]) / (player_mins/90),1)
-        touches_att_third_p90 = round(len(events[(events['type'].isin(['Pass', 'Ball Receipt*', 'Shot']) & (events['x'] > 80))]) / (player_mins/90),1)
-        touches_box = round(len(events[(events['type'].isin(['Pass', 'Ball Receipt*', 'Shot']) & (events['x'] > 102) & (events['y'] < 62) & (events['y'] > 17))]) / (player_mins/90),1)
+            with col3:
+                st.metric("% of Actions Progressive", f"{metrics['% of Actions Progressive']}%")
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Touches p90", touches_p90)
-        with col2:
-            st.metric("Att. 1/3 Touches p90", touches_att_third_p90)
-        with col3:
-            st.metric("Box Touches p90", touches_box)
+            st.write("🟠 Progressive Passes | 🟣 Progressive Carries")
 
-        df_touches = events.loc[events.type.isin(['Pass', 'Ball Receipt*', 'Shot']), ['x', 'y']]
-        flamingo_cmap = LinearSegmentedColormap.from_list("Flamingo - 10 colors", ['#e3aca7', '#c03a1d'], N=10)
-        
-        pitch = Pitch(line_color='white', line_zorder=2, pitch_color='#200020')
-        fig, ax = pitch.draw(figsize=(12, 8))
-        hexmap = pitch.hexbin(df_touches.x, df_touches.y, ax=ax, edgecolors='#f4f4f4',
-                            gridsize=(12, 6), cmap=flamingo_cmap, mincnt=3)
+            show_card_map('Progressive Actions', map_events)
 
-        st.pyplot(fig)
-        plt.close(fig)
+        elif selected_card == 'Touches':
+            st.header("Touches")
 
-    elif selected_card == 'Pressures':
-        st.header("Pressures")
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Touches']
 
-        pressures_p90 = round(len(events[(events['type'] == 'Pressure')]) / (player_mins/90),1)
-        att_third_pressures = round(len(events[(events['type'] == 'Pressure') & (events['x'] > 80)]) / (player_mins/90),1)
-        pressures_to_shot = round(len(events[(events['type'] == 'Pressure') & (events['pressure_leading_to_shot'] == True)]) / (player_mins/90),1)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Touches p90", metrics['Touches p90'])
+            with col2:
+                st.metric("Att. 1/3 Touches p90", metrics['Att. 1/3 Touches p90'])
+            with col3:
+                st.metric("Box Touches p90", metrics['Box Touches p90'])
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Pressures p90", pressures_p90)
-            
-        with col2:
-            st.metric("Att. 1/3 Pressures p90", att_third_pressures)
+            map_view = st.radio("Map", HEX_MAP_VIEWS, horizontal=True, key='touch_map_view')
+            show_hex_map('Touches', sb_player_id, map_mins, map_view, match_ids)
 
-        with col3:
-            st.metric("Pressures Leading to Shot p90", pressures_to_shot)
-        
+        elif selected_card == 'Pressures':
+            st.header("Pressures")
 
-        df_touches = events.loc[events.type.isin(['Pressure']), ['x', 'y']]
-        flamingo_cmap = LinearSegmentedColormap.from_list("Flamingo - 10 colors", ['#e3aca7', '#c03a1d'], N=10)
-        
-        pitch = Pitch(line_color='white', line_zorder=2, pitch_color='#200020')
-        fig, ax = pitch.draw(figsize=(12, 8))
-        hexmap = pitch.hexbin(df_touches.x, df_touches.y, ax=ax, edgecolors='#f4f4f4',
-                            gridsize=(12, 6), cmap=flamingo_cmap, mincnt=3)
+            metrics = load_card_metrics(sb_player_id, map_mins, match_ids)['Pressures']
 
-        st.pyplot(fig)
-        plt.close(fig)
-                                
-                                
-    
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Pressures p90", metrics['Pressures p90'])
 
+            with col2:
+                st.metric("Att. 1/3 Pressures p90", metrics['Att. 1/3 Pressures p90'])
+
+            with col3:
+                st.metric("Pressures Leading to Shot p90", metrics['Pressures Leading to Shot p90'])
+
+
+            map_view = st.radio("Map", HEX_MAP_VIEWS, horizontal=True, key='pressure_map_view')
+            show_hex_map('Pressures', sb_player_id, map_mins, map_view, match_ids)
 
-    st.title("Match Reports")
-   
-    def parse_filename(filename):
-        """Parse filename: {match_id}-{match_date}-{opponent}-{player_name}.png"""
-        parts = filename.replace('.png', '').split('-')
-        if len(parts) < 4:
-            return None
-        return {
-            'match_id': parts[0],
-            'match_date': f"{parts[2]}/{parts[3]}",
-            'opponent': parts[4],
-            'player_name': parts[5],
-            'filename': filename
-        }
-
-    def get_player_images(player_name):
-        folder_path = "IDP Images"
-        
-        images = []
-        for filename in os.listdir(folder_path):
-            
-            parsed = parse_filename(filename)
-            #print(parsed)
-            if parsed and parsed['player_name'] == raw_player_name:
-                images.append(parsed)
-
-        def sort_key(image_data):
-            # Split the filename to get the date parts
-            filename_parts = image_data['filename'].replace('.png', '').split('-')
-            year = filename_parts[1]
-            month = filename_parts[2] 
-            day = filename_parts[3]
-            return datetime.strptime(f"{year}-{month}-{day}", '%Y-%m-%d')
-            
-        images.sort(key=sort_key, reverse=True)
-        return images
 
-    
 
-  
-    # Get all players
-    all_players = set()
-    folder_path = "IDP Images"
-    if os.path.exists(folder_path):
-        for filename in os.listdir(folder_path):
-            if filename.endswith('.png'):
-                parsed = parse_filename(filename)
-                if parsed:
-                    all_players.add(parsed['player_name'])
-
-    if not all_players:
+
+
+    st.title("Match Reports")
+   
+    folder_path = IMAGES_FOLDER
+    manifest = load_image_manifest()
+    if not manifest:
         st.error(f"No images found in '{folder_path}' folder")
         st.stop()
 
-   
     # Get player images
-    images = get_player_images(raw_player_name)
+    images = [image for image in manifest if image['player_name'] == raw_player_name]
     if not images:
         st.warning(f"No images found for {raw_player_name}")
         st.stop()
 
     # Match selection dropdown
     options = [f"{img['match_date']} - {img['opponent']}" for img in images]
-    selected = st.selectbox("Select match:", options, index=0)
+    selected = st.selectbox("Select match:", options, index=0, key=f"match_report_{raw_player_name}")
 
     # Display selected image
     selected_img = images[options.index(selected)]
@@ -971,7 +960,6 @@ def display_player_page(player_name, df):
     df_player = df[df['Player'] == raw_player_name].copy()
     
     if len(df_player) != 0:
-        print('!!')
         df_player['Date'] = pd.to_datetime(df_player['Date'])
         
         if df_player.empty:
@@ -1003,14 +991,26 @@ def display_player_page(player_name, df):
             # Pie chart for training types
             st.subheader("Areas Covered")
             pie_fig = create_training_pie_chart(df_player, 'Type', 'Training Types')
-            st.plotly_chart(pie_fig, use_container_width=True)
+            st.plotly_chart(pie_fig, width='stretch')
 
             pie_fig = create_training_pie_chart(df_player, 'Detail', 'Areas Covered')
-            st.plotly_chart(pie_fig, use_container_width=True)
+            st.plotly_chart(pie_fig, width='stretch')
         
         with col2:
             # Calendar heatmap
-            
+            st.subheader("Training Calendar")
+            cal_col1, cal_col2 = st.columns(2)
+            with cal_col1:
+                cal_types = st.multiselect("Type", sorted(df_player['Type'].dropna().unique()), key=f"cal_type_{player_name}")
+            with cal_col2:
+                cal_details = st.multiselect("Detail", sorted(df_player['Detail'].dropna().unique()), key=f"cal_detail_{player_name}")
+
+            calendar_index = training_index(TrainingCalendar, EXCEL_FILE).sync(df)
+            cal_end = datetime.now().date()
+            days, _, counts = calendar_index.matrix(cal_end - timedelta(days=364), cal_end,
+                                                    types=cal_types or None, details=cal_details or None,
+                                                    players=[raw_player_name])
+            st.plotly_chart(create_calendar_heatmap(days, counts[:, 0], "Sessions per Day (Last 12 Months)"), width='stretch')
         
         # Recent sessions table
             st.subheader("All Sessions")
@@ -1048,7 +1048,7 @@ def display_player_page(player_name, df):
                 display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
                 display_df = display_df.sort_values('Date', ascending=False)
                 st.dataframe(display_df[['Date', 'Type', 'Detail', 'Coach', 'Notes']], 
-                            use_container_width=True, height=400)
+                            width='stretch', height=400)
             else:
                 st.info("No sessions found for the selected date range.")
 
@@ -1082,6 +1082,9 @@ def main():
     if 'error_message' not in st.session_state:
         st.session_state.error_message = ""
     
+    start_api_server()
+    start_watcher()
+
     # Load data
     df = load_data()
     
@@ -1092,8 +1095,11 @@ def main():
     players = (df2["Player"].tolist()) if not df2.empty else []
     
     # Navigation options
-    nav_options = ["Overview", "Add New Entry", "Remove Entry", "Analytics"] + [f"👤  {player}" for player in players]
+    nav_options = ["Overview", "Add New Entry", "Remove Entry", "Import Sessions", "Search", "Analytics", "Squad", "Admin"] + [f"👤  {player}" for player in players]
     page = st.sidebar.selectbox("Select Page", nav_options)
+    idp_memory.note(page=page)
+    idp_memory.track_table('training_log', df)
+    idp_memory.track_table('bios', df2)
     
     # Show success/error messages at the top
     if st.session_state.show_success:
@@ -1162,22 +1168,21 @@ def main():
         if not df_filtered.empty:
             display_df = df_filtered.copy()
             display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d')
-            st.dataframe(display_df[['Player', 'Type', 'Detail', 'Date', 'Coach', 'Notes']], use_container_width=True, height=400)
+            st.dataframe(display_df[['Player', 'Type', 'Detail', 'Date', 'Coach', 'Notes']], width='stretch', height=400)
         else:
             st.info("No training sessions found for the selected criteria.")
     
     elif page == "Add New Entry":
         st.header("Add New Training Entry")
         
-        # Get existing data for dropdowns
-        existing_players = sorted(df2["Player"].unique().tolist()) if not df.empty else []
-        existing_types = sorted(df["Type"].unique().tolist()) if not df.empty else []
-        existing_details = sorted(df["Detail"].unique().tolist()) if not df.empty else []
-        existing_coaches = sorted(df["Coach"].unique().tolist()) if not df.empty else []
+        # Get existing data for dropdowns (default training types are part of the vocabulary)
+        vocabulary = training_index(TrainingVocabulary, EXCEL_FILE).sync(df)
+        option_order = st.radio("Order options by", VOCABULARY_ORDERS, horizontal=True)
 
-        # Default training types
-        default_types = ["Individual", 'Combined', 'Group', 'Video', 'Unit Meeting', 'Player Meeting']
-        all_types = sorted(list(set(existing_types + default_types)))
+        existing_players = vocabulary.options('Player', option_order, among=players) if not df.empty else []
+        all_types = vocabulary.options('Type', option_order)
+        existing_details = vocabulary.options('Detail', option_order)
+        existing_coaches = vocabulary.options('Coach', option_order)
 
         col1, col2 = st.columns(2)
         
@@ -1229,28 +1234,16 @@ def main():
             if add_multiple:
                 if selected_players and training_type and training_type.strip():
 
-                    df_temp = load_data()
-                    if 'Session_ID' in df_temp.columns and not df_temp.empty:
-                        next_session_id = df_temp['Session_ID'].max() + 1
-                    else:
-                        next_session_id = 1
-
-                    success_count = 0
-                    for player in selected_players:
-                        success = add_training_entry(
-                            player.strip(), 
-                            training_type.strip(), 
-                            training_detail.strip() if training_detail else "", 
-                            training_date, 
-                            coach_name.strip() if coach_name else "", 
-                            notes.strip(),
-                            session_id=next_session_id
-                        )
-                        if success:
-                            success_count += 1
+                    success_count = add_group_session(
+                        [player.strip() for player in selected_players],
+                        training_type.strip(),
+                        training_detail.strip() if training_detail else "",
+                        training_date,
+                        coach_name.strip() if coach_name else "",
+                        notes.strip()
+                    )
                     
                     if success_count == len(selected_players):
-                        print('hi')
                         st.session_state.show_success = True
                         st.session_state.success_message = f"Group session added for {success_count} players!"
                         st.rerun()
@@ -1295,7 +1288,8 @@ def main():
             
             with col1:
                 # Player filter
-                player_filter_options = ["All Players"] + sorted(df["Player"].unique().tolist())
+                vocabulary = training_index(TrainingVocabulary, EXCEL_FILE).sync(df)
+                player_filter_options = ["All Players"] + vocabulary.options('Player')
                 selected_player_filter = st.selectbox("Filter by Player", player_filter_options, key="remove_player_filter")
             
             with col2:
@@ -1334,7 +1328,7 @@ def main():
                 
                 # Show the data
                 st.dataframe(display_df[['Date', 'Player', 'Type', 'Detail', 'Coach', 'Notes']], 
-                           use_container_width=True, height=300)
+                           width='stretch', height=300)
                 
                 # Entry selection for removal
                 st.subheader("Remove Entry")
@@ -1372,6 +1366,89 @@ def main():
             else:
                 st.info("No entries found matching the selected filters.")
 
+    elif page == "Import Sessions":
+        st.header("Import Training Sessions")
+        st.markdown("Load historical sessions from another workbook or a CSV file. Rows are checked against Player Bios and saved in batches.")
+
+        upload = st.file_uploader("Spreadsheet", type=['xlsx', 'csv'])
+        if upload is not None:
+            try:
+                sheet = None
+                if upload.name.lower().endswith('.xlsx'):
+                    sheet = st.selectbox("Sheet", idp_import.sheet_names(upload))
+                with idp_import.open_rows(upload, upload.name, sheet) as (headers, _):
+                    guessed = idp_import.guess_mapping(headers)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+
+            st.subheader("Columns")
+            mapping = {}
+            columns = st.columns(len(TRAINING_COLUMNS))
+            for col, column in zip(columns, TRAINING_COLUMNS):
+                options = ["(none)"] + [header for header in headers if header]
+                default = next((header for header, target in guessed.items() if target == column), "(none)")
+                with col:
+                    source = st.selectbox(column, options, index=options.index(default), key=f"import_map_{column}")
+                if source != "(none)":
+                    mapping[source] = column
+
+            dry_run = st.checkbox("Check only (don't save)")
+            if st.button("Import", type="primary"):
+                progress = st.progress(0.0, text="Importing...")
+                try:
+                    report = idp_import.import_sessions(
+                        upload, upload.name, sheet, mapping, EXCEL_FILE, dry_run=dry_run,
+                        progress=lambda rows, imported: progress.progress(min(1.0, upload.tell() / max(upload.size, 1)),
+                                                                          text=f"{rows} rows read, {imported} imported"))
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+                progress.progress(1.0, text="Done")
+
+                col1, col2, col3, col4 = st.columns(4)
+                with col1: st.metric("Rows Read", report['rows'])
+                with col2: st.metric("Checked OK" if dry_run else "Imported", report['imported'], f"{report['sessions']} sessions", delta_color="off")
+                with col3: st.metric("Rejected", len(report['rejected']))
+                with col4: st.metric("Rows per Second", report['rows_per_second'], f"{report['seconds']}s", delta_color="off")
+
+                if report['rejected']:
+                    rejected = idp_import.rejected_frame(report)
+                    st.dataframe(rejected, width='stretch', hide_index=True, height=300)
+                    st.download_button("Download Rejected Rows", rejected.to_csv(index=False), "rejected_rows.csv", "text/csv")
+
+    elif page == "Search":
+        st.header("Search Training Sessions")
+        st.markdown("Find sessions by the words in their Detail and Notes (word beginnings match, e.g. *press* finds pressure and pressing)")
+
+        search_index = training_index(TrainingSearch, EXCEL_FILE).sync(df)
+        vocabulary = training_index(TrainingVocabulary, EXCEL_FILE).sync(df)
+        query = st.text_input("Search", placeholder="first touch under pressure")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            search_players = st.multiselect("Players", vocabulary.options('Player'), key="search_players")
+        with col2:
+            search_coaches = st.multiselect("Coaches", vocabulary.options('Coach'), key="search_coaches")
+        with col3:
+            earliest_date = pd.to_datetime(df['Date']).min().date() if not df.empty else datetime.now().date()
+            search_dates = st.date_input("Date Range", value=(earliest_date, datetime.now().date()), key="search_dates")
+
+        if query.strip():
+            # the range is a single date while the second end is being picked
+            search_dates = list(search_dates) if isinstance(search_dates, (list, tuple)) else [search_dates]
+            start_date = search_dates[0] if search_dates else None
+            end_date = search_dates[1] if len(search_dates) > 1 else None
+            started = time.perf_counter()
+            results = search_index.search(query, players=search_players or None, coaches=search_coaches or None,
+                                          start=start_date, end=end_date)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            st.caption(f"{len(results)} entries ({results['Session_ID'].nunique()} sessions) in {elapsed_ms:.1f} ms")
+            if results.empty:
+                st.info("No sessions match the search.")
+            else:
+                st.dataframe(results[['Player', 'Type', 'Detail', 'Date', 'Coach', 'Notes']], width='stretch', hide_index=True, height=400)
+
     elif page == "Analytics":
         st.header("Training Analytics")
         
@@ -1421,7 +1498,7 @@ def main():
             if not df_recent.empty:
                 player_stats = df_recent.groupby("Player").size().reset_index(name='Sessions')
                 player_stats = player_stats.sort_values('Sessions', ascending=False)
-                st.dataframe(player_stats, use_container_width=True)
+                st.dataframe(player_stats, width='stretch')
         
         with col2:
             st.subheader("Focus Areas")
@@ -1429,7 +1506,7 @@ def main():
                 session_details = df_recent.groupby(["Session_ID", "Detail"]).size().reset_index(name='temp')
                 type_stats = session_details.groupby('Detail').size().reset_index(name='Sessions')
                 type_stats = type_stats.sort_values('Sessions', ascending=False)
-                st.dataframe(type_stats, use_container_width=True)
+                st.dataframe(type_stats, width='stretch')
 
         with col3:
             st.subheader("Sessions by Group")
@@ -1439,7 +1516,7 @@ def main():
                 session_positions = df_recent_copy.groupby(['Session_ID', 'Position Group']).size().reset_index(name='temp')
                 pos_stats = session_positions.groupby('Position Group').size().reset_index(name='Sessions')
                 pos_stats = pos_stats.sort_values('Sessions', ascending=False)
-                st.dataframe(pos_stats, use_container_width=False,column_config={
+                st.dataframe(pos_stats, width='content',column_config={
                     "Position Group": st.column_config.TextColumn(width="small"),  # or "small", "large"
                     "Sessions": st.column_config.NumberColumn(width="small")
                 })
@@ -1452,16 +1529,122 @@ def main():
             coach_stats = coach_stats.groupby("Coach").size().reset_index(name='Sessions')
             coach_stats = coach_stats.sort_values('Sessions', ascending=False)
             st.bar_chart(coach_stats.set_index('Coach')['Sessions'])
+
+        # Squad-wide training calendar
+        st.subheader("Training Calendar")
+        calendar_details = st.multiselect("Detail", sorted(df_analysis['Detail'].dropna().unique()), key="calendar_detail_filter")
+        calendar_index = training_index(TrainingCalendar, EXCEL_FILE).sync(df)
+        calendar_end = datetime.now().date()
+        calendar_start = max(cutoff.date(), calendar_end - timedelta(days=364))
+        days, calendar_players, counts = calendar_index.matrix(calendar_start, calendar_end,
+                                                               types=list(filter_type),
+                                                               details=calendar_details or None,
+                                                               players=players)
+        st.plotly_chart(create_squad_calendar_heatmap(days, calendar_players, counts, "Sessions per Day"), width='stretch')
     
+    elif page == "Squad":
+        st.title("📊 Squad Ratings")
+        st.markdown("Every rostered player rated against the league pool for their most played position")
+
+        squad = load_squad_ratings()
+        if squad.empty:
+            st.info("No season data for the squad yet")
+        else:
+            position_order = {position: i for i, position in enumerate(POSITION_RATINGS)}
+            squad = squad.sort_values(['Position Group', 'Minutes'], ascending=[True, False],
+                                      key=lambda col: col.map(position_order) if col.name == 'Position Group' else col)
+            table = squad_rating_table(squad)
+            rating_columns = [col for col in table.columns if col not in ['Player', 'Position', 'Minutes']]
+            st.dataframe(
+                table.style.background_gradient(cmap='RdYlGn', vmin=0, vmax=100, subset=rating_columns)
+                           .format('{:.0f}', subset=rating_columns, na_rep=''),
+                width='stretch', hide_index=True, height=min(38 * (len(table) + 1), 800),
+            )
+
+            st.plotly_chart(create_squad_radar_grid(squad), width='stretch')
+
+        st.title("🗓️ Availability")
+        availability = load_availability()
+        if not len(availability):
+            st.info("No Racing Mins data yet")
+        else:
+            st.markdown("Minutes per match: starts show minutes played, **+** came on, **U** unused sub, **·** not in squad")
+            totals = availability.totals.sort_values(['Minutes', 'Made Squad'], ascending=False)
+            st.plotly_chart(create_availability_grid(availability, totals['Player'].tolist()), width='stretch')
+            st.dataframe(totals.drop(columns=['Possible Matches']), width='stretch', hide_index=True)
+
+    elif page == "Admin":
+        st.title("🗄️ Shared Data Cache")
+        st.markdown("Tables loaded once for every session and the JSON API, least recently used evicted first")
+
+        info = cache_info()
+        lookups = info['hits'] + info['misses']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1: st.metric("Memory Used", f"{info['used_mb']:.0f} / {info['budget_mb']:.0f} MB")
+        with col2: st.metric("Entries", len(info['entries']))
+        with col3: st.metric("Hit Rate", f"{int(info['hits'] / lookups * 100) if lookups else 0}%", f"{info['hits']} hits | {info['misses']} misses", delta_color="off")
+        with col4: st.metric("Evictions", info['evictions'])
+
+        if info['entries']:
+            st.dataframe(pd.DataFrame(info['entries']), width='stretch', hide_index=True)
+        else:
+            st.info("The cache is empty")
+
+        if st.button("Clear Cache"):
+            clear_cache()
+            st.rerun()
+
+        watcher = start_watcher()
+        if watcher is not None:
+            st.header("Data Watcher")
+            status = watcher.status()
+            st.caption(f"Watching with {status['mode'] or 'starting'} | "
+                       + " | ".join(f"{idp_watch.WATCHED.get(path, path)} v{version}" for path, version in status['versions'].items()))
+            if status['history']:
+                st.dataframe(pd.DataFrame(status['history']), width='stretch', hide_index=True)
+            else:
+                st.info("No data changes since the app started")
+
+        prefetcher = start_prefetcher()
+        if prefetcher is not None:
+            st.header("Prefetch")
+            prefetch = prefetcher.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1: st.metric("Warm Page Visits", f"{prefetch['page_hit_rate']}%", f"{prefetch['warm_visits']} of {prefetch['visits']} player visits", delta_color="off")
+            with col2: st.metric("Prefetched Entries Used", f"{prefetch['entry_hit_rate']}%", f"{prefetch['entries_used']} of {prefetch['entries_prefetched']}", delta_color="off")
+            with col3: st.metric("CPU (last minute)", f"{prefetch['cpu_seconds']} / {prefetch['cpu_budget']:g}s", f"{prefetch['throttled']} throttled", delta_color="off")
+            with col4: st.metric("Pages Warmed", prefetch['pages'], f"{prefetch['cancelled']} cancelled | {prefetch['failed']} failed", delta_color="off")
+            if prefetch['recent']:
+                st.dataframe(pd.DataFrame(prefetch['recent']), width='stretch', hide_index=True)
+
+        if idp_memory.enabled():
+            st.header("Memory Tracking")
+            memory = idp_memory.report()
+            st.caption(f"Writing to {idp_memory.MEMORY_REPORT} | {memory['reruns']} reruns recorded | growth checked over the last {memory['window']}")
+            if memory['flags']:
+                st.warning("Monotonic growth: " + ", ".join(f"{flag['metric']} {flag['from']} → {flag['to']}" for flag in memory['flags']))
+            else:
+                st.success("No monotonic growth detected")
+            recent = pd.DataFrame(memory['records'][-50:][::-1])
+            if not recent.empty:
+                st.dataframe(recent[['rerun', 'time', 'page', 'seconds', 'rss_mb', 'rss_delta_mb', 'figures', 'frames', 'frame_mb', 'cache_mb']],
+                             width='stretch', hide_index=True)
+
     else:
         # Individual player page
         if page.startswith("👤 "):
             player_name = page[2:]  # Remove the emoji prefix
-            display_player_page(player_name, df)
+            try:
+                display_player_page(player_name, df)
+            finally:
+                prefetcher = start_prefetcher()
+                if prefetcher is not None:
+                    prefetcher.visit(page, [option for option in nav_options if option.startswith("👤 ")])
     
     # Footer
     st.markdown("---")
     st.markdown("💡 **Tip:** The app automatically saves data to the Excel file")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with idp_memory.track_rerun():
+        main()
\ No newline at end of file
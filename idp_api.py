@@ -0,0 +1,295 @@
+"""Read-only JSON API over the tracker's data, for pulling numbers into other tools.
+
+Run it next to Streamlit:
+
+    python idp_api.py --port 8502
+
+or set IDP_API_PORT before starting Streamlit and the app starts it on a
+background thread, where it shares the app's in-process caches.
+
+Endpoints (player names URL-encoded):
+
+    GET /players
+    GET /players/<name>
+    GET /players/<name>/overview
+    GET /players/<name>/ratings?positions=CB,FB/WB
+    GET /players/<name>/maps?matches=3986694,3986699
+    GET /players/<name>/training
+    GET /search?q=first+touch&player=<name>&coach=<name>&from=2025-01-01&to=2025-06-30
+
+Every response carries an ETag derived from the versions of the files behind it
+(and today's date, for the responses that count ages or recent sessions).
+Clients that send it back in If-None-Match get a 304 without the body being
+rebuilt, so polling is cheap until a data file actually changes.
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from idp_data import (EXCEL_FILE, MINS_FILE, SEASON_FILE, EVENTS_FILE, data_version, player_id_for,
+                      load_bios, load_training_log, load_season_data, load_card_metrics, load_comp_data,
+                      load_player_matches, calculate_age, season_overview)
+from idp_ratings import ALL_RATINGS, position_minutes, ratings_for_positions, metrics_for_positions
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+def to_json(value):
+    """Convert numpy/pandas values to plain JSON types, with NaN as null"""
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [to_json(v) for v in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if value is None or value is pd.NaT or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
+
+
+def _bio_row(name):
+    bios = load_bios()
+    rows = bios[bios['Player'] == name]
+    if rows.empty:
+        raise NotFound(f"Unknown player: {name}")
+    return rows.iloc[0]
+
+
+def _statsbomb_id(name):
+    _bio_row(name)
+    player_id = player_id_for(name)
+    if player_id is None:
+        raise NotFound(f"No StatsBomb id for {name}")
+    return player_id
+
+
+def list_players(query):
+    return {'players': load_bios()['Player'].tolist()}
+
+
+def player_bio(name, query):
+    row = _bio_row(name)
+    bio = row.to_dict()
+    bio['Age'] = calculate_age(row['DOB'])
+    return bio
+
+
+def player_overview(name, query):
+    _bio_row(name)
+    return season_overview(name)
+
+
+def player_ratings(name, query):
+    player_id = _statsbomb_id(name)
+    season_data = load_season_data()
+    minutes = position_minutes(season_data, player_id)
+    if not minutes:
+        raise NotFound(f"No season data for {name}")
+
+    positions = [p for p in query.get('positions', [''])[0].split(',') if p] or [next(iter(minutes))]
+    unknown = [p for p in positions if p not in minutes]
+    if unknown:
+        raise BadRequest(f"{name} has no minutes at {', '.join(unknown)} (played: {', '.join(minutes)})")
+    comp_data = load_comp_data(positions, player_id)
+    player_row = comp_data[comp_data['player_id'] == player_id].iloc[0]
+
+    return {
+        'positions': positions,
+        'position_minutes': minutes,
+        'minutes': player_row['Minutes'],
+        'radar': {rating: player_row[rating] for rating in ratings_for_positions(positions)},
+        'ratings': {rating: player_row[rating] for rating in ALL_RATINGS if rating in player_row},
+        'metrics': {metric: {'value': player_row.get(metric), 'percentile': player_row.get(f'pct{metric}')}
+                    for metric in metrics_for_positions(positions)},
+    }
+
+
+def _map_minutes(name, player_id, matches=None):
+    """Minutes the player page divides its Activity Map numbers by, for the season or some matches"""
+    if matches:
+        played = load_player_matches(player_id)
+        return int(played.loc[played['match_id'].isin(matches), 'Minutes'].fillna(0).sum())
+    player_mins = season_overview(name)['Minutes']
+    minutes_by_position = position_minutes(load_season_data(), player_id)
+    if player_mins > 100 and minutes_by_position:
+        # the page's radar (default position) replaces them with the season-file minutes
+        comp_data = load_comp_data([next(iter(minutes_by_position))], player_id)
+        player_mins = comp_data[comp_data['player_id'] == player_id].iloc[0].get('Minutes', 0)
+    return player_mins
+
+
+def player_maps(name, query):
+    player_id = _statsbomb_id(name)
+    matches = [int(m) for m in query.get('matches', [''])[0].split(',') if m.strip().isdigit()]
+    if not matches:
+        return load_card_metrics(player_id, _map_minutes(name, player_id))
+    return load_card_metrics(player_id, _map_minutes(name, player_id, matches), matches)
+
+
+def player_training(name, query):
+    _bio_row(name)
+    df = load_training_log()
+    sessions = df[df['Player'] == name].copy()
+    dates = pd.to_datetime(sessions['Date'])
+
+    return {
+        'Total Sessions': len(sessions),
+        'Sessions (Last 30 Days)': int((dates >= datetime.now() - timedelta(days=30)).sum()),
+        'Areas Covered': sessions['Detail'].nunique(),
+        'Last Session': dates.max() if len(sessions) else None,
+        'Types': sessions['Type'].value_counts().to_dict(),
+        'Details': sessions['Detail'].value_counts().to_dict(),
+        'Sessions': sessions.sort_values('Date', ascending=False)[['Date', 'Type', 'Detail', 'Coach', 'Notes', 'Session_ID']].to_dict('records'),
+    }
+
+
+def search_sessions(query):
+    from idp_training import TrainingSearch, tokenize, training_index
+    words = query.get('q', [''])[0]
+    if not words.strip():
+        raise BadRequest("Give the words to search for as ?q=")
+    if not tokenize(words):
+        raise BadRequest(f"Nothing to search for in {words!r} once common words are dropped")
+    index = training_index(TrainingSearch, EXCEL_FILE).sync(load_training_log())
+    results = index.search(words, players=query.get('player'), coaches=query.get('coach'),
+                           start=query.get('from', [None])[0], end=query.get('to', [None])[0])
+    return {'query': words, 'count': len(results), 'sessions': results.to_dict('records')}
+
+
+# resource -> (handler, files the response depends on)
+PLAYER_ROUTES = {
+    None: (player_bio, [EXCEL_FILE]),
+    'overview': (player_overview, [EXCEL_FILE, MINS_FILE]),
+    'ratings': (player_ratings, [EXCEL_FILE, MINS_FILE, SEASON_FILE]),
+    'maps': (player_maps, [EXCEL_FILE, MINS_FILE, SEASON_FILE, EVENTS_FILE]),
+    'training': (player_training, [EXCEL_FILE]),
+}
+
+# handlers whose responses also change with the date (ages, sessions in the last 30 days)
+DATED_HANDLERS = {player_bio, player_training}
+
+_bodies = OrderedDict()
+_bodies_lock = threading.Lock()
+MAX_CACHED_BODIES = 256
+
+
+def _route(path):
+    """(handler, files, player name) for a request path"""
+    parts = [unquote(p) for p in path.strip('/').split('/') if p]
+    if parts == ['players']:
+        return list_players, [EXCEL_FILE], None
+    if parts == ['search']:
+        return search_sessions, [EXCEL_FILE], None
+    if len(parts) in (2, 3) and parts[0] == 'players':
+        resource = parts[2] if len(parts) == 3 else None
+        if resource in PLAYER_ROUTES:
+            handler, files = PLAYER_ROUTES[resource]
+            return handler, files, parts[1]
+    raise NotFound(f"No such endpoint: {path}")
+
+
+def handle(target, if_none_match=None):
+    """Serve one GET request as (status, headers, body bytes)"""
+    url = urlsplit(target)
+    try:
+        handler, files, name = _route(url.path)
+    except NotFound as e:
+        return 404, {}, json.dumps({'error': str(e)}).encode()
+
+    query = parse_qs(url.query)
+    key = (url.path, tuple(sorted((k, tuple(v)) for k, v in query.items())), data_version(*files),
+           date.today().isoformat() if handler in DATED_HANDLERS else None)
+    etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        return 304, headers, b''
+
+    with _bodies_lock:
+        body = _bodies.get(etag)
+        if body is not None:
+            _bodies.move_to_end(etag)
+    if body is None:
+        try:
+            payload = handler(name, query) if name is not None else handler(query)
+        except NotFound as e:
+            return 404, {}, json.dumps({'error': str(e)}).encode()
+        except BadRequest as e:
+            return 400, {}, json.dumps({'error': str(e)}).encode()
+        body = json.dumps(to_json(payload)).encode()
+        with _bodies_lock:
+            _bodies[etag] = body
+            while len(_bodies) > MAX_CACHED_BODIES:
+                _bodies.popitem(last=False)
+    return 200, headers, body
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'RacingIDP/1.0'
+
+    def do_GET(self):
+        try:
+            status, headers, body = handle(self.path, self.headers.get('If-None-Match'))
+        except Exception as e:
+            status, headers, body = 500, {}, json.dumps({'error': str(e)}).encode()
+
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8502):
+    return ThreadingHTTPServer((host, port), RequestHandler)
+
+
+def start_in_background(host='127.0.0.1', port=8502):
+    """Start the API on a daemon thread and return the server"""
+    server = make_server(host, port)
+    threading.Thread(target=server.serve_forever, name='idp-api', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Racing IDP Tracker data as read-only JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
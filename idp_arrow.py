@@ -0,0 +1,256 @@
+"""Memory-mapped Arrow copies of the league events and season tables.
+
+Each parquet file gets an uncompressed Arrow IPC (Feather v2) twin next to it,
+rebuilt whenever the parquet changes. Opening the twin memory-maps it, so the
+column buffers live in the OS page cache and every Streamlit worker on the host
+shares one copy instead of deserialising its own. The events twin is sorted by
+player_id and then match_id, so a player's events, and their events in any one
+match, are contiguous zero-copy slices.
+
+    python idp_arrow.py export
+    python idp_arrow.py benchmark --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from idp_data import EVENTS_FILE, SEASON_FILE
+from idp_files import file_lock, replace_atomically
+
+
+# parquet file -> column its Arrow twin is sorted and sliced by
+ARROW_TABLES = {
+    EVENTS_FILE: 'player_id',
+    SEASON_FILE: None,
+}
+
+# parquet file -> column rows are sorted by within each key value
+ARROW_SUBKEYS = {
+    EVENTS_FILE: 'match_id',
+}
+SORT_METADATA = b'idp_sorted_by'
+SOURCE_METADATA = b'idp_source'
+
+logger = logging.getLogger(__name__)
+
+
+def arrow_path(path):
+    return os.path.splitext(path)[0] + '.arrow'
+
+
+def _sort_columns(path, key):
+    return [column for column in (key, ARROW_SUBKEYS.get(path) if key is not None else None) if column is not None]
+
+
+def _source_signature(path):
+    """(size, mtime_ns) of the parquet a twin was exported from, as stored in the twin"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+def _sorted(table, columns):
+    columns = [column for column in columns if column in table.column_names]
+    if not columns:
+        return table
+    table = table.sort_by([(column, 'ascending') for column in columns])
+    metadata = dict(table.schema.metadata or {})
+    metadata[SORT_METADATA] = ','.join(columns).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def export_arrow(path, key=None):
+    """Write the uncompressed Arrow twin of a parquet file, sorted by `key` (and its subkey)"""
+    # stat before reading, so a parquet replaced mid-export never matches the twin
+    signature = _source_signature(path)
+    table = _sorted(pq.read_table(path), _sort_columns(path, key))
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_METADATA] = signature
+    table = table.replace_schema_metadata(metadata)
+    replace_atomically(arrow_path(path), lambda f: feather.write_feather(table, f, compression='uncompressed'))
+
+
+def _is_current(path, key):
+    """Whether the Arrow twin was exported from the parquet as it is now, sorted the way `key` needs
+
+    The twin records the parquet's (size, mtime_ns) and must match it exactly: a
+    parquet replaced by a copy with an older timestamp still counts as changed.
+    """
+    target = arrow_path(path)
+    try:
+        with pa.memory_map(target) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    if metadata.get(SOURCE_METADATA) != _source_signature(path):
+        return False
+    if not _sort_columns(path, key):
+        return True
+    return metadata.get(SORT_METADATA, b'').decode() == ','.join(_sort_columns(path, key))
+
+
+def ensure_arrow(path, key=None):
+    """Path of an up-to-date Arrow twin of `path`, exporting it first if it is missing or stale"""
+    target = arrow_path(path)
+    if _is_current(path, key):
+        return target
+    with file_lock(target):
+        # another worker may have exported it while we waited
+        if not _is_current(path, key):
+            export_arrow(path, key)
+    return target
+
+
+class ArrowTable:
+    """An Arrow table sorted by a key column, with the row range of every key value
+
+    With a subkey (rows sorted by it within each key value) it also keeps the row
+    range of every (key, subkey) pair: `subrows[player_id][match_id]`.
+    """
+
+    def __init__(self, table, key=None, subkey=None):
+        self.table = table
+        self.key = key
+        self.subkey = subkey
+        self.rows = {}
+        self.subrows = {}
+        if key is not None and key in table.column_names:
+            column = table.column(key)
+            keys = column.slice(0, len(column) - column.null_count).to_numpy()
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+            stops = np.r_[starts[1:], len(keys)]
+            self.rows = {keys[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+            if subkey is not None and subkey in table.column_names and len(keys):
+                subkeys = table.column(subkey).slice(0, len(keys)).to_numpy(zero_copy_only=False)
+                changed = np.r_[True, (keys[1:] != keys[:-1]) | (subkeys[1:] != subkeys[:-1])]
+                starts = np.flatnonzero(changed)
+                stops = np.r_[starts[1:], len(keys)]
+                for start, stop in zip(starts, stops):
+                    if not pd.isna(subkeys[start]):
+                        self.subrows.setdefault(keys[start], {})[subkeys[start]] = (start, stop)
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def slice(self, value):
+        """Zero-copy Arrow slice of the rows whose key equals `value`"""
+        start, stop = self.rows.get(value, (0, 0))
+        return self.table.slice(start, stop - start)
+
+    def subslice(self, value, subvalues):
+        """Arrow table of one key's rows for the given subkey values (zero-copy chunks)"""
+        ranges = self.subrows.get(value, {})
+        parts = [self.table.slice(start, stop - start) for start, stop in sorted(ranges[v] for v in subvalues if v in ranges)]
+        return pa.concat_tables(parts) if parts else self.table.slice(0, 0)
+
+    def frame(self, value, columns=None, subvalues=None):
+        """pandas frame of one key's rows, or of its rows for some subkey values (numeric columns without nulls are not copied)"""
+        table = self.slice(value) if subvalues is None else self.subslice(value, subvalues)
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas(split_blocks=True)
+
+    def to_pandas(self, columns=None):
+        table = self.table if columns is None else self.table.select(columns)
+        return table.to_pandas(split_blocks=True)
+
+
+def open_arrow(path, key=None):
+    """Memory-map the Arrow twin of a parquet file, falling back to reading the parquet into memory"""
+    try:
+        table = feather.read_table(ensure_arrow(path, key), memory_map=True)
+    except OSError as e:
+        logger.warning("Could not memory-map an Arrow copy of %s (%s), reading the parquet instead", path, e)
+        table = _sorted(pq.read_table(path), _sort_columns(path, key))
+    return ArrowTable(table, key, ARROW_SUBKEYS.get(path) if key is not None else None)
+
+
+def _memory_mb():
+    """(resident, private) MB of this process; private excludes shared file-backed pages"""
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        rss = int(status['VmRSS'].split()[0]) / 1024
+        anon = int(status.get('RssAnon', status['VmRSS']).split()[0]) / 1024
+        return rss, anon
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return rss, rss
+
+
+def _benchmark_worker(mode, player_ids, barrier, results):
+    started = time.perf_counter()
+    if mode == 'parquet':
+        import pandas as pd
+        events = pd.read_parquet(EVENTS_FILE)
+        player_events = lambda player_id: events[events['player_id'] == player_id]
+    else:
+        events = ArrowTable(feather.read_table(arrow_path(EVENTS_FILE), memory_map=True), 'player_id')
+        player_events = events.frame
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for player_id in player_ids:
+        started = time.perf_counter()
+        player_events(player_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    barrier.wait()  # measure while every worker holds its data
+    rss, private = _memory_mb()
+    results.put({'load s': load_seconds, 'slice ms': statistics.median(latencies), 'rss MB': rss, 'private MB': private})
+    barrier.wait()
+
+
+def benchmark(workers=4, players=50):
+    """RSS per worker and player slice latency for pd.read_parquet vs the memory-mapped Arrow twin"""
+    ensure_arrow(EVENTS_FILE, ARROW_TABLES[EVENTS_FILE])
+    player_ids = pq.read_table(EVENTS_FILE, columns=['player_id']).column('player_id').drop_null().unique().to_pylist()[:players]
+    context = multiprocessing.get_context('spawn')
+
+    for mode in ('parquet', 'arrow'):
+        barrier, results = context.Barrier(workers), context.Queue()
+        processes = [context.Process(target=_benchmark_worker, args=(mode, player_ids, barrier, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        summary = {key: statistics.mean(row[key] for row in rows) for key in rows[0]}
+        print(f"{mode:>8}: {workers} workers | load {summary['load s']:.2f}s | slice {summary['slice ms']:.2f}ms"
+              f" | RSS {summary['rss MB']:.0f} MB/worker | private {summary['private MB']:.0f} MB/worker"
+              f" | private total {sum(row['private MB'] for row in rows):.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and benchmark the memory-mapped Arrow data files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('export', help="Rebuild the Arrow twins of the event and season files")
+    bench = commands.add_parser('benchmark', help="Compare worker memory and slice latency with pd.read_parquet")
+    bench.add_argument('--workers', type=int, default=4)
+    bench.add_argument('--players', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        for path, key in ARROW_TABLES.items():
+            export_arrow(path, key)
+            print(f"{path} -> {arrow_path(path)}")
+    else:
+        benchmark(args.workers, args.players)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Squad availability: a player x match matrix built once from Racing Mins.
+
+Each cell holds the player's status for that match and the minutes they
+played. The status is one of not in the squad, unused sub, came on,
+started, or no record. The per-player season totals are computed from the
+matrix in one vectorised pass: made squad, played, started, minutes, % of
+possible minutes, and unused-sub streaks. After that, the Season Overview
+tiles are a dict lookup and the squad grid is the matrix itself. The
+matrix is rebuilt only when the parquet changes (idp_data.load_availability).
+"""
+import numpy as np
+import pandas as pd
+
+
+NO_RECORD, NOT_IN_SQUAD, UNUSED, CAME_ON, STARTED = -1, 0, 1, 2, 3
+STATUS_LABELS = {NO_RECORD: '', NOT_IN_SQUAD: 'Not in squad', UNUSED: 'Unused sub', CAME_ON: 'Came on', STARTED: 'Started'}
+
+
+def _streaks(flags):
+    """(current, longest) runs of True along each row of a (players, matches) bool array"""
+    current = np.zeros(len(flags), dtype=int)
+    longest = np.zeros(len(flags), dtype=int)
+    for column in flags.T:
+        current = np.where(column, current + 1, 0)
+        longest = np.maximum(longest, current)
+    return current, longest
+
+
+class AvailabilityMatrix:
+    def __init__(self, game_overview):
+        rows = game_overview.drop_duplicates(['Player', 'match_id'])
+        self.players = list(dict.fromkeys(rows['Player']))
+        self.matches = (rows.groupby('match_id', sort=False)
+                            .agg(match_date=('match_date', 'first'), Opponent=('Opponent', 'first'),
+                                 Venue=('Venue', 'first'), Length=('Minutes', 'max'))
+                            .reset_index())
+        self.matches['match_date'] = pd.to_datetime(self.matches['match_date'])
+        self.matches = self.matches.sort_values(['match_date', 'match_id']).reset_index(drop=True)
+        self.player_rows = {player: i for i, player in enumerate(self.players)}
+        self.match_columns = {match_id: j for j, match_id in enumerate(self.matches['match_id'])}
+
+        i = rows['Player'].map(self.player_rows).to_numpy()
+        j = rows['match_id'].map(self.match_columns).to_numpy()
+        status = np.select([rows['Started'] == True, rows['Came On'] == True, rows['In Squad'] == True],
+                           [STARTED, CAME_ON, UNUSED], NOT_IN_SQUAD)
+        self.status = np.full((len(self.players), len(self.matches)), NO_RECORD, dtype=np.int8)
+        self.status[i, j] = status
+        self.minutes = np.zeros(self.status.shape, dtype=np.int32)
+        self.minutes[i, j] = rows['Minutes'].fillna(0).to_numpy()
+
+        self.totals = self._totals()
+
+    def _totals(self):
+        possible_minutes = self.matches['Length'].sum()
+        minutes = self.minutes.sum(axis=1)
+        current, longest = _streaks(self.status == UNUSED)
+        totals = pd.DataFrame({
+            'Player': self.players,
+            'Possible Matches': len(self.matches),
+            'Made Squad': (self.status >= UNUSED).sum(axis=1),
+            'Played': (self.status >= CAME_ON).sum(axis=1),
+            'Started': (self.status == STARTED).sum(axis=1),
+            'Came On': (self.status == CAME_ON).sum(axis=1),
+            'Unused Sub': (self.status == UNUSED).sum(axis=1),
+            'Minutes': minutes,
+            '% of Mins': (minutes / possible_minutes * 100).astype(int) if possible_minutes else 0,
+            'Unused Streak': current,
+            'Longest Unused Streak': longest,
+        })
+        return totals.set_index('Player', drop=False)
+
+    def overview(self, player):
+        """Season Overview numbers for a player (zeros if they have no Racing Mins rows)"""
+        if player in self.player_rows:
+            row = self.totals.loc[player]
+            return {key: int(row[key]) for key in ['Possible Matches', 'Made Squad', 'Played', 'Started', 'Came On', 'Minutes', '% of Mins']}
+        return {'Possible Matches': len(self.matches), 'Made Squad': 0, 'Played': 0, 'Started': 0, 'Came On': 0, 'Minutes': 0, '% of Mins': 0}
+
+    def minutes_in(self, player, match_ids):
+        """Minutes a player played in `match_ids`"""
+        if player not in self.player_rows:
+            return 0
+        columns = [self.match_columns[match_id] for match_id in match_ids if match_id in self.match_columns]
+        return int(self.minutes[self.player_rows[player], columns].sum())
+
+    def opponents(self):
+        """match_id -> opponent"""
+        return dict(zip(self.matches['match_id'], self.matches['Opponent']))
+
+    def __len__(self):
+        return len(self.players)
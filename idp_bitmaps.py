@@ -0,0 +1,181 @@
+"""Per-player bitmap indexes over event flags, for ad-hoc Activity Map filters.
+
+For each player, every event flag and event type is kept as a bitset: a Python
+int whose bit i is set when the player's i-th event (in the order of the
+memory-mapped events table) has the flag. A filter like "transition shots" is
+then a few bitwise ops on ints of a few hundred bits. That takes microseconds
+and never touches the events. Only the matching rows are taken from the Arrow
+table afterwards.
+
+Filters are nested tuples:
+- a flag name, or 'type:<event type>';
+- ('and', [filters]), ('or', [filters]) or ('not', filter).
+PRESETS holds the common ones.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# flag -> label, for the boolean event columns
+FLAG_COLUMNS = {
+    'completed_pass': 'Completed pass',
+    'pass_cross': 'Cross',
+    'pass_shot_assist': 'Shot assist',
+    'pass_goal_assist': 'Goal assist',
+    'is_progressive': 'Progressive pass',
+    'is_progressive_carry': 'Progressive carry',
+    'is_box_entry': 'Box entry',
+    'under_pressure': 'Under pressure',
+    'pressure_in_prev_15s': 'Within 15s of a pressure',
+    'counter_shot': 'Counter-attack shot',
+    'shot_from_corner': 'Shot from a corner',
+    'shot_from_fk': 'Shot from a free kick',
+    'pressure_leading_to_shot': 'Pressure leading to a shot',
+}
+
+# flag -> (label, column, values it is set for)
+DERIVED_FLAGS = {
+    'goal': ('Goal', 'shot_outcome', ['Goal']),
+    'penalty': ('Penalty', 'shot_type', ['Penalty']),
+    'set_piece_pass': ('Set-piece pass', 'pass_type', ['Free Kick', 'Corner']),
+    'complete_dribble': ('Completed dribble', 'dribble_outcome', ['Complete']),
+}
+
+PRESETS = {
+    'Transition shots': ('and', ['type:Shot', ('or', ['pressure_in_prev_15s', 'counter_shot'])]),
+    'Set-piece shots': ('and', ['type:Shot', ('or', ['shot_from_corner', 'shot_from_fk'])]),
+    'Non-penalty goals': ('and', ['type:Shot', 'goal', ('not', 'penalty')]),
+    'Set-piece key passes': ('and', ['type:Pass', 'set_piece_pass', ('or', ['pass_shot_assist', 'pass_goal_assist'])]),
+    'Open-play key passes': ('and', ['type:Pass', ('not', 'set_piece_pass'), ('or', ['pass_shot_assist', 'pass_goal_assist'])]),
+    'Completed crosses': ('and', ['type:Pass', 'pass_cross', 'completed_pass']),
+    'Passes under pressure': ('and', ['type:Pass', 'under_pressure']),
+    'Box entries': 'is_box_entry',
+    'Progressive actions': ('or', [('and', ['type:Pass', 'is_progressive', 'completed_pass']), ('and', ['type:Carry', 'is_progressive_carry'])]),
+    'Pressures leading to shots': ('and', ['type:Pressure', 'pressure_leading_to_shot']),
+}
+
+
+def flag_labels(types=()):
+    """flag -> label for every flag a filter can use, event types included"""
+    labels = dict(FLAG_COLUMNS)
+    labels.update((flag, label) for flag, (label, _, _) in DERIVED_FLAGS.items())
+    labels.update((f"type:{event_type}", event_type) for event_type in types)
+    return labels
+
+
+def _bits(mask):
+    """A boolean array as an int with bit i set where mask[i] is"""
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+
+def _positions(bits, length):
+    """Indexes of the set bits of `bits`"""
+    if not bits:
+        return np.array([], dtype=np.int64)
+    packed = np.frombuffer(bits.to_bytes((length + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little')[:length])
+
+
+class EventBitmaps:
+    """Bitsets of every flag and event type for each player of an ArrowTable keyed by player_id"""
+
+    def __init__(self, event_table):
+        self.event_table = event_table
+        table = event_table.table
+        masks = {}
+        for column in FLAG_COLUMNS:
+            if column in table.column_names:
+                masks[column] = _true(table.column(column))
+        for flag, (_, column, values) in DERIVED_FLAGS.items():
+            if column in table.column_names:
+                masks[flag] = pc.is_in(table.column(column), value_set=pa.array(values)).fill_null(False).to_numpy(zero_copy_only=False)
+        self.types = []
+        if 'type' in table.column_names:
+            types = table.column('type').fill_null('').to_numpy(zero_copy_only=False)
+            self.types = sorted(event_type for event_type in set(types) if event_type)
+            for event_type in self.types:
+                masks[f"type:{event_type}"] = types == event_type
+        self.flags = list(masks)
+
+        self.bitsets = {}
+        for player_id, (start, stop) in event_table.rows.items():
+            self.bitsets[player_id] = {flag: _bits(mask[start:stop]) for flag, mask in masks.items()}
+
+    def _length(self, player_id):
+        start, stop = self.event_table.rows.get(player_id, (0, 0))
+        return int(stop - start)
+
+    def match_bits(self, player_id, match_ids):
+        """Bitset of the player's events in `match_ids`"""
+        start = self.event_table.rows.get(player_id, (0, 0))[0]
+        ranges = self.event_table.subrows.get(player_id, {})
+        bits = 0
+        for match_id in match_ids:
+            if match_id in ranges:
+                lo, hi = ranges[match_id]
+                bits |= ((1 << int(hi - lo)) - 1) << int(lo - start)
+        return bits
+
+    def evaluate(self, player_id, spec):
+        """Bitset of the player's events matching a filter"""
+        bitsets = self.bitsets.get(player_id)
+        if bitsets is None:
+            return 0
+        everything = (1 << self._length(player_id)) - 1
+
+        def run(node):
+            if isinstance(node, str):
+                if node not in bitsets:
+                    raise ValueError(f"Unknown event flag: {node}")
+                return bitsets[node]
+            op, args = node
+            if op == 'not':
+                return everything & ~run(args)
+            if op == 'and':
+                bits = everything
+                for arg in args:
+                    bits &= run(arg)
+                return bits
+            if op == 'or':
+                bits = 0
+                for arg in args:
+                    bits |= run(arg)
+                return bits
+            raise ValueError(f"Unknown filter operator: {op}")
+
+        return run(spec)
+
+    def count(self, player_id, spec, match_ids=None):
+        bits = self.evaluate(player_id, spec)
+        if match_ids is not None:
+            bits &= self.match_bits(player_id, match_ids)
+        return bits.bit_count() if hasattr(bits, 'bit_count') else bin(bits).count('1')
+
+    def select(self, player_id, spec, match_ids=None, columns=None):
+        """pandas frame of the player's events matching a filter (in `match_ids` if given)"""
+        bits = self.evaluate(player_id, spec)
+        if match_ids is not None:
+            bits &= self.match_bits(player_id, match_ids)
+        start = self.event_table.rows.get(player_id, (0, 0))[0]
+        table = self.event_table.table if columns is None else self.event_table.table.select(columns)
+        return table.take(pa.array(start + _positions(bits, self._length(player_id)))).to_pandas(split_blocks=True)
+
+
+def _true(column):
+    """Rows where a column is True (booleans, or objects holding True/None)"""
+    if pa.types.is_boolean(column.type):
+        return column.fill_null(False).to_numpy(zero_copy_only=False)
+    return column.to_numpy(zero_copy_only=False) == True
+
+
+def describe(spec, labels=None):
+    """A filter as text, e.g. 'Shot and (Within 15s of a pressure or Counter-attack shot)'"""
+    labels = labels or {}
+    if isinstance(spec, str):
+        return labels.get(spec, spec.removeprefix('type:'))
+    op, args = spec
+    if op == 'not':
+        return f"not {describe(args, labels)}"
+    parts = [describe(arg, labels) if isinstance(arg, str) or arg[0] == 'not' else f"({describe(arg, labels)})" for arg in args]
+    return f" {op} ".join(parts)
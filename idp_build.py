@@ -0,0 +1,314 @@
+"""Build every derived artifact the app reads, rebuilding only what is out of date.
+
+    python idp_build.py                 # build what changed
+    python idp_build.py --dry-run       # list what would be built
+    python idp_build.py --force --jobs 8
+    python idp_build.py --only comp_data card_metrics
+
+Artifacts:
+
+- the memory-mapped Arrow copies of the events and season files (the events
+  copy gives one contiguous partition per player);
+- the per-match form series;
+- the league hexbin grids;
+- the image manifest;
+- the rated comp_data tables, comparison ratings and Activity Map card numbers
+  of every squad player;
+- the league metric distributions of the squad's position groups;
+- the squad ratings.
+
+Apart from the Arrow files, they are stored in the on-disk result cache
+(idp_diskcache), where the app looks for them first.
+
+Each step lists the raw inputs it depends on. The SHA-1 of those inputs, and
+of the source files of the code that built its cached results, is recorded in
+BUILD_MANIFEST after a successful build. A step runs again only when an input
+or that code changed, its outputs are missing, or a step it depends on was
+rebuilt. Independent steps run in parallel. Builds hold a lock
+on BUILD_MANIFEST, so builds from several processes (the CLI and every app
+worker's watcher) run one at a time instead of overwriting each other's manifest.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from idp_data import (MINS_FILE, SEASON_FILE, EVENTS_FILE, IMAGES_FOLDER, squad_player_ids,
+                      load_season_data, load_form_series, load_hex_counts, load_image_manifest, load_comp_data,
+                      load_comparison_ratings, load_metric_distributions, load_squad_ratings, load_card_metrics,
+                      recording_disk_keys)
+from idp_diskcache import code_files, file_digest, has
+from idp_files import file_lock, replace_atomically
+
+
+BUILD_MANIFEST = os.environ.get('IDP_BUILD_MANIFEST', '.idp_build.json')
+
+
+class Step:
+    def __init__(self, name, inputs, build, after=(), description=''):
+        self.name = name
+        self.inputs = inputs
+        self.build = build    # returns its ('file', path) outputs; the disk cache keys it loads are recorded
+        self.after = after
+        self.description = description
+
+
+def _arrow(path, key):
+    def build():
+        from idp_arrow import ensure_arrow
+        return [('file', ensure_arrow(path, key))]
+    return build
+
+
+def _cached(load):
+    def build():
+        load()
+        return []
+    return build
+
+
+def squad_positions():
+    """(player_id, default positions) of every squad player with season data, as their page first shows them"""
+    from idp_ratings import position_minutes
+    season_data = load_season_data()
+    players = []
+    for player_id in squad_player_ids():
+        minutes = position_minutes(season_data, player_id)
+        if minutes:
+            players.append((player_id, [next(iter(minutes))]))
+    return players
+
+
+def build_comp_data():
+    for player_id, positions in squad_positions():
+        load_comp_data(positions, player_id)
+    return []
+
+
+def build_comparison_ratings():
+    for player_id, positions in squad_positions():
+        load_comparison_ratings(positions, player_id)
+    return []
+
+
+def build_metric_distributions():
+    for positions in dict.fromkeys(tuple(sorted(positions)) for _, positions in squad_positions()):
+        load_metric_distributions(positions)
+    return []
+
+
+def build_squad_ratings():
+    load_squad_ratings()
+    return []
+
+
+def build_card_metrics():
+    """Card numbers for the minutes each player's page passes (their row of the default comp_data table)"""
+    with recording_disk_keys():  # the comp_data tables it reads belong to the comp_data step
+        tables = [(player_id, load_comp_data(positions, player_id)) for player_id, positions in squad_positions()]
+    for player_id, comp_data in tables:
+        player_mins = comp_data[comp_data['player_id'] == player_id].iloc[0].get('Minutes', 0)
+        load_card_metrics(player_id, player_mins)
+    return []
+
+
+STEPS = [
+    Step('events_arrow', [EVENTS_FILE], _arrow(EVENTS_FILE, 'player_id'),
+         description="Arrow copy of the league events, partitioned by player"),
+    Step('season_arrow', [SEASON_FILE], _arrow(SEASON_FILE, None),
+         description="Arrow copy of the season percentiles"),
+    Step('form_series', [EVENTS_FILE, MINS_FILE], _cached(load_form_series),
+         after=['events_arrow'], description="Per-match form series"),
+    Step('hex_counts', [EVENTS_FILE, MINS_FILE], _cached(load_hex_counts),
+         after=['form_series'], description="League hexbin grids"),
+    Step('image_manifest', [IMAGES_FOLDER], _cached(load_image_manifest),
+         description="Match report image manifest"),
+    Step('comp_data', [SEASON_FILE, MINS_FILE], build_comp_data, after=['season_arrow'],
+         description="Rated comp_data tables of the squad"),
+    Step('comparison_ratings', [SEASON_FILE, MINS_FILE], build_comparison_ratings, after=['season_arrow'],
+         description="Comparison player ratings of the squad"),
+    Step('metric_distributions', [SEASON_FILE, MINS_FILE], build_metric_distributions, after=['season_arrow'],
+         description="League metric distributions of the squad's positions"),
+    Step('squad_ratings', [SEASON_FILE, MINS_FILE], build_squad_ratings, after=['season_arrow'], description="Squad page ratings"),
+    Step('card_metrics', [EVENTS_FILE, SEASON_FILE, MINS_FILE], build_card_metrics, after=['events_arrow', 'comp_data'],
+         description="Activity Map card numbers of the squad"),
+]
+
+
+def read_manifest(path=BUILD_MANIFEST):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest, path=BUILD_MANIFEST):
+    data = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    replace_atomically(path, lambda f: f.write(data))
+
+
+def input_digests(step):
+    return {path: file_digest(path) for path in step.inputs}
+
+
+def code_digests(paths):
+    return {path: file_digest(path) for path in paths}
+
+
+def outputs_exist(outputs):
+    for kind, target in outputs:
+        if kind == 'file' and not os.path.exists(target):
+            return False
+        if kind == 'cache' and not has(target):
+            return False
+    return True
+
+
+def stale_reason(step, manifest, rebuilt):
+    """Why `step` has to run, or None if its recorded build is still valid"""
+    record = manifest.get(step.name)
+    if record is None:
+        return "never built"
+    changed = [path for path, digest in input_digests(step).items() if record['inputs'].get(path) != digest]
+    if changed:
+        return f"changed: {', '.join(changed)}"
+    changed = [path for path, digest in record.get('code', {}).items() if file_digest(path) != digest]
+    if changed:
+        return f"code changed: {', '.join(os.path.basename(path) for path in changed)}"
+    if not outputs_exist([tuple(output) for output in record['outputs']]):
+        return "outputs missing"
+    upstream = [name for name in step.after if name in rebuilt]
+    if upstream:
+        return f"after {', '.join(upstream)}"
+    return None
+
+
+def steps_using(paths):
+    """Names of the steps that read any of `paths`, and of the steps after them"""
+    paths = set(paths)
+    names = set()
+    for step in STEPS:  # every step is listed after the steps it needs
+        if paths & set(step.inputs) or names & set(step.after):
+            names.add(step.name)
+    return [step.name for step in STEPS if step.name in names]
+
+
+def _selected(only):
+    """Steps named in `only` and everything they depend on"""
+    if not only:
+        return list(STEPS)
+    by_name = {step.name: step for step in STEPS}
+    unknown = set(only) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown steps: {', '.join(sorted(unknown))}")
+    wanted, pending = set(), list(only)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending += by_name[name].after
+    return [step for step in STEPS if step.name in wanted]
+
+
+def build(only=None, force=False, jobs=4, dry_run=False, log=print):
+    """Run every out-of-date step (independent ones in parallel) and return one result row per step"""
+    with file_lock(BUILD_MANIFEST):
+        return _build(_selected(only), force, jobs, dry_run, log)
+
+
+def _build(steps, force, jobs, dry_run, log):
+    manifest = read_manifest()
+    results = {}
+    rebuilt = set()
+    done = set()
+    running = {}
+    started = time.perf_counter()
+
+    def run(step, reason):
+        step_started = time.perf_counter()
+        with recording_disk_keys() as loaded:
+            outputs = step.build()
+        outputs += [('cache', key) for key in dict.fromkeys(key for key, _ in loaded)]
+        code = sorted({path for _, load in loaded for path in code_files(load)})
+        return reason, outputs, code, time.perf_counter() - step_started
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while len(done) < len(steps):
+            for step in steps:
+                if step.name in done or step.name in running.values() or any(name not in done for name in step.after if name in {s.name for s in steps}):
+                    continue
+                if any(results.get(name, {}).get('status') == 'failed' for name in step.after):
+                    results[step.name] = {'step': step.name, 'status': 'skipped', 'reason': "a step it needs failed", 'seconds': 0}
+                    done.add(step.name)
+                    continue
+                reason = "forced" if force else stale_reason(step, manifest, rebuilt)
+                if reason is None or dry_run:
+                    results[step.name] = {'step': step.name, 'status': 'up to date' if reason is None else 'would build',
+                                          'reason': reason or '', 'seconds': 0}
+                    if reason is not None:
+                        rebuilt.add(step.name)
+                    done.add(step.name)
+                    continue
+                log(f"building {step.name} ({reason})")
+                running[pool.submit(run, step, reason)] = step.name
+
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                step = next(s for s in steps if s.name == name)
+                try:
+                    reason, outputs, code, seconds = future.result()
+                except Exception as e:
+                    log(f"{name} failed: {e}")
+                    results[name] = {'step': name, 'status': 'failed', 'reason': str(e), 'seconds': 0}
+                else:
+                    manifest[name] = {'inputs': input_digests(step), 'code': code_digests(code), 'outputs': outputs, 'seconds': round(seconds, 2),
+                                      'built': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+                    write_manifest(manifest)
+                    results[name] = {'step': name, 'status': 'built', 'reason': reason, 'seconds': seconds, 'outputs': len(outputs)}
+                    rebuilt.add(name)
+                done.add(name)
+
+    total = time.perf_counter() - started
+    return [results[step.name] for step in steps], total
+
+
+def print_summary(rows, total):
+    print(f"{'step':<22}{'status':<14}{'seconds':>9}  reason")
+    for row in rows:
+        print(f"{row['step']:<22}{row['status']:<14}{row['seconds']:>9.2f}  {row['reason']}")
+    step_seconds = sum(row['seconds'] for row in rows)
+    print(f"{sum(row['status'] == 'built' for row in rows)} built, {sum(row['status'] == 'up to date' for row in rows)} up to date"
+          f" | {total:.2f}s wall, {step_seconds:.2f}s of step time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the app's derived data, rebuilding only what changed")
+    parser.add_argument('--only', nargs='+', metavar='STEP', help="Build these steps (and the steps they need)")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the inputs are unchanged")
+    parser.add_argument('--jobs', type=int, default=4, help="Steps to run at once")
+    parser.add_argument('--dry-run', action='store_true', help="Only list what would be built")
+    parser.add_argument('--list', action='store_true', help="List the steps and their inputs")
+    args = parser.parse_args()
+
+    if args.list:
+        for step in STEPS:
+            after = f" (after {', '.join(step.after)})" if step.after else ''
+            print(f"{step.name:<22}{step.description}{after}\n{'':<22}inputs: {', '.join(step.inputs)}")
+        return
+    try:
+        rows, total = build(args.only, args.force, args.jobs, args.dry_run)
+    except ValueError as e:
+        parser.error(str(e))
+    print_summary(rows, total)
+    if any(row['status'] == 'failed' for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
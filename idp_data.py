@@ -0,0 +1,415 @@
+"""Data files behind the app and process-wide cached loaders for them.
+
+Every loader is keyed on the modification time of its source files, so a replaced
+file is picked up on the next call without restarting the server. The Streamlit
+app and the JSON API share these caches when they run in the same process, and
+all browser sessions share one copy of each table. The cache is trimmed to
+IDP_CACHE_BUDGET_MB (default 1024) by evicting the least recently used entries.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+EXCEL_FILE = "MitchIDPs.xlsx"
+MINS_FILE = "Racing Mins.parquet"
+SEASON_FILE = "NWSL2025-AppPlayerSeasonPercentiles.parquet"
+EVENTS_FILE = "NWSL2025-AppLeagueEvents.parquet"
+IMAGES_FOLDER = "IDP Images"
+
+
+def file_version(path):
+    """Modification time of `path`, or None if it doesn't exist"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def data_version(*paths):
+    """Combined version of several files, for cache keys and ETags"""
+    return tuple(file_version(path) for path in paths)
+
+
+# Process-wide cache: one copy of each table for every session and API thread,
+# kept in least-recently-used order and trimmed to a memory budget
+CACHE_BUDGET_MB = float(os.environ.get('IDP_CACHE_BUDGET_MB', 1024))
+
+_cache = OrderedDict()   # name -> CacheEntry, least recently used first
+_cache_lock = threading.Lock()
+_build_locks = {}        # name -> [lock, callers], only while a build of that name is running or waited on
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'prefetched': 0, 'prefetch_used': 0}
+_local = threading.local()
+
+
+class CacheEntry:
+    def __init__(self, version, value, size, build_seconds, paths=()):
+        self.version = version
+        self.paths = frozenset(os.path.abspath(path) for path in paths)
+        self.value = value
+        self.size = size
+        self.build_seconds = build_seconds
+        self.built_at = datetime.now()
+        self.hits = 0
+        self.prefetched = getattr(_local, 'prefetching', False)
+        self.used = not self.prefetched
+
+
+def memory_size(value, _seen=None):
+    """Approximate bytes held by a cached value (frames, arrays and the objects built from them)"""
+    _seen = set() if _seen is None else _seen
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(memory_size(k, _seen) + memory_size(v, _seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(memory_size(v, _seen) for v in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + memory_size(vars(value), _seen)
+    return sys.getsizeof(value)
+
+
+def _evict(keep):
+    """Drop least recently used entries until the cache fits the budget (caller holds the lock)"""
+    budget = CACHE_BUDGET_MB * 1024 * 1024
+    total = sum(entry.size for entry in _cache.values())
+    for name in list(_cache):
+        if total <= budget:
+            break
+        if name == keep:
+            continue
+        total -= _cache.pop(name).size
+        _cache_stats['evictions'] += 1
+
+
+@contextmanager
+def prefetching():
+    """Mark cache entries built in this block as speculative, so their later use can be counted"""
+    _local.prefetching = True
+    try:
+        yield
+    finally:
+        _local.prefetching = False
+
+
+@contextmanager
+def recording_disk_keys():
+    """Collect the (key, build) of every `cached_on_disk` result looked up by this thread in this block"""
+    outer, _local.disk_keys = getattr(_local, 'disk_keys', None), []
+    try:
+        yield _local.disk_keys
+    finally:
+        _local.disk_keys = outer
+
+
+def _hit(name, entry):
+    """Count a hit on a current entry (caller holds the lock)"""
+    _cache.move_to_end(name)
+    entry.hits += 1
+    _cache_stats['hits'] += 1
+    if not entry.used and not getattr(_local, 'prefetching', False):
+        entry.used = True
+        _cache_stats['prefetch_used'] += 1
+    return entry.value
+
+
+def cached(name, paths, build):
+    """Return `build()`, reusing the last result for `name` until a file in `paths` changes.
+
+    Concurrent callers asking for the same missing entry wait for a single build.
+    """
+    version = data_version(*paths)
+    with _cache_lock:
+        entry = _cache.get(name)
+        if entry is not None and entry.version == version:
+            return _hit(name, entry)
+        build_lock = _build_locks.setdefault(name, [threading.Lock(), 0])
+        build_lock[1] += 1
+
+    try:
+        with build_lock[0]:
+            with _cache_lock:
+                entry = _cache.get(name)
+                if entry is not None and entry.version == version:
+                    return _hit(name, entry)
+                _cache_stats['misses'] += 1
+
+            started = time.perf_counter()
+            value = build()
+            entry = CacheEntry(version, value, memory_size(value), time.perf_counter() - started, paths)
+            with _cache_lock:
+                _cache_stats['prefetched'] += entry.prefetched
+                _cache[name] = entry
+                _cache.move_to_end(name)
+                _evict(keep=name)
+        return value
+    finally:
+        # the last caller out drops the lock, so there is never one per key ever built
+        with _cache_lock:
+            build_lock[1] -= 1
+            if build_lock[1] == 0:
+                del _build_locks[name]
+
+
+def _entry_label(name):
+    if not isinstance(name, tuple):
+        return str(name)
+    return ' / '.join(_entry_label(part) if not isinstance(part, tuple) else ', '.join(map(str, part)) for part in name)
+
+
+def cache_info():
+    """Budget, usage, counters and one row per entry (most recently used first)"""
+    with _cache_lock:
+        entries = [{
+            'Entry': _entry_label(name),
+            'Size (MB)': round(entry.size / 1024 / 1024, 2),
+            'Hits': entry.hits,
+            'Build (s)': round(entry.build_seconds, 2),
+            'Built': entry.built_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'Prefetched': 'used' if entry.prefetched and entry.used else 'waiting' if entry.prefetched else '',
+        } for name, entry in reversed(_cache.items())]
+        stats = dict(_cache_stats)
+    stats['budget_mb'] = CACHE_BUDGET_MB
+    stats['used_mb'] = round(sum(e['Size (MB)'] for e in entries), 2)
+    stats['entries'] = entries
+    return stats
+
+
+def set_cache_budget(megabytes):
+    global CACHE_BUDGET_MB
+    with _cache_lock:
+        CACHE_BUDGET_MB = float(megabytes)
+        _evict(keep=None)
+
+
+def invalidate(path):
+    """Drop every cache entry built from `path` and return their names (entries built from other files stay warm)"""
+    target = os.path.abspath(path)
+    with _cache_lock:
+        names = [name for name, entry in _cache.items() if target in entry.paths]
+        for name in names:
+            del _cache[name]
+    return names
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        for key in _cache_stats:
+            _cache_stats[key] = 0
+
+
+def cached_on_disk(name, paths, build):
+    """`cached`, backed by the on-disk result cache shared with other server processes"""
+    from idp_diskcache import cache_key, disk_cached
+    if getattr(_local, 'disk_keys', None) is not None:
+        _local.disk_keys.append((cache_key(name, paths, build), build))
+    return cached(name, paths, lambda: disk_cached(name, paths, build))
+
+
+def read_training_log(path=EXCEL_FILE):
+    """Read the training log sheet with dates as YYYY-MM-DD strings
+
+    The file's version seen before reading is kept in df.attrs['file_version'], so
+    indexes built from the frame record the version it came from, not a newer one.
+    """
+    version = file_version(path)
+    df = pd.read_excel(path, sheet_name='Sheet1')
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', dayfirst=False)
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    df.attrs['file_version'] = version
+    return df
+
+
+def load_training_log():
+    return cached('training_log', [EXCEL_FILE], read_training_log)
+
+
+def load_bios():
+    return cached('bios', [EXCEL_FILE], lambda: pd.read_excel(EXCEL_FILE, sheet_name='Player Bios'))
+
+
+def load_game_overview():
+    return cached('game_overview', [MINS_FILE], lambda: pd.read_parquet(MINS_FILE))
+
+
+def load_season_data():
+    from idp_arrow import open_arrow
+    return cached('season_data', [SEASON_FILE], lambda: open_arrow(SEASON_FILE).to_pandas())
+
+
+def load_event_table():
+    """League events memory-mapped from their Arrow copy, sorted and indexed by player_id"""
+    from idp_arrow import open_arrow
+    return cached('event_table', [EVENTS_FILE], lambda: open_arrow(EVENTS_FILE, key='player_id'))
+
+
+def load_player_events(player_id, match_ids=None):
+    """A player's league events, or only their events in `match_ids`"""
+    return load_event_table().frame(player_id, subvalues=match_ids)
+
+
+def load_event_bitmaps():
+    """Per-player bitsets of every event flag, for Activity Map filters (see idp_bitmaps)"""
+    from idp_bitmaps import EventBitmaps
+    return cached('event_bitmaps', [EVENTS_FILE], lambda: EventBitmaps(load_event_table()))
+
+
+def load_player_matches(player_id):
+    """Matches a player has events in, oldest first: match_id, match_date, Opponent, Minutes and Events"""
+    def build():
+        matches = pd.DataFrame([(match_id, stop - start) for match_id, (start, stop) in load_event_table().subrows.get(player_id, {}).items()],
+                               columns=['match_id', 'Events'])
+        game_overview = load_game_overview()
+        played = game_overview[game_overview['player_id'] == player_id].drop_duplicates('match_id')
+        matches = matches.merge(played[['match_id', 'match_date', 'Opponent', 'Minutes']], on='match_id', how='left')
+        matches['match_date'] = pd.to_datetime(matches['match_date'])
+        return matches.sort_values(['match_date', 'match_id']).reset_index(drop=True)
+    return cached(('player_matches', player_id), [EVENTS_FILE, MINS_FILE], build)
+
+
+def load_match_teams():
+    """match_id -> teams in that match, for naming the opponent of a player's events"""
+    def build():
+        table = load_event_table().table
+        if 'team' not in table.column_names:
+            return {}
+        pairs = table.select(['match_id', 'team']).group_by(['match_id', 'team']).aggregate([]).to_pandas().dropna()
+        return pairs.groupby('match_id')['team'].agg(tuple).to_dict()
+    return cached('match_teams', [EVENTS_FILE], build)
+
+
+def load_events():
+    """All league events as one DataFrame, for building the league-wide tables (not cached)"""
+    return load_event_table().to_pandas()
+
+
+def load_form_series():
+    """Per-match form series for the whole league"""
+    from idp_form import build_form_series
+    return cached_on_disk('form_series', [EVENTS_FILE, MINS_FILE],
+                          lambda: build_form_series(load_events(), load_game_overview()))
+
+
+def load_hex_counts():
+    """Touches/Pressures hexagon counts for the whole league"""
+    from idp_hexbins import build_hex_counts
+    return cached_on_disk('hex_counts', [EVENTS_FILE, MINS_FILE],
+                          lambda: build_hex_counts(load_events(), load_form_series().matches.groupby('player_id')['Minutes'].sum()))
+
+
+def load_comp_data(positions, player_id, comp_player_name=None):
+    """Comparison table with ratings for a position selection (shared, so callers must not modify it)"""
+    from idp_ratings import build_comp_data
+    return cached_on_disk(('comp_data', tuple(positions), player_id, comp_player_name), [SEASON_FILE],
+                          lambda: build_comp_data(load_season_data(), positions, player_id, comp_player_name))
+
+
+def load_comparison_ratings(positions, player_id):
+    """Ratings of every other player in the position pool, each as the comparison player on the player's page"""
+    from idp_ratings import position_pool, rate_against_pool
+    def build():
+        season_data = load_season_data()
+        pool = position_pool(season_data, positions)
+        return rate_against_pool(season_data, positions, pool.loc[pool['player_id'] != player_id, 'Player'].unique(), player_id)
+    return cached_on_disk(('comparison_ratings', tuple(positions), player_id), [SEASON_FILE], build)
+
+
+def load_metric_distributions(positions):
+    """Sorted league values of the raw metrics for a position set, for the metric strips (see idp_distributions)"""
+    from idp_distributions import build_metric_distributions
+    positions = tuple(sorted(positions))
+    return cached_on_disk(('metric_distributions', positions), [SEASON_FILE],
+                          lambda: build_metric_distributions(load_season_data(), list(positions)))
+
+
+def load_player_index():
+    """Name and id resolver for every rostered and league player (see idp_players)"""
+    from idp_players import PlayerIndex
+    return cached('player_index', [SEASON_FILE, MINS_FILE], lambda: PlayerIndex(load_season_data(), load_game_overview()))
+
+
+def player_id_for(name):
+    """player_id of a player by name, or None if there is no data for them"""
+    return load_player_index().resolve(name)
+
+
+def squad_player_ids():
+    """player_ids of everyone on the Racing Mins roster"""
+    return load_player_index().squad()
+
+
+def load_squad_ratings():
+    """Ratings of every rostered player against their primary position group"""
+    from idp_ratings import build_squad_ratings
+    player_ids = squad_player_ids()
+    return cached_on_disk(('squad_ratings', player_ids), [SEASON_FILE],
+                          lambda: build_squad_ratings(load_season_data(), player_ids))
+
+
+def load_card_metrics(player_id, player_mins, match_ids=None):
+    """Activity Map card numbers for a player's season, or for the matches in `match_ids`"""
+    from idp_maps import card_metrics
+    if match_ids is None:
+        return cached_on_disk(('card_metrics', player_id, player_mins), [EVENTS_FILE],
+                              lambda: card_metrics(load_player_events(player_id), player_mins))
+    match_ids = tuple(sorted(match_ids))
+    return cached(('card_metrics', player_id, player_mins, match_ids), [EVENTS_FILE],
+                  lambda: card_metrics(load_player_events(player_id, match_ids), player_mins))
+
+
+def parse_image_filename(filename):
+    """Match report image details from '{match_id}-{YYYY}-{MM}-{DD}-{opponent}-{player}.png', or None"""
+    if not filename.endswith('.png'):
+        return None
+    parts = filename[:-len('.png')].split('-')
+    if len(parts) < 6:
+        return None
+    return {
+        'match_id': parts[0],
+        'match_date': f"{parts[2]}/{parts[3]}",
+        'date': f"{parts[1]}-{parts[2]}-{parts[3]}",
+        'opponent': parts[4],
+        'player_name': parts[5],
+        'filename': filename,
+    }
+
+
+def build_image_manifest(folder=IMAGES_FOLDER):
+    """Every match report image in `folder`, newest first"""
+    images = [parsed for parsed in map(parse_image_filename, os.listdir(folder)) if parsed] if os.path.isdir(folder) else []
+    return sorted(images, key=lambda image: image['date'], reverse=True)
+
+
+def load_image_manifest():
+    return cached_on_disk('image_manifest', [IMAGES_FOLDER], build_image_manifest)
+
+
+def calculate_age(dob_str):
+    dob_1 = datetime.strptime(str(dob_str), "%Y.%m.%d")
+    today = datetime.today()
+    age = (today - dob_1).days / 365.25
+    return round(age, 1)
+
+
+def load_availability():
+    """Player x match availability and minutes from Racing Mins (see idp_availability)"""
+    from idp_availability import AvailabilityMatrix
+    return cached('availability', [MINS_FILE], lambda: AvailabilityMatrix(load_game_overview()))
+
+
+def season_overview(player):
+    """Squad, appearance and minutes totals for a player from Racing Mins"""
+    return load_availability().overview(player)
@@ -0,0 +1,273 @@
+"""On-disk result cache shared by every server process on the host.
+
+Expensive derived results (rated comp_data tables, per-player card numbers,
+rendered maps) are pickled into a SQLite file. Keys include a content hash of the
+data files a result was built from, so a replaced file never serves stale
+results and a restarted or newly started worker begins warm. Keys also hash the
+source of the code that builds a result (code_version), so a change to a
+formula or a stored class is never answered with results pickled by the old
+code. Entries expire
+after a TTL, and the least recently used are dropped once the file is over its
+size limit.
+
+    python idp_diskcache.py stats
+    python idp_diskcache.py list [--prefix comp_data]
+    python idp_diskcache.py purge [--expired | --prefix hex_map]
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+
+DISK_CACHE_FILE = os.environ.get('IDP_DISK_CACHE', '.idp_cache.sqlite')
+DISK_CACHE_MAX_MB = float(os.environ.get('IDP_DISK_CACHE_MAX_MB', 512))
+DISK_CACHE_TTL = float(os.environ.get('IDP_DISK_CACHE_TTL_HOURS', 24 * 7)) * 3600
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_digests = {}
+_digests_lock = threading.Lock()
+_code_files = {}
+_SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path):
+    """SHA-1 of a file's contents, remembered per (path, mtime, size) so it is hashed once per version.
+
+    A folder's digest covers the names and contents of the files in it.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if os.path.isdir(path):
+        digest = hashlib.sha1()
+        for name in sorted(os.listdir(path)):
+            digest.update(f"{name}\0{file_digest(os.path.join(path, name))}\0".encode())
+        return digest.hexdigest()
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    with _digests_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def _names(code):
+    """Global and attribute names used by a code object and the functions nested in it"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _names(const)
+    return names
+
+
+def _source_files(build):
+    """This app's source files that `build` can run: its own, and those of the functions,
+    classes and modules it closes over, uses as globals or imports inside its body"""
+    files, seen, pending = set(), set(), [build]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if inspect.ismethod(obj) or isinstance(obj, functools.partial):
+            pending.append(obj.__func__ if inspect.ismethod(obj) else obj.func)
+            continue
+        if inspect.isfunction(obj):
+            path = obj.__code__.co_filename
+        elif inspect.isclass(obj) or inspect.ismodule(obj):
+            path = getattr(sys.modules.get(obj.__module__) if inspect.isclass(obj) else obj, '__file__', None)
+        else:
+            continue
+        path = os.path.abspath(path) if path else None
+        if path is not None and os.path.dirname(path) == _SOURCE_FOLDER and os.path.isfile(path):
+            files.add(path)
+        elif obj is not build:
+            continue
+        if inspect.isfunction(obj):
+            names = _names(obj.__code__)
+            used = [cell.cell_contents for cell in obj.__closure__ or () if cell.cell_contents is not None]
+            used += [obj.__globals__[name] for name in names if name in obj.__globals__]
+            used += [sys.modules[name] for name in names if name in sys.modules]
+            pending += used + [getattr(module, name) for module in used if inspect.ismodule(module)
+                               for name in names if hasattr(module, name)]
+        elif inspect.isclass(obj):
+            pending += [value for cls in obj.__mro__[:-1] for value in vars(cls).values()] + list(obj.__mro__[1:-1])
+    return files
+
+
+def code_files(build):
+    """Sorted source files `build` depends on (see _source_files), remembered per function and closure"""
+    function = build.__func__ if inspect.ismethod(build) else build.func if isinstance(build, functools.partial) else build
+    closure = tuple(id(cell.cell_contents) for cell in getattr(function, '__closure__', None) or ()
+                    if callable(cell.cell_contents) or inspect.ismodule(cell.cell_contents))
+    key = (getattr(function, '__code__', function), closure)
+    with _digests_lock:
+        files = _code_files.get(key)
+    if files is None:
+        files = sorted(_source_files(build))
+        with _digests_lock:
+            _code_files[key] = files
+    return files
+
+
+def code_version(build):
+    """Digest of the source of `build` and of this app's modules it uses, or None without a `build`"""
+    if build is None:
+        return None
+    return hashlib.sha1(repr([(os.path.basename(path), file_digest(path)) for path in code_files(build)]).encode()).hexdigest()
+
+
+def cache_key(name, paths, build=None):
+    """Key for result `name` built by `build` from the current contents of `paths`"""
+    label = name if isinstance(name, str) else ':'.join(','.join(map(str, part)) if isinstance(part, tuple) else str(part) for part in name)
+    inputs = hashlib.sha1(repr((name, [file_digest(path) for path in paths], code_version(build))).encode()).hexdigest()
+    return f"{label}|{inputs}"
+
+
+def _connection(path=None):
+    path = path or DISK_CACHE_FILE
+    connections = _local.__dict__.setdefault('connections', {})
+    if path not in connections:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('''CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,
+            created REAL NOT NULL, accessed REAL NOT NULL, expires REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)''')
+        connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        connections[path] = connection
+    return connections[path]
+
+
+def get(key, path=None):
+    """Unpickled value for `key`, or None if it is missing or expired"""
+    connection = _connection(path)
+    now = time.time()
+    row = connection.execute('SELECT value FROM results WHERE key = ? AND expires > ?', (key, now)).fetchone()
+    if row is None:
+        return None
+    connection.execute('UPDATE results SET accessed = ?, hits = hits + 1 WHERE key = ?', (now, key))
+    return pickle.loads(row[0])
+
+
+def has(key, path=None):
+    """Whether an unexpired result is stored under `key`"""
+    row = _connection(path).execute('SELECT 1 FROM results WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+    return row is not None
+
+
+def put(key, value, ttl=None, path=None):
+    """Store `value` under `key`, then trim expired entries and the least recently used over the size limit"""
+    connection = _connection(path)
+    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    now = time.time()
+    connection.execute('INSERT OR REPLACE INTO results (key, value, size, created, accessed, expires, hits) VALUES (?, ?, ?, ?, ?, ?, 0)',
+                       (key, blob, len(blob), now, now, now + (DISK_CACHE_TTL if ttl is None else ttl)))
+    trim(path)
+
+
+def trim(path=None, max_mb=None):
+    """Drop expired entries, then least recently used ones until the cache is within `max_mb`"""
+    connection = _connection(path)
+    limit = (DISK_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute('DELETE FROM results WHERE expires <= ?', (time.time(),))
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total > limit:
+            for key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed').fetchall():
+                if total <= limit:
+                    break
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                total -= size
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def disk_cached(name, paths, build, ttl=None):
+    """Return the stored result of `build()` for the current contents of `paths` and code of `build`, building and storing it if needed"""
+    key = cache_key(name, paths, build)
+    try:
+        value = get(key)
+    except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        value = None
+    if value is not None:
+        return value
+    value = build()
+    try:
+        put(key, value, ttl)
+    except (sqlite3.Error, pickle.PicklingError, TypeError) as e:
+        logger.warning("Could not store %s in the disk cache: %s", key, e)
+    return value
+
+
+def entries(prefix=None, path=None):
+    """(key, size, created, accessed, expires, hits) of stored results, most recently used first"""
+    query = 'SELECT key, size, created, accessed, expires, hits FROM results'
+    params = ()
+    if prefix:
+        query += ' WHERE substr(key, 1, length(?)) = ?'
+        params = (prefix, prefix)
+    return _connection(path).execute(query + ' ORDER BY accessed DESC', params).fetchall()
+
+
+def purge(prefix=None, expired_only=False, path=None):
+    """Delete stored results (all, expired ones, or keys starting with `prefix`) and return how many"""
+    connection = _connection(path)
+    if expired_only:
+        cursor = connection.execute('DELETE FROM results WHERE expires <= ?', (time.time(),))
+    elif prefix:
+        cursor = connection.execute('DELETE FROM results WHERE substr(key, 1, length(?)) = ?', (prefix, prefix))
+    else:
+        cursor = connection.execute('DELETE FROM results')
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return cursor.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and purge the on-disk result cache")
+    parser.add_argument('--file', default=DISK_CACHE_FILE)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="Entry count, size and hits")
+    listing = commands.add_parser('list', help="List stored results")
+    listing.add_argument('--prefix')
+    purging = commands.add_parser('purge', help="Delete stored results")
+    purging.add_argument('--prefix')
+    purging.add_argument('--expired', action='store_true', help="Only delete expired results")
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        rows = entries(path=args.file)
+        now = time.time()
+        print(f"file: {args.file}")
+        print(f"entries: {len(rows)} ({sum(1 for row in rows if row[4] <= now)} expired)")
+        print(f"size: {sum(row[1] for row in rows) / 1024 / 1024:.2f} / {DISK_CACHE_MAX_MB:.0f} MB")
+        print(f"hits: {sum(row[5] for row in rows)}")
+    elif args.command == 'list':
+        fmt = lambda t: time.strftime('%Y-%m-%d %H:%M', time.localtime(t))
+        for key, size, created, accessed, expires, hits in entries(args.prefix, path=args.file):
+            print(f"{key}  {size / 1024:.1f} KB  hits {hits}  built {fmt(created)}  used {fmt(accessed)}  expires {fmt(expires)}")
+    else:
+        print(f"purged {purge(args.prefix, args.expired, path=args.file)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""League distributions of the raw position metrics, for the metric strips.
+
+For a set of position groups, every player's season rows are pooled into
+minutes-weighted averages, the same way as for the radar. The reference pool is
+the rows above the median minutes, as in build_comp_data, and each
+metric's pool values are kept as one sorted array. A player's percentile
+is then two binary searches into that array. The result is the average
+rank among the pool plus the player, which is what pandas'
+rank(pct=True) gives for the radar's pct columns. Drawing all twelve
+strips never re-ranks the league table.
+
+Top Speed is averaged the same way, in km/h, rather than kept as the
+minutes-weighted sum the radar's pooled table carries.
+"""
+import numpy as np
+
+from idp_ratings import SPECIAL_COLS, _pooled, metrics_for_positions, position_pool
+
+
+def _per_minute_values(pooled, metrics):
+    """(players, metrics) array of minutes-weighted averages from pooled sums"""
+    values = pooled[metrics].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values / pooled['Minutes'].to_numpy(dtype=float)[:, None]
+
+
+def swarm_offsets(values, bins=40):
+    """Vertical offsets that stack close values side by side, alternating above and below the line (a cheap beeswarm)"""
+    if len(values) == 0:
+        return np.array([])
+    low, high = values[0], values[-1]
+    which = np.zeros(len(values), dtype=int) if high == low else np.minimum(((values - low) / (high - low) * bins).astype(int), bins - 1)
+    # values are sorted, so each bin is one run; k is the position within its run
+    starts = np.r_[0, np.flatnonzero(np.diff(which)) + 1]
+    k = np.arange(len(values)) - np.repeat(starts, np.diff(np.r_[starts, len(values)]))
+    return (k + 1) // 2 * np.where(k % 2, 1, -1)
+
+
+class MetricDistributions:
+    """Sorted league values of each metric for one position set, and every player's own values"""
+
+    def __init__(self, positions, metrics, player_ids, values, pool_ids, pool_names, pool_values):
+        self.positions = list(positions)
+        self.metrics = list(metrics)
+        self.columns = {metric: i for i, metric in enumerate(self.metrics)}
+        self.rows = {player_id: i for i, player_id in enumerate(player_ids)}
+        self.values = values    # (players, metrics), every player of the position groups
+        self.pool_rows = {player_id: i for i, player_id in enumerate(pool_ids)}
+        self.pool_values = pool_values    # (pool players, metrics), row order of pool_ids
+        self.sorted = {}    # metric -> (sorted values, pool names in that order), NaNs dropped
+        self.offsets = {}   # metric -> swarm offsets of the sorted values
+        for metric, column in self.columns.items():
+            values = pool_values[:, column]
+            order = np.argsort(values, kind='stable')
+            order = order[~np.isnan(values[order])]
+            self.sorted[metric] = (values[order], np.asarray(pool_names)[order])
+            self.offsets[metric] = swarm_offsets(values[order])
+
+    def value(self, player_id, metric):
+        """A player's pooled value of a metric (NaN if they have no rows for these positions)"""
+        if player_id not in self.rows or metric not in self.columns:
+            return np.nan
+        return self.values[self.rows[player_id], self.columns[metric]]
+
+    def percentile(self, player_id, metric):
+        """0-100 rank of a player's value among the pool, counting the player once"""
+        value = self.value(player_id, metric)
+        if np.isnan(value):
+            return np.nan
+        values, _ = self.sorted[metric]
+        below = np.searchsorted(values, value, side='left')
+        equal = np.searchsorted(values, value, side='right') - below
+        others = len(values)
+        if player_id in self.pool_rows:
+            own = self.pool_values[self.pool_rows[player_id], self.columns[metric]]
+            if not np.isnan(own):
+                others -= 1
+                if own < value:
+                    below -= 1
+                elif own == value:
+                    equal -= 1
+        return round(100 * (below + (equal + 2) / 2) / (others + 1), 2)
+
+    def quantiles(self, metric, q=(0.1, 0.5, 0.9)):
+        values, _ = self.sorted[metric]
+        return np.quantile(values, q) if len(values) else np.full(len(q), np.nan)
+
+
+def build_metric_distributions(season_data, positions):
+    """MetricDistributions of the raw metrics shown for `positions`"""
+    rows = position_pool(season_data, positions)
+    metrics = [metric for metric in metrics_for_positions(positions) if metric in rows.columns and metric not in SPECIAL_COLS]
+    everyone = _pooled(rows)
+    pool = _pooled(rows[rows['Minutes'] > np.median(rows['Minutes'])]) if len(rows) else everyone
+    return MetricDistributions(positions, metrics,
+                               everyone['player_id'].to_numpy(), _per_minute_values(everyone, metrics),
+                               pool['player_id'].to_numpy(), pool['Player'].to_numpy(), _per_minute_values(pool, metrics))
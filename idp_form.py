@@ -0,0 +1,195 @@
+"""Per-match form series for the player pages.
+
+Every (player, match) gets one row of event counts. Rows are kept in match order
+per player next to running (prefix) sums of minutes and counts, so the per 90
+value of any run of consecutive matches is the difference of two rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+TOUCH_TYPES = ['Pass', 'Ball Receipt*', 'Shot']
+
+FORM_METRICS = ['Touches', 'Box Touches', 'Pressures', 'Att. 1/3 Pressures', 'Pressures Leading to Shot',
+                'Shots', 'xG', 'Goals', 'Key Passes', 'xA', 'Assists',
+                'Progressive Passes', 'Progressive Carries', 'Take Ons']
+
+# Form versions of the season ratings, built from percentiles of the metrics above
+FORM_RATINGS = {
+    'Goal Threat': {'xG': 0.4, 'Goals': 0.3, 'Box Touches': 0.2, 'Shots': 0.1},
+    'Chance Creation': {'xA': 0.4, 'Key Passes': 0.35, 'Assists': 0.25},
+    'Ball Progression': {'Progressive Passes': 0.55, 'Progressive Carries': 0.45},
+    'Carrying': {'Take Ons': 0.5, 'Progressive Carries': 0.5},
+    'High Pressing': {'Att. 1/3 Pressures': 0.5, 'Pressures': 0.3, 'Pressures Leading to Shot': 0.2},
+}
+
+FORM_WINDOWS = [3, 5, 10]
+
+# A window only joins the league reference if the player averaged this many minutes per match in it
+MIN_WINDOW_MINUTES_PER_MATCH = 30
+
+
+def event_metric_columns(events):
+    """Contribution of every event to each form metric (one column per metric)"""
+    is_touch = events['type'].isin(TOUCH_TYPES)
+    in_box = (events['x'] > 102) & (events['y'] > 17) & (events['y'] < 62)
+    is_pressure = events['type'] == 'Pressure'
+    is_pass = events['type'] == 'Pass'
+    is_shot = events['type'] == 'Shot'
+    shot_assist = (events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True)
+
+    return pd.DataFrame({
+        'Touches': is_touch,
+        'Box Touches': is_touch & in_box,
+        'Pressures': is_pressure,
+        'Att. 1/3 Pressures': is_pressure & (events['x'] > 80),
+        'Pressures Leading to Shot': is_pressure & (events['pressure_leading_to_shot'] == True),
+        'Shots': is_shot & (events['shot_type'] != 'Penalty'),
+        'xG': events['shot_statsbomb_xg'].fillna(0),
+        'Goals': events['shot_outcome'] == 'Goal',
+        'Key Passes': is_pass & shot_assist,
+        'xA': events['xA'].fillna(0),
+        'Assists': events['pass_goal_assist'] == True,
+        'Progressive Passes': is_pass & (events['is_progressive'] == True) & (events['completed_pass'] == True),
+        'Progressive Carries': (events['type'] == 'Carry') & (events['is_progressive_carry'] == True),
+        'Take Ons': (events['type'] == 'Dribble') & (events['dribble_outcome'] == 'Complete'),
+    }, index=events.index).astype(float)
+
+
+def estimate_match_minutes(events):
+    """Rough minutes per (player_id, match_id) from the first and last event of each player.
+
+    A first action in the opening 15 minutes counts as a start and a last action after
+    the 80th minute as playing to the final whistle.
+    """
+    span = events.groupby(['player_id', 'match_id'])['minute'].agg(['min', 'max'])
+    start = span['min'].where(span['min'] > 15, 0)
+    end = span['max'].where(span['max'] < 80, np.maximum(span['max'], 90))
+    return (end - start).clip(lower=1).rename('Minutes')
+
+
+def build_match_metrics(events, game_overview=None):
+    """One row per (player_id, match_id) with Minutes, match_date and every form metric.
+
+    Minutes come from `game_overview` (Racing Mins) where the player is in it and are
+    estimated from the events for everyone else in the league.
+    """
+    counts = event_metric_columns(events)
+    counts['player_id'] = events['player_id']
+    counts['match_id'] = events['match_id']
+    matches = counts.groupby(['player_id', 'match_id'])[FORM_METRICS].sum()
+    matches = matches.join(estimate_match_minutes(events))
+
+    dates = None
+    if 'match_date' in events.columns:
+        dates = events.groupby('match_id')['match_date'].first()
+
+    if game_overview is not None and not game_overview.empty:
+        known = game_overview.set_index(['player_id', 'match_id'])['Minutes']
+        known = known[~known.index.duplicated()]
+        overlap = matches.index.intersection(known.index)
+        matches.loc[overlap, 'Minutes'] = known.loc[overlap].clip(lower=1).astype(float)
+        overview_dates = game_overview.groupby('match_id')['match_date'].first()
+        dates = overview_dates if dates is None else dates.combine_first(overview_dates)
+
+    matches = matches.reset_index()
+    if dates is not None:
+        matches['match_date'] = pd.to_datetime(matches['match_id'].map(dates), errors='coerce')
+    else:
+        matches['match_date'] = pd.NaT
+
+    # StatsBomb match ids increase through a season, so they break ties and fill missing dates
+    return matches.sort_values(['player_id', 'match_date', 'match_id'], na_position='first').reset_index(drop=True)
+
+
+class FormSeries:
+    """Per-match metric rows in match order with prefix sums for O(1) window aggregates"""
+
+    def __init__(self, matches):
+        self.matches = matches.reset_index(drop=True)
+        self.metrics = list(FORM_METRICS)
+
+        values = self.matches[self.metrics].to_numpy(dtype=float)
+        minutes = self.matches['Minutes'].to_numpy(dtype=float)
+        # Row i of the prefix arrays holds the sum over rows [0, i); windows never cross
+        # a player boundary so a single flat array serves every player
+        self.cum_values = np.vstack([np.zeros((1, len(self.metrics))), np.cumsum(values, axis=0)])
+        self.cum_minutes = np.concatenate([[0.0], np.cumsum(minutes)])
+
+        player_ids = self.matches['player_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, player_ids[1:] != player_ids[:-1]]) if len(player_ids) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(player_ids)]
+        self.player_rows = {player_ids[start]: (start, stop) for start, stop in zip(starts, stops)}
+        self.starts = np.repeat(starts, stops - starts)
+
+        self._league_reference = {}
+
+    def window_totals(self, start, stop):
+        """Summed metrics and minutes over rows [start, stop)"""
+        return self.cum_values[stop] - self.cum_values[start], self.cum_minutes[stop] - self.cum_minutes[start]
+
+    def window_p90(self, player_id, n, end=None):
+        """Per 90 metrics over the player's last `n` matches up to match position `end` (exclusive)"""
+        if player_id not in self.player_rows:
+            return None
+        start, stop = self.player_rows[player_id]
+        stop = stop if end is None else min(start + end, stop)
+        totals, minutes = self.window_totals(max(start, stop - n), stop)
+        if minutes <= 0:
+            return None
+        return dict(zip(self.metrics, totals * 90 / minutes))
+
+    def _trailing_windows(self, rows, n):
+        """Per 90 metrics and minutes of the trailing n-match window ending at each row"""
+        rows = np.asarray(rows)
+        stop = rows + 1
+        start = np.maximum(self.starts[rows], stop - n)
+        totals = self.cum_values[stop] - self.cum_values[start]
+        minutes = self.cum_minutes[stop] - self.cum_minutes[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p90 = np.where(minutes[:, None] > 0, totals * 90 / minutes[:, None], 0)
+        return p90, minutes, stop - start
+
+    def league_reference(self, n):
+        """Sorted per 90 values of every full n-match window in the league, one array per metric"""
+        if n not in self._league_reference:
+            rows = np.arange(len(self.matches))
+            p90, minutes, length = self._trailing_windows(rows, n)
+            keep = (length == n) & (minutes >= MIN_WINDOW_MINUTES_PER_MATCH * n)
+            self._league_reference[n] = np.sort(p90[keep], axis=0)
+        return self._league_reference[n]
+
+    def percentiles(self, p90, n):
+        """League percentile (0-100) of per 90 values laid out like `self.metrics`"""
+        reference = self.league_reference(n)
+        if len(reference) == 0:
+            return np.zeros_like(np.asarray(p90, dtype=float))
+        p90 = np.atleast_2d(p90)
+        ranks = np.column_stack([
+            np.searchsorted(reference[:, i], p90[:, i], side='right') for i in range(len(self.metrics))
+        ])
+        return ranks * 100 / len(reference)
+
+    def rolling(self, player_id, n):
+        """Trailing n-match per 90 values, their percentiles and the form ratings after every match"""
+        if player_id not in self.player_rows:
+            return pd.DataFrame()
+        start, stop = self.player_rows[player_id]
+        rows = np.arange(start, stop)
+        p90, minutes, length = self._trailing_windows(rows, n)
+        pct = self.percentiles(p90, n)
+
+        trend = self.matches.loc[rows, ['match_id', 'match_date', 'Minutes']].reset_index(drop=True)
+        trend['Window Minutes'] = minutes
+        trend['Window Matches'] = length
+        for i, metric in enumerate(self.metrics):
+            trend[metric] = p90[:, i]
+            trend[f'pct{metric}'] = pct[:, i]
+        for rating, weights in FORM_RATINGS.items():
+            trend[rating] = sum(weight * trend[f'pct{metric}'] for metric, weight in weights.items())
+        return trend
+
+
+def build_form_series(events, game_overview=None):
+    """FormSeries over every player in the league events"""
+    return FormSeries(build_match_metrics(events, game_overview))
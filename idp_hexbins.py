@@ -0,0 +1,161 @@
+"""Pre-binned hexbin grids for the Touches and Pressures maps.
+
+Events are binned once for the whole league into the same hexagons matplotlib's
+hexbin would use for the app's pitch, giving a small (players x hexes) count array
+per layer. A map then draws one point per hexagon weighted by its value, so the
+render cost depends on the grid size and not on how many events a player has, and
+league averages come from the same arrays.
+"""
+import numpy as np
+
+from idp_maps import TOUCH_TYPES
+
+
+HEX_GRIDSIZE = (12, 6)
+HEX_EXTENT = (0, 120, 0, 80)  # StatsBomb pitch, as mplsoccer's Pitch.hex_extent
+HEX_MINCNT = 3
+
+HEX_LAYERS = {
+    'Touches': TOUCH_TYPES,
+    'Pressures': ['Pressure'],
+}
+
+
+def _grid_scale(extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """Padded origin and hexagon spacing, exactly as matplotlib's Axes.hexbin computes them"""
+    xmin, xmax, ymin, ymax = extent
+    nx, ny = gridsize
+    padding = 1.e-9 * (xmax - xmin)
+    xmin, xmax = xmin - padding, xmax + padding
+    return xmin, ymin, (xmax - xmin) / nx, (ymax - ymin) / ny
+
+
+def hex_centers(extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """(n, 2) array of hexagon centres in matplotlib's hexbin order"""
+    nx, ny = gridsize
+    xmin, ymin, sx, sy = _grid_scale(extent, gridsize)
+    lattice1 = np.column_stack([np.repeat(np.arange(nx + 1), ny + 1), np.tile(np.arange(ny + 1), nx + 1)])
+    lattice2 = np.column_stack([np.repeat(np.arange(nx) + 0.5, ny), np.tile(np.arange(ny), nx) + 0.5])
+    centers = np.vstack([lattice1, lattice2]).astype(float)
+    return centers * [sx, sy] + [xmin, ymin]
+
+
+def hex_polygon(extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """(6, 2) vertex offsets of a hexagon from its centre, as matplotlib's hexbin draws it"""
+    _, _, sx, sy = _grid_scale(extent, gridsize)
+    return [sx, sy / 3] * np.array([[.5, -.5], [.5, .5], [0., 1.], [-.5, .5], [-.5, -.5], [0., -1.]])
+
+
+def hex_index(x, y, extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """Hexagon of each point in `hex_centers` order, -1 for points off the grid or missing"""
+    nx, ny = gridsize
+    xmin, ymin, sx, sy = _grid_scale(extent, gridsize)
+    ix = (np.asarray(x, dtype=float) - xmin) / sx
+    iy = (np.asarray(y, dtype=float) - ymin) / sy
+    valid = ~(np.isnan(ix) | np.isnan(iy))
+    ix, iy = np.where(valid, ix, -10), np.where(valid, iy, -10)
+
+    ix1, iy1 = np.round(ix).astype(int), np.round(iy).astype(int)
+    ix2, iy2 = np.floor(ix).astype(int), np.floor(iy).astype(int)
+    in1 = (0 <= ix1) & (ix1 < nx + 1) & (0 <= iy1) & (iy1 < ny + 1)
+    in2 = (0 <= ix2) & (ix2 < nx) & (0 <= iy2) & (iy2 < ny)
+
+    d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+    d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+    first = d1 < d2
+    index = np.where(first, np.where(in1, ix1 * (ny + 1) + iy1, -1),
+                     np.where(in2, (nx + 1) * (ny + 1) + ix2 * ny + iy2, -1))
+    return np.where(valid, index, -1)
+
+
+class HexCounts:
+    """Per-player hexagon counts for each map layer, plus per 90 and league views"""
+
+    def __init__(self, player_ids, counts, minutes, extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+        self.player_ids = np.asarray(player_ids)
+        self.rows = {player_id: i for i, player_id in enumerate(self.player_ids)}
+        self.counts = counts  # layer -> (players, hexes) int array
+        self.minutes = np.asarray(minutes, dtype=float)
+        self.extent = extent
+        self.gridsize = gridsize
+        self.centers = hex_centers(extent, gridsize)
+
+    def for_events(self, player_id, events):
+        """A copy where `player_id`'s counts come from `events` (some of their matches); the league views are unchanged"""
+        subset = HexCounts(self.player_ids, {layer: counts.copy() for layer, counts in self.counts.items()},
+                           self.minutes, self.extent, self.gridsize)
+        subset.league = self._league()
+        if player_id not in self.rows:
+            return subset
+        for layer, counts in count_layers(events, self.extent, self.gridsize).items():
+            subset.counts[layer][self.rows[player_id]] = counts
+        return subset
+
+    def _league(self):
+        """Total counts of every layer and total minutes, over the whole league"""
+        league = getattr(self, 'league', None)
+        if league is None:
+            league = ({layer: counts.sum(axis=0) for layer, counts in self.counts.items()}, self.minutes.sum())
+        return league
+
+    def player_counts(self, layer, player_id):
+        if player_id not in self.rows:
+            return np.zeros(len(self.centers))
+        return self.counts[layer][self.rows[player_id]].astype(float)
+
+    def player_p90(self, layer, player_id, minutes):
+        """Per 90 value of every hexagon, NaN where the player has fewer than HEX_MINCNT events"""
+        counts = self.player_counts(layer, player_id)
+        p90 = counts * 90 / minutes if minutes else np.zeros_like(counts)
+        return np.where(counts >= HEX_MINCNT, p90, np.nan)
+
+    def league_p90(self, layer):
+        """Per 90 value of every hexagon pooled over the league"""
+        totals, minutes = self._league()
+        if not minutes:
+            return np.full(len(self.centers), np.nan)
+        p90 = totals[layer] * 90 / minutes
+        return np.where(p90 > 0, p90, np.nan)
+
+    def difference_p90(self, layer, player_id, minutes):
+        """Player minus league per 90 value of every hexagon"""
+        counts = self.player_counts(layer, player_id)
+        p90 = counts * 90 / minutes if minutes else np.zeros_like(counts)
+        league = np.nan_to_num(self.league_p90(layer))
+        return np.where((counts > 0) | (league > 0), p90 - league, np.nan)
+
+
+def count_layers(events, extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """Hexagon counts of every layer for one set of events"""
+    n_hexes = len(hex_centers(extent, gridsize))
+    counts = {}
+    for layer, types in HEX_LAYERS.items():
+        layer_events = events[events['type'].isin(types)]
+        index = hex_index(layer_events['x'].to_numpy(), layer_events['y'].to_numpy(), extent, gridsize)
+        counts[layer] = np.bincount(index[index >= 0], minlength=n_hexes)
+    return counts
+
+
+def build_hex_counts(events, minutes_by_player, extent=HEX_EXTENT, gridsize=HEX_GRIDSIZE):
+    """Bin every layer's events for the whole league into a HexCounts"""
+    player_ids = np.asarray(sorted(events['player_id'].dropna().unique()))
+    n_hexes = len(hex_centers(extent, gridsize))
+    counts = {}
+    for layer, types in HEX_LAYERS.items():
+        layer_events = events[events['type'].isin(types) & events['player_id'].notna()]
+        rows = np.searchsorted(player_ids, layer_events['player_id'].to_numpy())
+        index = hex_index(layer_events['x'].to_numpy(), layer_events['y'].to_numpy(), extent, gridsize)
+        keep = index >= 0
+        flat = np.bincount(rows[keep] * n_hexes + index[keep], minlength=len(player_ids) * n_hexes)
+        counts[layer] = flat.reshape(len(player_ids), n_hexes).astype(np.int32)
+
+    minutes = minutes_by_player.reindex(player_ids).fillna(0).to_numpy()
+    return HexCounts(player_ids, counts, minutes, extent, gridsize)
+
+
+def draw_hexbin(pitch, ax, hex_counts, values, **kwargs):
+    """Draw per-hexagon `values` (NaN = hidden) with the pitch's hexbin styling"""
+    shown = ~np.isnan(values)
+    centers = hex_counts.centers[shown]
+    return pitch.hexbin(centers[:, 0], centers[:, 1], C=values[shown], reduce_C_function=np.sum, ax=ax,
+                        gridsize=hex_counts.gridsize, extent=hex_counts.extent, mincnt=1, **kwargs)
@@ -0,0 +1,307 @@
+"""Bulk import of historical training logs from other workbooks or CSV files.
+
+    python idp_import.py old_logs_2023.xlsx --sheet Sessions
+    python idp_import.py sessions.csv --map "Session Date=Date" --map "Comments=Notes" --dry-run
+
+The source is streamed: openpyxl read-only mode for .xlsx and the csv module
+for .csv, so memory use depends on the batch size, not the file size.
+
+How each row is handled:
+
+- Columns are mapped onto the training log columns by name. Common variants
+  are recognised, and --map overrides them.
+- Rows are checked against the Player Bios sheet and must have a date and a
+  type. Rows that fail are reported with their line number and the reason.
+- Rows that share a source Session_ID keep sharing one session. Rows without
+  one are grouped by date, type, detail and coach.
+- New session ids are reserved once per batch, and each batch is committed as
+  one locked write of the workbook (idp_training.add_training_entries).
+"""
+import argparse
+import csv
+import io
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+from idp_data import EXCEL_FILE
+from idp_players import normalise_name
+from idp_training import TRAINING_COLUMNS, add_training_entries, allocate_session_ids
+
+BATCH_SIZE = int(os.environ.get('IDP_IMPORT_BATCH', 2000))
+
+# normalised source header -> training log column
+COLUMN_ALIASES = {
+    'player': 'Player', 'player name': 'Player', 'name': 'Player',
+    'type': 'Type', 'session type': 'Type', 'training type': 'Type',
+    'detail': 'Detail', 'details': 'Detail', 'focus': 'Detail', 'training detail': 'Detail',
+    'date': 'Date', 'session date': 'Date', 'training date': 'Date',
+    'coach': 'Coach', 'coaches': 'Coach', 'coach name': 'Coach',
+    'notes': 'Notes', 'note': 'Notes', 'comments': 'Notes',
+    'session id': 'Session_ID', 'session number': 'Session_ID',
+}
+REQUIRED_COLUMNS = ['Player', 'Date', 'Type']
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d %b %Y', '%Y-%m-%d %H:%M:%S']
+
+
+def _kind(name):
+    extension = os.path.splitext(name)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    if extension in ('.csv', '.txt'):
+        return 'csv'
+    raise ValueError(f"Can't import {name}: use an .xlsx or .csv file")
+
+
+@contextmanager
+def open_rows(source, name=None, sheet=None):
+    """(headers, rows) of a spreadsheet, where `rows` yields (line number, values) one row at a time
+
+    `source` is a path or a binary file object (an upload). For a file object,
+    `name` gives the file type.
+    """
+    kind = _kind(name or source)
+    if kind == 'xlsx':
+        from openpyxl import load_workbook
+        if not isinstance(source, str):
+            source.seek(0)
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        lines = enumerate(worksheet.iter_rows(values_only=True), start=1)
+        close = workbook.close
+    elif isinstance(source, str):
+        text = open(source, newline='', encoding='utf-8-sig')
+        lines = enumerate(csv.reader(text), start=1)
+        close = text.close
+    else:
+        source.seek(0)
+        text = io.TextIOWrapper(source, newline='', encoding='utf-8-sig')
+        lines = enumerate(csv.reader(text), start=1)
+        close = text.detach    # leave the caller's file open
+
+    try:
+        headers = None
+        for line, values in lines:
+            if any(value not in (None, '') for value in values):
+                headers = ['' if value is None else str(value).strip() for value in values]
+                break
+        if headers is None:
+            raise ValueError("The file has no header row")
+        rows = ((line, values) for line, values in lines if any(value not in (None, '') for value in values))
+        yield headers, rows
+    finally:
+        close()
+
+
+def sheet_names(source):
+    """Sheets of an .xlsx workbook (path or file object)"""
+    from openpyxl import load_workbook
+    if not isinstance(source, str):
+        source.seek(0)
+    workbook = load_workbook(source, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def guess_mapping(headers):
+    """Source header -> training log column, for the headers we recognise"""
+    mapping = {}
+    for header in headers:
+        key = normalise_name(header)
+        column = next((col for col in TRAINING_COLUMNS if normalise_name(col) == key), None) or COLUMN_ALIASES.get(key)
+        if column and column not in mapping.values():
+            mapping[header] = column
+    return mapping
+
+
+def parse_date(value):
+    """A cell as a 'YYYY-MM-DD' string, or None if it isn't a date"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (int, float)) and not pd.isna(value) and 20000 < value < 80000:
+        # a date the CSV export left as an Excel serial number
+        return (pd.Timestamp('1899-12-30') + pd.Timedelta(days=int(value))).strftime('%Y-%m-%d')
+    text = '' if value is None else str(value).strip()
+    if not text:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    parsed = pd.to_datetime(text, errors='coerce')
+    return None if pd.isna(parsed) else parsed.strftime('%Y-%m-%d')
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    return str(value).strip()
+
+
+class Importer:
+    """Validates mapped rows, groups them into sessions and commits them in batches"""
+
+    def __init__(self, roster, mapping, path=EXCEL_FILE, batch_size=BATCH_SIZE, dry_run=False):
+        self.roster = {normalise_name(player): player for player in roster}
+        self.mapping = mapping
+        self.path = path
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.sessions = {}    # source session id or (date, type, detail, coach) -> new session id
+        self.batch = []
+        self.rows = 0
+        self.imported = 0
+        self.batches = 0
+        self.rejected = []
+
+    def entry(self, line, headers, values):
+        """The training log entry for a source row, or None after recording why it was rejected"""
+        raw = {header: value for header, value in zip(headers, values) if header}
+        entry = {column: _cell(raw.get(header)) for header, column in self.mapping.items()}
+        player = self.roster.get(normalise_name(entry.get('Player')))
+        reason = None
+        if not entry.get('Player'):
+            reason = "no player"
+        elif player is None:
+            reason = f"{entry['Player']} is not in Player Bios"
+        elif not entry.get('Type'):
+            reason = "no type"
+        else:
+            day = parse_date(raw.get(next(header for header, column in self.mapping.items() if column == 'Date')))
+            if day is None:
+                reason = f"bad date: {entry.get('Date') or 'blank'}"
+        if reason:
+            self.rejected.append({'line': line, 'reason': reason,
+                                  'row': {key: _cell(value) for key, value in raw.items()}})
+            return None
+        entry.update(Player=player, Date=day)
+        return {column: entry.get(column, '') for column in TRAINING_COLUMNS}
+
+    def add(self, entry):
+        self.batch.append(entry)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def _session_key(self, entry):
+        if entry['Session_ID']:
+            return ('source', entry['Session_ID'])
+        return ('group', entry['Date'], entry['Type'], entry['Detail'], entry['Coach'])
+
+    def flush(self):
+        """Commit the current batch: reserve ids for its new sessions at once, then write it in one transaction"""
+        if not self.batch:
+            return
+        keys = [self._session_key(entry) for entry in self.batch]
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self.sessions]
+        if new_keys and not self.dry_run:
+            first = allocate_session_ids(len(new_keys), self.path)
+            self.sessions.update((key, first + i) for i, key in enumerate(new_keys))
+        else:
+            self.sessions.update((key, None) for key in new_keys)
+        for entry, key in zip(self.batch, keys):
+            entry['Session_ID'] = self.sessions[key]
+        if not self.dry_run:
+            add_training_entries(self.batch, self.path)
+        self.imported += len(self.batch)
+        self.batches += 1
+        self.batch = []
+
+
+def import_sessions(source, name=None, sheet=None, mapping=None, path=EXCEL_FILE, batch_size=BATCH_SIZE,
+                    dry_run=False, progress=None):
+    """Import every valid row of `source` into the training log at `path` and return a report
+
+    `progress(rows_read, imported)` is called after every batch.
+    """
+    started = time.perf_counter()
+    roster = pd.read_excel(path, sheet_name='Player Bios')['Player'].dropna().tolist()
+    with open_rows(source, name, sheet) as (headers, rows):
+        mapping = dict(mapping) if mapping is not None else guess_mapping(headers)
+        missing = [column for column in REQUIRED_COLUMNS if column not in mapping.values()]
+        if missing:
+            raise ValueError(f"No column for {', '.join(missing)} (found {', '.join(headers)})")
+
+        importer = Importer(roster, mapping, path, batch_size, dry_run)
+        for line, values in rows:
+            importer.rows += 1
+            entry = importer.entry(line, headers, values)
+            if entry is not None:
+                batches = importer.batches
+                importer.add(entry)
+                if progress and importer.batches > batches:
+                    progress(importer.rows, importer.imported)
+        importer.flush()
+    if progress:
+        progress(importer.rows, importer.imported)
+
+    seconds = time.perf_counter() - started
+    return {
+        'mapping': mapping,
+        'rows': importer.rows,
+        'imported': importer.imported,
+        'sessions': len(importer.sessions),
+        'rejected': importer.rejected,
+        'batches': importer.batches,
+        'seconds': round(seconds, 2),
+        'rows_per_second': round(importer.rows / seconds) if seconds else 0,
+        'dry_run': dry_run,
+    }
+
+
+def rejected_frame(report):
+    """Rejected rows as a table, with the line number and reason first"""
+    return pd.DataFrame([{'Line': reject['line'], 'Reason': reject['reason'], **reject['row']} for reject in report['rejected']])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical training sessions from an .xlsx or .csv file")
+    parser.add_argument('source', help="Workbook or CSV file to import")
+    parser.add_argument('--sheet', help="Sheet to read (default: the first)")
+    parser.add_argument('--map', action='append', default=[], metavar='SOURCE=COLUMN',
+                        help=f"Map a source column onto one of {', '.join(TRAINING_COLUMNS)}")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per committed batch")
+    parser.add_argument('--workbook', default=EXCEL_FILE, help="Tracker workbook to import into")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+    parser.add_argument('--rejects', help="Write the rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    mapping = None
+    if args.map:
+        with open_rows(args.source, sheet=args.sheet) as (headers, _):
+            mapping = guess_mapping(headers)
+        for item in args.map:
+            header, _, column = item.partition('=')
+            if column not in TRAINING_COLUMNS:
+                parser.error(f"--map {item}: {column!r} is not one of {', '.join(TRAINING_COLUMNS)}")
+            mapping = {source: target for source, target in mapping.items() if source != header and target != column}
+            mapping[header] = column
+
+    try:
+        report = import_sessions(args.source, sheet=args.sheet, mapping=mapping, path=args.workbook,
+                                 batch_size=args.batch_size, dry_run=args.dry_run,
+                                 progress=lambda rows, imported: print(f"  {rows} rows read, {imported} imported", flush=True))
+    except (ValueError, KeyError) as e:
+        parser.error(str(e))
+
+    print("Columns: " + ", ".join(f"{source} -> {column}" for source, column in report['mapping'].items()))
+    verb = "would import" if report['dry_run'] else "imported"
+    print(f"{report['rows']} rows read, {verb} {report['imported']} in {report['sessions']} sessions "
+          f"({report['batches']} batches), {len(report['rejected'])} rejected | "
+          f"{report['seconds']}s, {report['rows_per_second']} rows/s")
+    if report['rejected']:
+        reasons = rejected_frame(report)['Reason'].value_counts()
+        for reason, count in reasons.head(10).items():
+            print(f"  {count} x {reason}")
+        if args.rejects:
+            rejected_frame(report).to_csv(args.rejects, index=False)
+            print(f"Rejected rows written to {args.rejects}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Ingest new league event drops into the events file the app reads.
+
+    python idp_ingest.py drops/matchweek12.parquet [drops/more.csv ...]
+
+Incoming files are StatsBomb-style flattened event exports (parquet or CSV). They
+are streamed in record batches, so memory is bounded by the batch size and not by
+the size of the drop. Every batch gets the app's computed columns (x/y from
+locations, completed_pass, is_progressive, is_progressive_carry, is_box_entry, xA,
+pressure_leading_to_shot, ...). It is then deduplicated by event id against the
+existing file and earlier batches, and sorted by player and match. The existing
+file is copied row group by row group into a new file with the new rows appended,
+and the new file is swapped in atomically.
+
+xA and the pressure/shot links refer to other events, possibly in other batches.
+A first pass reads only the few columns needed to resolve them.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from idp_data import EVENTS_FILE
+from idp_files import replace_atomically
+
+
+BATCH_SIZE = 50_000
+
+# Box and progression thresholds, in StatsBomb pitch coordinates (120 x 80, attacking left to right)
+BOX_X = 102
+BOX_Y = (17, 62)
+GOAL = (120, 40)
+PROGRESSIVE_RATIO = 0.75   # the action ends at most 75% of its starting distance from goal
+PROGRESSIVE_MIN_END_X = 60  # ... and finishes in the opposition half
+SHOT_WINDOW_SECONDS = 15
+
+LOCATION_COLUMNS = {
+    'location': ('x', 'y'),
+    'pass_end_location': ('pass_end_x', 'pass_end_y'),
+    'carry_end_location': ('carry_end_x', 'carry_end_y'),
+}
+
+CONTEXT_COLUMNS = ['id', 'type', 'match_id', 'period', 'minute', 'second', 'team',
+                   'shot_key_pass_id', 'shot_statsbomb_xg']
+
+
+def iter_batches(path, columns=None, batch_size=BATCH_SIZE):
+    """Stream a parquet or CSV file as pandas frames of at most `batch_size` rows"""
+    if path.endswith('.csv'):
+        # empty cells are missing values, not empty strings (an empty pass_outcome is a completed pass)
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=1 << 22),
+                                 convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+        for batch in reader:
+            frame = batch.to_pandas()
+            if columns is not None:
+                frame = frame[[c for c in columns if c in frame.columns]]
+            for start in range(0, len(frame), batch_size):
+                yield frame.iloc[start:start + batch_size]
+    else:
+        parquet = pq.ParquetFile(path)
+        if columns is not None:
+            columns = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+
+def _coords(value):
+    """[x, y] from a location cell (list, array or its JSON text)"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return (np.nan, np.nan)
+    if isinstance(value, (list, tuple, np.ndarray)) and len(value) >= 2:
+        return (float(value[0]), float(value[1]))
+    return (np.nan, np.nan)
+
+
+def _event_seconds(df):
+    return df['minute'].astype(float) * 60 + df['second'].astype(float) if 'second' in df else df['minute'].astype(float) * 60
+
+
+def _distance_to_goal(x, y):
+    return np.hypot(GOAL[0] - x, GOAL[1] - y)
+
+
+def _in_box(x, y):
+    return (x > BOX_X) & (y > BOX_Y[0]) & (y < BOX_Y[1])
+
+
+def read_context(paths, batch_size=BATCH_SIZE):
+    """First pass: key pass xG and shot/pressure timings needed to link events across batches"""
+    key_pass_xg = {}
+    shots, pressures = [], []
+    for path in paths:
+        for batch in iter_batches(path, CONTEXT_COLUMNS, batch_size):
+            is_shot = batch['type'] == 'Shot'
+            if 'shot_key_pass_id' in batch:
+                assisted = batch[is_shot & batch['shot_key_pass_id'].notna()]
+                key_pass_xg.update(zip(assisted['shot_key_pass_id'], assisted['shot_statsbomb_xg'].fillna(0)))
+            if {'team', 'period', 'minute'} <= set(batch.columns):
+                timed = batch.assign(t=_event_seconds(batch))[['match_id', 'period', 'team', 't']]
+                shots.append(timed[is_shot])
+                pressures.append(timed[batch['type'] == 'Pressure'])
+
+    def frame(parts):
+        if not parts:
+            return pd.DataFrame(columns=['match_id', 'period', 'team', 't'])
+        return pd.concat(parts, ignore_index=True).dropna(subset=['t']).sort_values('t')
+
+    return {'key_pass_xg': key_pass_xg, 'shots': frame(shots), 'pressures': frame(pressures)}
+
+
+def _linked(rows, others, direction):
+    """Whether each row has an event in `others` by the same team within the shot window"""
+    if rows.empty or others.empty:
+        return pd.Series(False, index=rows.index)
+    left = rows[['match_id', 'period', 'team']].assign(t=_event_seconds(rows), row=rows.index).dropna(subset=['t'])
+    left = left.sort_values('t')
+    right = others.rename(columns={'t': 'other_t'}).assign(t=others['t'])
+    matched = pd.merge_asof(left, right, on='t', by=['match_id', 'period', 'team'],
+                            direction=direction, tolerance=SHOT_WINDOW_SECONDS, allow_exact_matches=True)
+    return pd.Series(matched['other_t'].notna().to_numpy(), index=matched['row']).reindex(rows.index, fill_value=False)
+
+
+def derive_columns(df, context):
+    """Add the app's computed columns to a batch of raw events (columns already present are kept)"""
+    df = df.copy()
+    for location, (x, y) in LOCATION_COLUMNS.items():
+        if x not in df and location in df:
+            coords = np.array([_coords(v) for v in df[location]], dtype=float).reshape(-1, 2)
+            df[x], df[y] = coords[:, 0], coords[:, 1]
+    for x, y in LOCATION_COLUMNS.values():
+        for col in (x, y):
+            if col not in df:
+                df[col] = np.nan
+
+    is_pass = df['type'] == 'Pass'
+    is_carry = df['type'] == 'Carry'
+    is_shot = df['type'] == 'Shot'
+    start_distance = _distance_to_goal(df['x'], df['y'])
+
+    if 'completed_pass' not in df:
+        df['completed_pass'] = is_pass & (df['pass_outcome'].isna() if 'pass_outcome' in df else True)
+    if 'is_progressive' not in df:
+        df['is_progressive'] = is_pass & (_distance_to_goal(df['pass_end_x'], df['pass_end_y']) <= PROGRESSIVE_RATIO * start_distance) & (df['pass_end_x'] >= PROGRESSIVE_MIN_END_X)
+    if 'is_progressive_carry' not in df:
+        df['is_progressive_carry'] = is_carry & (_distance_to_goal(df['carry_end_x'], df['carry_end_y']) <= PROGRESSIVE_RATIO * start_distance) & (df['carry_end_x'] >= PROGRESSIVE_MIN_END_X)
+    if 'is_box_entry' not in df:
+        end_x = df['pass_end_x'].where(is_pass, df['carry_end_x'])
+        end_y = df['pass_end_y'].where(is_pass, df['carry_end_y'])
+        ends_in_box = _in_box(end_x, end_y) & ~_in_box(df['x'], df['y'])
+        df['is_box_entry'] = (is_pass & df['completed_pass'] & ends_in_box) | (is_carry & ends_in_box)
+    if 'xA' not in df:
+        df['xA'] = df['id'].map(context['key_pass_xg']).where(is_pass) if 'id' in df else np.nan
+
+    if 'play_pattern' in df:
+        for col, pattern in (('counter_shot', 'From Counter'), ('shot_from_corner', 'From Corner'), ('shot_from_fk', 'From Free Kick')):
+            if col not in df:
+                df[col] = is_shot & (df['play_pattern'] == pattern)
+
+    if {'team', 'period', 'minute'} <= set(df.columns):
+        if 'pressure_leading_to_shot' not in df:
+            pressures = df[df['type'] == 'Pressure']
+            df['pressure_leading_to_shot'] = _linked(pressures, context['shots'], 'forward').reindex(df.index, fill_value=False)
+        if 'pressure_in_prev_15s' not in df:
+            df['pressure_in_prev_15s'] = _linked(df[is_shot], context['pressures'], 'backward').reindex(df.index, fill_value=False)
+    return df
+
+
+def _existing_ids(path):
+    if not os.path.exists(path) or 'id' not in pq.ParquetFile(path).schema_arrow.names:
+        return set()
+    return set(pq.read_table(path, columns=['id']).column('id').to_pylist())
+
+
+def _to_table(df, schema):
+    """Arrow table for `df` laid out like `schema` (missing columns null, extras dropped)"""
+    df = df.reindex(columns=schema.names)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    columns = []
+    for field in schema:
+        column = table.column(field.name)
+        columns.append(column if column.type == field.type else column.cast(field.type, safe=False))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def ingest(paths, output=EVENTS_FILE, batch_size=BATCH_SIZE, log=print):
+    """Stream `paths` into `output` and return a summary dict with throughput"""
+    started = time.perf_counter()
+    context = read_context(paths, batch_size)
+    seen = _existing_ids(output)
+    existing = pq.ParquetFile(output) if os.path.exists(output) else None
+    schema = existing.schema_arrow if existing is not None else None
+
+    read = duplicates = written = 0
+    staged = output + '.staged.parquet'
+    writer = None
+    try:
+        for path in paths:
+            for batch in iter_batches(path, batch_size=batch_size):
+                read += len(batch)
+                if 'id' in batch:
+                    known = np.fromiter((event_id in seen for event_id in batch['id']), dtype=bool, count=len(batch))
+                    fresh = ~known & ~batch['id'].duplicated().to_numpy()
+                    duplicates += int((~fresh).sum())
+                    batch = batch[fresh]
+                    seen.update(batch['id'])
+                if batch.empty:
+                    continue
+
+                batch = derive_columns(batch, context).sort_values(['player_id', 'match_id'], kind='stable')
+                if schema is None:
+                    schema = pa.Table.from_pandas(batch, preserve_index=False).schema.remove_metadata()
+                table = _to_table(batch, schema)
+                if writer is None:
+                    writer = pq.ParquetWriter(staged, schema)
+                writer.write_table(table)
+                written += len(batch)
+                log(f"{path}: {read} read, {written} new, {duplicates} duplicates")
+        if writer is not None:
+            writer.close()
+            writer = None
+
+        if written:
+            def write(f):
+                with pq.ParquetWriter(f, schema) as out:
+                    if existing is not None:
+                        for i in range(existing.num_row_groups):
+                            out.write_table(_to_table(existing.read_row_group(i).to_pandas(), schema))
+                    new_rows = pq.ParquetFile(staged)
+                    for i in range(new_rows.num_row_groups):
+                        out.write_table(new_rows.read_row_group(i))
+            replace_atomically(output, write)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(staged):
+            os.unlink(staged)
+
+    seconds = time.perf_counter() - started
+    return {
+        'files': len(paths),
+        'events read': read,
+        'duplicates skipped': duplicates,
+        'events written': written,
+        'seconds': round(seconds, 2),
+        'events/sec': int(read / seconds) if seconds else read,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new event exports to the league events file")
+    parser.add_argument('paths', nargs='+', help="Parquet or CSV event exports")
+    parser.add_argument('--output', default=EVENTS_FILE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    summary = ingest(args.paths, args.output, args.batch_size)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
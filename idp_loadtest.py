@@ -0,0 +1,390 @@
+"""Load test: many simulated coaches using the app at once.
+
+Runs MitchApp.py headlessly with Streamlit's AppTest. Each simulated session is
+its own AppTest in its own thread, all in one process, the way the Streamlit
+server runs one script thread per browser session. Sessions move between the
+Overview, Analytics and Add New Entry pages and random player pages, and change
+random widgets on each page (pills, radios, selects, multiselects, checkboxes,
+text fields). Buttons are never pressed, so nothing is written to the log.
+
+The app runs against a scratch copy of the data with a synthetic league events
+file of the requested size, built with the same pipeline as real drops
+(idp_ingest). The training log can be padded with synthetic entries too.
+
+    python idp_loadtest.py --sessions 8 --steps 20 --events 300000 --entries 5000
+
+Reported: p50/p95/p99 rerun latency (overall and per page), reruns per second,
+errors, and peak resident memory of the process.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from idp_data import EXCEL_FILE, MINS_FILE, SEASON_FILE, EVENTS_FILE, IMAGES_FOLDER, read_training_log
+
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MitchApp.py')
+BROWSE_PAGES = ['Overview', 'Analytics', 'Add New Entry']
+PLAYER_PAGE_PREFIX = "👤  "
+WIDGET_TYPES = ['selectbox', 'radio', 'multiselect', 'checkbox', 'toggle', 'button_group', 'text_input', 'text_area']
+SAMPLE_TEXT = ['Finishing', 'Pressing triggers', 'Back post runs', 'Scanning', 'First touch', '1v1 defending']
+
+
+def _rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+class MemorySampler(threading.Thread):
+    """Polls resident memory in the background and keeps the peak"""
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, _rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, _rss_mb())
+        return self.peak
+
+
+# --- synthetic data -----------------------------------------------------------
+
+def synthetic_raw_events(n_events, season, mins, seed=0):
+    """StatsBomb-style raw events for the season's players, in fixtures between their teams"""
+    rng = np.random.default_rng(seed)
+    players = season[['player_id', 'Team']].dropna().drop_duplicates('player_id')
+    teams = sorted(players['Team'].unique())
+
+    # a double round robin for every team, plus Racing's real match ids for its own players
+    fixtures = [(home, away) for home in teams for away in teams if home != away]
+    fixture_ids = np.arange(len(fixtures)) + 4_000_000
+    team_fixtures = {team: fixture_ids[[i for i, pair in enumerate(fixtures) if team in pair]] for team in teams}
+    racing_ids = set(mins['player_id'].dropna().unique())
+    racing_matches = mins['match_id'].dropna().unique()
+
+    types = np.array(['Pass', 'Ball Receipt*', 'Carry', 'Pressure', 'Shot', 'Dribble', 'Duel', 'Ball Recovery'])
+    type_p = [.3, .28, .2, .1, .02, .03, .04, .03]
+    player_ids = rng.choice(players['player_id'].to_numpy(), n_events)
+    player_team = players.set_index('player_id')['Team']
+    events = pd.DataFrame({
+        'id': [f'synthetic-{i}' for i in range(n_events)],
+        'player_id': player_ids,
+        'team': player_team.reindex(player_ids).to_numpy(),
+        'type': rng.choice(types, n_events, p=type_p),
+        'period': rng.integers(1, 3, n_events),
+        'minute': rng.integers(0, 95, n_events),
+        'second': rng.integers(0, 60, n_events),
+        'x': rng.uniform(0, 120, n_events),
+        'y': rng.uniform(0, 80, n_events),
+        'play_pattern': rng.choice(['Regular Play', 'From Counter', 'From Corner', 'From Free Kick'], n_events, p=[.8, .08, .08, .04]),
+        'under_pressure': rng.random(n_events) < .2,
+    })
+    match_ids = np.empty(n_events, dtype=np.int64)
+    for team, rows in events.groupby('team').indices.items():
+        match_ids[rows] = rng.choice(team_fixtures[team], len(rows))
+    is_racing = np.isin(player_ids, list(racing_ids))
+    if len(racing_matches):
+        match_ids[is_racing] = rng.choice(racing_matches, int(is_racing.sum()))
+    events['match_id'] = match_ids
+
+    kind = events['type'].to_numpy()
+    is_pass, is_carry, is_shot = kind == 'Pass', kind == 'Carry', kind == 'Shot'
+    events['pass_end_x'] = np.where(is_pass, np.clip(events['x'] + rng.normal(8, 15, n_events), 0, 120), np.nan)
+    events['pass_end_y'] = np.where(is_pass, rng.uniform(0, 80, n_events), np.nan)
+    events['pass_outcome'] = np.where(is_pass & (rng.random(n_events) < .2), 'Incomplete', None)
+    events['pass_cross'] = np.where(is_pass & (rng.random(n_events) < .04), True, None)
+    events['pass_type'] = np.where(is_pass & (rng.random(n_events) < .03), 'Corner', None)
+    events['carry_end_x'] = np.where(is_carry, np.clip(events['x'] + rng.uniform(-5, 20, n_events), 0, 120), np.nan)
+    events['carry_end_y'] = np.where(is_carry, np.clip(events['y'] + rng.normal(0, 8, n_events), 0, 80), np.nan)
+    events['shot_statsbomb_xg'] = np.where(is_shot, rng.beta(1, 8, n_events), np.nan)
+    events['shot_outcome'] = np.where(is_shot, rng.choice(['Goal', 'Saved', 'Off T', 'Blocked'], n_events, p=[.12, .3, .38, .2]), None)
+    events['shot_type'] = np.where(is_shot, rng.choice(['Open Play', 'Penalty', 'Free Kick'], n_events, p=[.9, .05, .05]), None)
+    events['dribble_outcome'] = np.where(kind == 'Dribble', rng.choice(['Complete', 'Incomplete'], n_events), None)
+
+    # link a share of shots to an earlier completed pass by a teammate in the same match as its key pass
+    shot_rows = np.flatnonzero(is_shot)
+    completed = events[is_pass & events['pass_outcome'].isna()]
+    key_pass_of = pd.Series(None, index=events.index, dtype=object)
+    passes_by = completed.groupby(['match_id', 'team'])['id'].agg(list).to_dict()
+    for row in shot_rows[rng.random(len(shot_rows)) < .6]:
+        candidates = passes_by.get((events.at[row, 'match_id'], events.at[row, 'team']))
+        if candidates:
+            key_pass_of.at[row] = candidates[rng.integers(len(candidates))]
+    events['shot_key_pass_id'] = key_pass_of
+    assisted = events.loc[key_pass_of.notna(), ['shot_key_pass_id', 'shot_outcome']]
+    events['pass_shot_assist'] = np.where(events['id'].isin(assisted['shot_key_pass_id']), True, None)
+    events['pass_goal_assist'] = np.where(events['id'].isin(assisted.loc[assisted['shot_outcome'] == 'Goal', 'shot_key_pass_id']), True, None)
+    return events
+
+
+def synthetic_training_log(n_entries, bios, seed=0):
+    """Random training log entries for the players in the bios sheet"""
+    rng = random.Random(seed)
+    from idp_training import DEFAULT_TYPES
+    players = bios['Player'].dropna().tolist()
+    start = date.today() - timedelta(days=365)
+    rows = []
+    for i in range(n_entries):
+        rows.append({
+            'Player': rng.choice(players),
+            'Type': rng.choice(DEFAULT_TYPES),
+            'Detail': rng.choice(SAMPLE_TEXT),
+            'Date': (start + timedelta(days=rng.randrange(365))).strftime('%Y-%m-%d'),
+            'Coach': rng.choice(['Mitch', 'Bev', 'Ricky', 'Sam']),
+            'Notes': rng.choice(['', '', 'Good session', 'Focus on weak foot', 'Follow up on video']),
+            'Session_ID': 10_000 + i,
+        })
+    return pd.DataFrame(rows)
+
+
+def prepare_workdir(workdir, n_events, n_entries=0, seed=0, log=print):
+    """Scratch copy of the app's data files with a synthetic events file of `n_events` rows"""
+    from idp_ingest import ingest
+    from idp_training import write_training_log
+
+    source = os.path.dirname(APP_FILE)
+    os.makedirs(workdir, exist_ok=True)
+    for name in (EXCEL_FILE, MINS_FILE, SEASON_FILE):
+        shutil.copy2(os.path.join(source, name), os.path.join(workdir, name))
+    images = os.path.join(workdir, IMAGES_FOLDER)
+    if not os.path.exists(images):
+        os.symlink(os.path.join(source, IMAGES_FOLDER), images)
+
+    started = time.perf_counter()
+    season = pd.read_parquet(os.path.join(workdir, SEASON_FILE))
+    mins = pd.read_parquet(os.path.join(workdir, MINS_FILE))
+    raw = os.path.join(workdir, 'synthetic_events.parquet')
+    synthetic_raw_events(n_events, season, mins, seed).to_parquet(raw, index=False)
+    ingest([raw], output=os.path.join(workdir, EVENTS_FILE), log=lambda message: None)
+    os.unlink(raw)
+    log(f"{n_events} synthetic events written in {time.perf_counter() - started:.1f}s")
+
+    if n_entries:
+        excel = os.path.join(workdir, EXCEL_FILE)
+        bios = pd.read_excel(excel, sheet_name='Player Bios')
+        log_rows = pd.concat([read_training_log(excel), synthetic_training_log(n_entries, bios, seed)], ignore_index=True)
+        write_training_log(log_rows.sort_values('Date', ascending=False), excel)
+        log(f"{n_entries} synthetic training entries added")
+    return workdir
+
+
+# --- simulated sessions -------------------------------------------------------
+
+def _widgets(at):
+    """Interactive widgets in the main area of the current page (the sidebar holds navigation)"""
+    widgets = []
+    for kind in WIDGET_TYPES:
+        widgets += [widget for widget in at.main.get(kind) if not getattr(widget, 'disabled', False)]
+    return widgets
+
+
+def _change_widget(widget, rng):
+    """Give a widget a random new value, as a coach clicking around would"""
+    kind = widget.type
+    if kind == 'selectbox':
+        if widget.options:
+            widget.select_index(rng.randrange(len(widget.options)))
+    elif kind == 'radio':
+        if widget.options:
+            widget.set_value(rng.choice(widget.options))
+    elif kind == 'multiselect':
+        widget.set_value(rng.sample(widget.options, rng.randint(0, min(3, len(widget.options)))))
+    elif kind in ('checkbox', 'toggle'):
+        widget.set_value(not widget.value)
+    elif kind == 'button_group':
+        options = [option.content for option in widget.proto.options]
+        if options:
+            widget.set_value(rng.choice(options))
+    else:
+        widget.set_value(rng.choice(SAMPLE_TEXT))
+    return widget
+
+
+class SessionResult:
+    def __init__(self):
+        self.latencies = []   # (page, seconds) for every rerun
+        self.errors = []      # (page, message)
+        self.skipped = 0      # widget changes the widget rejected
+        self.incomplete = 0   # reruns that came back without the page (AppTest under thread contention), retried
+
+
+def run_session(players, steps, changes, seed, result, think_time=0, timeout=300):
+    """One simulated coach: `steps` page visits with up to `changes` widget changes on each.
+
+    Each visit is to Overview, Analytics, Add New Entry or a random player's page with equal odds.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+
+    def rerun(page, action=None, retries=2):
+        started = time.perf_counter()
+        (action or at.run)()
+        seconds = time.perf_counter() - started
+        if not at.sidebar.selectbox and not at.exception:
+            result.incomplete += 1
+            if retries:
+                rerun(page, retries=retries - 1)
+            else:
+                result.errors.append((page, "rerun returned no page"))
+            return
+        result.latencies.append((page, seconds))
+        for element in list(at.exception) + list(at.error):
+            result.errors.append((page, str(element.value)[:200]))
+
+    rerun('Overview')
+    for _ in range(steps):
+        label = rng.choice(BROWSE_PAGES + ['Player'] if players else BROWSE_PAGES)
+        page = f"{PLAYER_PAGE_PREFIX}{rng.choice(players)}" if label == 'Player' else label
+        if not at.sidebar.selectbox:
+            rerun(label)
+            if not at.sidebar.selectbox:
+                break
+        at.sidebar.selectbox[0].select(page)
+        rerun(label)
+        for _ in range(rng.randint(0, changes)):
+            widgets = _widgets(at)
+            if not widgets:
+                break
+            try:
+                widget = _change_widget(rng.choice(widgets), rng)
+            except (ValueError, IndexError, KeyError, TypeError):
+                result.skipped += 1
+                continue
+            rerun(label, widget.run)
+            if think_time:
+                time.sleep(rng.uniform(0, think_time))
+
+
+def percentiles(seconds):
+    values = np.asarray(seconds) * 1000
+    return {f'p{q}': round(float(np.percentile(values, q)), 1) for q in (50, 95, 99)} if len(values) else {}
+
+
+def load_test(sessions=4, steps=10, changes=3, think_time=0, seed=0, warmup=True, log=print):
+    """Run `sessions` concurrent simulated coaches in the current directory and return the report"""
+    from idp_data import load_bios
+
+    os.environ.pop('IDP_API_PORT', None)  # don't bind the API port from a test process
+    players = load_bios()['Player'].dropna().tolist()
+
+    if warmup:
+        started = time.perf_counter()
+        warm = SessionResult()
+        run_session(players[:3], steps=8, changes=1, seed=seed - 1, result=warm)
+        log(f"warm-up: {len(warm.latencies)} reruns in {time.perf_counter() - started:.1f}s")
+
+    results = [SessionResult() for _ in range(sessions)]
+    threads = [threading.Thread(target=run_session, args=(players, steps, changes, seed + i, results[i], think_time), daemon=True)
+               for i in range(sessions)]
+    baseline_mb = _rss_mb()
+    sampler = MemorySampler()
+    sampler.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    peak_mb = sampler.stop()
+
+    latencies = [item for result in results for item in result.latencies]
+    errors = [item for result in results for item in result.errors]
+    by_page = {}
+    for page, seconds in latencies:
+        by_page.setdefault(page, []).append(seconds)
+    return {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'errors': len(errors),
+        'error samples': sorted(set(message for _, message in errors))[:5],
+        'skipped widget changes': sum(result.skipped for result in results),
+        'incomplete reruns': sum(result.incomplete for result in results),
+        'wall s': round(wall, 1),
+        'reruns/s': round(len(latencies) / wall, 2) if wall else 0,
+        'latency ms': percentiles([seconds for _, seconds in latencies]),
+        'latency ms by page': {page: dict(percentiles(values), n=len(values)) for page, values in sorted(by_page.items())},
+        'mean rerun ms': round(statistics.mean(seconds for _, seconds in latencies) * 1000, 1) if latencies else None,
+        'rss before MB': round(baseline_mb),
+        'peak rss MB': round(peak_mb),
+    }
+
+
+def print_report(report):
+    latency = report['latency ms']
+    print(f"{report['sessions']} sessions | {report['reruns']} reruns in {report['wall s']}s | {report['reruns/s']} reruns/s"
+          f" | {report['errors']} errors | {report['skipped widget changes']} widget changes skipped"
+          f" | {report['incomplete reruns']} incomplete reruns retried")
+    print(f"rerun latency: p50 {latency.get('p50')} ms | p95 {latency.get('p95')} ms | p99 {latency.get('p99')} ms")
+    print(f"memory: {report['rss before MB']} MB before, {report['peak rss MB']} MB peak")
+    print(f"{'page':<16}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for page, stats in report['latency ms by page'].items():
+        print(f"{page:<16}{stats['n']:>6}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}")
+    for message in report['error samples']:
+        print(f"error: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent coaches using the app and report latency and memory")
+    parser.add_argument('--sessions', type=int, default=4, help="Concurrent simulated sessions")
+    parser.add_argument('--steps', type=int, default=10, help="Page visits per session")
+    parser.add_argument('--changes', type=int, default=3, help="Most widget changes per page visit")
+    parser.add_argument('--think-time', type=float, default=0, help="Most seconds a session pauses between interactions")
+    parser.add_argument('--events', type=int, default=200_000, help="Rows in the synthetic league events file")
+    parser.add_argument('--entries', type=int, default=0, help="Synthetic training log entries to add")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="Directory for the scratch data (default: a temporary directory)")
+    parser.add_argument('--reuse', action='store_true', help="Use the data already in --workdir")
+    parser.add_argument('--no-warmup', action='store_true', help="Measure from cold caches")
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='idp-loadtest-')
+    if not args.reuse:
+        prepare_workdir(workdir, args.events, args.entries, args.seed)
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(workdir)
+    try:
+        report = load_test(args.sessions, args.steps, args.changes, args.think_time, args.seed, not args.no_warmup)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
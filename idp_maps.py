@@ -0,0 +1,123 @@
+"""Activity Map cards: the headline numbers shown above each map.
+
+Each function takes one player's events (a slice of the league events) and returns
+the card's numbers as plain values, so the player page and the JSON API report
+the same figures.
+"""
+import numpy as np
+
+
+CARD_OPTIONS = ['Touches', 'Pressures', 'Defensive Duels', 'Ball Carrying', 'Progressive Actions', 'Key Passes', 'Shots']
+
+TOUCH_TYPES = ['Pass', 'Ball Receipt*', 'Shot']
+
+
+def safe_div(a, b):
+    return a / b if b != 0 else 0
+
+
+def shot_metrics(events, player_mins=None):
+    shots = events[(events['type'] == 'Shot') & (events['shot_type'] != 'Penalty')]
+    goals_scored = len(events[events['shot_outcome'] == 'Goal'])
+    xg_total = round(float(np.nansum(events['shot_statsbomb_xg'])), 2)
+    shots_taken = len(shots)
+
+    return {
+        'Goals': goals_scored,
+        'xG': xg_total,
+        'Shots': shots_taken,
+        'xG/Shot': round(safe_div(xg_total, shots_taken), 2),
+        'Conversion %': int(safe_div(goals_scored, shots_taken) * 100),
+        'Penalties Taken': len(events[(events['shot_type'] == 'Penalty')]),
+        'Penalties Scored': len(events[(events['shot_outcome'] == 'Goal') & (events['shot_type'] == 'Penalty')]),
+        'Transition xG': round(float(np.nansum(events[(events['pressure_in_prev_15s'] == True) | (events['counter_shot'] == True)]['shot_statsbomb_xg'])), 2),
+        'Set Piece xG': round(float(np.nansum(events[(events['shot_from_corner'] == True) | (events['shot_from_fk'] == True)]['shot_statsbomb_xg'])), 2),
+    }
+
+
+def key_pass_metrics(events, player_mins=None):
+    kps = events[(events['type'] == 'Pass') & ((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True))]
+
+    return {
+        'Assists': len(events[events['pass_goal_assist'] == True]),
+        'xA': round(float(np.nansum(events['xA'])), 2),
+        'Key Passes': len(kps),
+        'Big Chances': len(events[events['xA'] > 0.1]),
+        'Set Piece Key Passes': len(events[(events['pass_type'].isin(['Free Kick', 'Corner'])) & ((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True))]),
+        'Crosses Attempted': len(events[events['pass_cross'] == True]),
+        'Crosses Completed': len(events[(events['completed_pass'] == True) & (events['pass_cross'] == True)]),
+        'Cross Shot Assists': len(events[((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True)) & (events['pass_cross'] == True)]),
+    }
+
+
+def carrying_metrics(events, player_mins=None):
+    dribbles = events[events['type'] == 'Dribble']
+    in_box = (dribbles['x'] > 102) & (dribbles['y'] > 17) & (dribbles['y'] < 62)
+    complete = dribbles['dribble_outcome'] == 'Complete'
+    take_on_att = len(dribbles)
+    take_on_succ = int(complete.sum())
+    box_take_on_att = int(in_box.sum())
+    box_take_on_succ = int((in_box & complete).sum())
+
+    return {
+        'Take Ons Attempted': take_on_att,
+        'Take Ons Completed': take_on_succ,
+        'Dribble %': int(safe_div(take_on_succ, take_on_att) * 100),
+        'Box Take Ons Attempted': box_take_on_att,
+        'Box Take Ons Completed': box_take_on_succ,
+        'Box Dribble %': int(safe_div(box_take_on_succ, box_take_on_att) * 100),
+        'Progressive Carries': len(events[events['is_progressive_carry'] == True]),
+        'Box Entries': len(events[(events['type'] == 'Carry') & (events['is_box_entry'] == True)]),
+    }
+
+
+def progressive_metrics(events, player_mins=None):
+    prog_actions = events[(events['is_progressive'] == True) | (events['is_progressive_carry'] == True)]
+    succ_prog_passes = len(events[(events['type'] == 'Pass') & (events['is_progressive'] == True) & (events['completed_pass'] == True)])
+    att_prog_passes = len(events[(events['type'] == 'Pass') & (events['is_progressive'] == True)])
+    total_actions = len(events[events['type'].isin(['Pass', 'Carry'])])
+
+    return {
+        'Progressive Passes Completed': succ_prog_passes,
+        'Progressive Passes Attempted': att_prog_passes,
+        'Progressive Pass %': int(safe_div(succ_prog_passes, att_prog_passes) * 100),
+        'Progressive Carries': len(events[(events['type'] == 'Carry') & (events['is_progressive_carry'] == True)]),
+        '% of Actions Progressive': int(safe_div(len(prog_actions), total_actions) * 100),
+    }
+
+
+def touch_metrics(events, player_mins):
+    touches = events[events['type'].isin(TOUCH_TYPES)]
+    nineties = player_mins / 90
+
+    return {
+        'Touches p90': round(safe_div(len(touches), nineties), 1),
+        'Att. 1/3 Touches p90': round(safe_div(len(touches[touches['x'] > 80]), nineties), 1),
+        'Box Touches p90': round(safe_div(len(touches[(touches['x'] > 102) & (touches['y'] < 62) & (touches['y'] > 17)]), nineties), 1),
+    }
+
+
+def pressure_metrics(events, player_mins):
+    pressures = events[events['type'] == 'Pressure']
+    nineties = player_mins / 90
+
+    return {
+        'Pressures p90': round(safe_div(len(pressures), nineties), 1),
+        'Att. 1/3 Pressures p90': round(safe_div(len(pressures[pressures['x'] > 80]), nineties), 1),
+        'Pressures Leading to Shot p90': round(safe_div(len(pressures[pressures['pressure_leading_to_shot'] == True]), nineties), 1),
+    }
+
+
+CARD_METRICS = {
+    'Touches': touch_metrics,
+    'Pressures': pressure_metrics,
+    'Ball Carrying': carrying_metrics,
+    'Progressive Actions': progressive_metrics,
+    'Key Passes': key_pass_metrics,
+    'Shots': shot_metrics,
+}
+
+
+def card_metrics(events, player_mins):
+    """Headline numbers for every card that has them"""
+    return {card: metrics(events, player_mins) for card, metrics in CARD_METRICS.items()}
@@ -0,0 +1,248 @@
+"""Opt-in memory accounting for app reruns, with leak detection.
+
+Set IDP_MEMORY_REPORT to a file path before starting Streamlit to turn it on.
+Every rerun then records:
+
+- the process RSS before and after the rerun;
+- the number of open matplotlib figures;
+- the live DataFrames;
+- memory_usage(deep=True) of each table the rerun loaded, plus the shared cache entries.
+
+Any of these that grew monotonically over the last IDP_MEMORY_WINDOW reruns
+(default 10) is flagged. The report is rewritten after every rerun, so it can
+be attached to an incident ticket as it stands. To print it as text:
+
+    python idp_memory.py summary idp_memory.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+
+MEMORY_REPORT = os.environ.get('IDP_MEMORY_REPORT')
+GROWTH_WINDOW = int(os.environ.get('IDP_MEMORY_WINDOW', 10))
+HISTORY = 1000
+
+logger = logging.getLogger(__name__)
+
+# smallest rise over the window that counts as growth, per metric
+GROWTH_THRESHOLDS = {
+    'rss_mb': 5.0,
+    'figures': 1,
+    'frames': 1,
+    'frame_mb': 1.0,
+}
+TABLE_GROWTH_MB = 0.5
+
+_records = deque(maxlen=HISTORY)
+_lock = threading.Lock()
+_local = threading.local()
+_started = datetime.now()
+_reruns = 0
+
+
+def enabled():
+    return bool(MEMORY_REPORT)
+
+
+def rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def open_figures():
+    """matplotlib figures still open (pyplot keeps them until plt.close)"""
+    if 'matplotlib.pyplot' not in sys.modules:
+        return 0
+    return len(sys.modules['matplotlib.pyplot'].get_fignums())
+
+
+def live_frames():
+    """Number of DataFrames alive in the process and their (shallow) size in MB"""
+    frames = [obj for obj in gc.get_objects() if isinstance(obj, pd.DataFrame)]
+    size = 0
+    for frame in frames:
+        try:
+            size += int(frame.memory_usage(index=True, deep=False).sum())
+        except (ValueError, TypeError):
+            pass
+    return len(frames), size / 1024 / 1024
+
+
+def track_table(name, table):
+    """Record the deep size of a table the current rerun loaded"""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        from idp_data import memory_size
+        record['tables'][name] = round(memory_size(table) / 1024 / 1024, 2)
+
+
+def note(**fields):
+    """Attach fields (the page, say) to the current rerun's record"""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record.update(fields)
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+
+@contextmanager
+def track_rerun(session_id=None):
+    """Record the memory effect of the enclosed rerun (does nothing unless IDP_MEMORY_REPORT is set)"""
+    global _reruns
+    if not enabled():
+        yield None
+        return
+
+    record = {'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'session': session_id or _session_id(), 'page': None,
+              'rss_before_mb': round(rss_mb(), 1), 'tables': {}}
+    _local.record = record
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _local.record = None
+        record['seconds'] = round(time.perf_counter() - started, 3)
+        gc.collect()  # count only what is still reachable
+        record['rss_mb'] = round(rss_mb(), 1)
+        record['rss_delta_mb'] = round(record['rss_mb'] - record['rss_before_mb'], 1)
+        record['figures'] = open_figures()
+        record['frames'], frame_mb = live_frames()
+        record['frame_mb'] = round(frame_mb, 1)
+
+        from idp_data import cache_info
+        info = cache_info()
+        record['cache_mb'] = info['used_mb']
+        for entry in info['entries']:
+            record['tables'].setdefault(f"cache: {entry['Entry']}", entry['Size (MB)'])
+
+        with _lock:
+            _reruns += 1
+            record['rerun'] = _reruns
+            _records.append(record)
+        try:
+            write_report()
+        except OSError as e:
+            logger.warning("Could not write the memory report to %s: %s", MEMORY_REPORT, e)
+
+
+def _grew(values, threshold):
+    """Whether `values` never fell and rose by at least `threshold` overall"""
+    return len(values) >= 2 and all(b >= a for a, b in zip(values, values[1:])) and values[-1] - values[0] >= threshold
+
+
+def growth_flags(records, window=GROWTH_WINDOW):
+    """Metrics and tables that grew monotonically over the last `window` reruns"""
+    flags = []
+    recent = list(records)[-window:]
+    if len(recent) < window:
+        return flags
+    for metric, threshold in GROWTH_THRESHOLDS.items():
+        values = [record[metric] for record in recent]
+        if _grew(values, threshold):
+            flags.append({'metric': metric, 'from': values[0], 'to': values[-1], 'reruns': len(values)})
+
+    names = set().union(*(record['tables'] for record in recent))
+    for name in sorted(names):
+        values = [record['tables'][name] for record in recent if name in record['tables']]
+        if len(values) == window and _grew(values, TABLE_GROWTH_MB):
+            flags.append({'metric': f"table {name}", 'from': values[0], 'to': values[-1], 'reruns': len(values)})
+    return flags
+
+
+def report():
+    """The current report: growth flags, latest table sizes, RSS summary and recent reruns"""
+    with _lock:
+        records = list(_records)
+        reruns = _reruns
+    tables = {}
+    for record in records:
+        tables.update(record['tables'])
+    rss = [record['rss_mb'] for record in records]
+    return {
+        'pid': os.getpid(),
+        'started': _started.strftime('%Y-%m-%d %H:%M:%S'),
+        'written': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'reruns': reruns,
+        'window': GROWTH_WINDOW,
+        'flags': growth_flags(records),
+        'rss_mb': {'first': rss[0], 'last': rss[-1], 'peak': max(rss)} if rss else {},
+        'tables_mb': dict(sorted(tables.items(), key=lambda item: -item[1])),
+        'records': records,
+    }
+
+
+def write_report(path=None):
+    from idp_files import replace_atomically
+    data = json.dumps(report(), indent=1, default=str).encode()
+    replace_atomically(path or MEMORY_REPORT, lambda f: f.write(data))
+
+
+def summary(data):
+    """Plain-text summary of a report, for pasting into a ticket"""
+    lines = [f"Memory report for pid {data['pid']}: {data['reruns']} reruns from {data['started']} to {data['written']}"]
+    if data['rss_mb']:
+        rss = data['rss_mb']
+        lines.append(f"RSS: {rss['first']} MB at the first recorded rerun, {rss['last']} MB now, {rss['peak']} MB peak")
+    if data['flags']:
+        lines.append(f"Monotonic growth over the last {data['window']} reruns:")
+        lines += [f"  {flag['metric']}: {flag['from']} -> {flag['to']}" for flag in data['flags']]
+    else:
+        lines.append(f"No monotonic growth over the last {data['window']} reruns")
+
+    records = data['records']
+    if records:
+        last = records[-1]
+        lines.append(f"Open matplotlib figures: {last['figures']} | live DataFrames: {last['frames']} ({last['frame_mb']} MB)")
+        by_page = {}
+        for record in records:
+            by_page.setdefault(record['page'] or '?', []).append(record['rss_delta_mb'])
+        lines.append("RSS change per rerun by page (mean / max MB):")
+        lines += [f"  {page}: {sum(deltas) / len(deltas):+.1f} / {max(deltas):+.1f} over {len(deltas)} reruns"
+                  for page, deltas in sorted(by_page.items(), key=lambda item: -sum(item[1]))]
+    lines.append("Largest tables (MB):")
+    lines += [f"  {name}: {size}" for name, size in list(data['tables_mb'].items())[:15]]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a memory report written with IDP_MEMORY_REPORT")
+    commands = parser.add_subparsers(dest='command', required=True)
+    summarise = commands.add_parser('summary', help="Print a report as text")
+    summarise.add_argument('path', nargs='?', default=MEMORY_REPORT)
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("give the report path or set IDP_MEMORY_REPORT")
+    with open(args.path) as f:
+        print(summary(json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
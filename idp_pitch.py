@@ -0,0 +1,392 @@
+"""Activity Map pitch renders, drawn with matplotlib or as Plotly WebGL traces.
+
+Each card's map is described once as a list of point and line layers in StatsBomb
+pitch coordinates (120 x 80, y pointing down). Two backends draw those layers:
+
+* matplotlib: mplsoccer figures sent to the browser as PNGs (the default)
+* plotly: WebGL scatter traces over a pitch drawn as a line trace. The server only
+  builds a small JSON spec, the browser renders it, and the map can be zoomed and
+  panned. Hovering over an event shows its minute, opponent and xG (xA for key passes).
+
+The backend is chosen per deployment with IDP_MAP_BACKEND=matplotlib|plotly.
+
+    python idp_pitch.py benchmark [--players 10]
+"""
+import argparse
+import io
+import logging
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+
+MAP_BACKENDS = ('matplotlib', 'plotly')
+MAP_BACKEND = os.environ.get('IDP_MAP_BACKEND', 'matplotlib')
+if MAP_BACKEND not in MAP_BACKENDS:
+    logging.getLogger(__name__).warning("Unknown IDP_MAP_BACKEND %r, using matplotlib", MAP_BACKEND)
+    MAP_BACKEND = 'matplotlib'
+
+PITCH_CARDS = ['Shots', 'Key Passes', 'Ball Carrying', 'Progressive Actions']
+VERTICAL_CARDS = {'Shots', 'Key Passes'}  # drawn on the attacking half, attacking upwards
+HEX_MAP_VIEWS = ['Player', 'League Average', 'vs League Average']
+
+PITCH_COLOR = '#200020'
+LINE_COLOR = '#c7d5cc'
+SHOT_COLORS = {'Goal': 'green', 'Saved': 'yellow', 'Saved to Post': 'yellow'}
+FLAMINGO_COLORS = ['#e3aca7', '#c03a1d']
+DIVERGING_COLORS = ['#3b6fb6', '#f4f4f4', '#c03a1d']
+
+# Plotly marker diameter (px) per sqrt of a matplotlib '.' marker area, so sizes match the PNGs
+PLOTLY_MARKER_SCALE = 0.8
+
+
+def opponents(events, match_teams):
+    """Opponent of each event's team, from an 'opponent' column or the teams of its match"""
+    if 'opponent' in events:
+        return events['opponent'].fillna('').astype(str)
+    if 'team' not in events or not match_teams:
+        return pd.Series('', index=events.index)
+    return pd.Series([next((t for t in match_teams.get(match_id, ()) if t != team), '')
+                      for match_id, team in zip(events['match_id'], events['team'])], index=events.index)
+
+
+def hover_text(rows, match_teams, details=()):
+    """Hover label of each event: minute and opponent, then one line per (label, values) detail"""
+    minutes = rows['minute'].fillna(0).astype(int).tolist() if 'minute' in rows else [None] * len(rows)
+    against = opponents(rows, match_teams).tolist()
+    columns = [(label, pd.Series(values, index=rows.index).tolist()) for label, values in details]
+    text = []
+    for i, (minute, opponent) in enumerate(zip(minutes, against)):
+        lines = [' vs '.join(part for part in (f"{minute}'" if minute is not None else '', opponent) if part)]
+        lines += [f'{label}: {values[i]}' for label, values in columns]
+        text.append('<br>'.join(lines))
+    return text
+
+
+def _points(rows, color, size, hover=None, x='x', y='y'):
+    return {'kind': 'points', 'x': rows[x].to_numpy(dtype=float), 'y': rows[y].to_numpy(dtype=float),
+            'color': color, 'size': size, 'hover': hover}
+
+
+def _lines(rows, color, end_x, end_y, width=2, transparent=False, hover=None):
+    return {'kind': 'lines', 'x': rows['x'].to_numpy(dtype=float), 'y': rows['y'].to_numpy(dtype=float),
+            'x_end': rows[end_x].to_numpy(dtype=float), 'y_end': rows[end_y].to_numpy(dtype=float),
+            'color': color, 'width': width, 'transparent': transparent, 'hover': hover}
+
+
+def card_layers(card, events, match_teams=None):
+    """Point and line layers of a card's map, bottom first. Hover labels are only built when `match_teams` is given."""
+    hover = (lambda rows, details=(): hover_text(rows, match_teams, details)) if match_teams is not None else (lambda rows, details=(): None)
+
+    if card == 'Shots':
+        shots = events[events['type'] == 'Shot']
+        xg = shots['shot_statsbomb_xg'].fillna(0)
+        colors = shots['shot_outcome'].map(SHOT_COLORS).fillna('red').tolist()
+        return [_points(shots, colors, np.minimum(xg * 2050, 500).to_numpy(),
+                        hover(shots, [('xG', xg.round(2)), ('Outcome', shots['shot_outcome'].fillna('Unknown'))]))]
+
+    if card == 'Key Passes':
+        kps = events[(events['type'] == 'Pass') & ((events['pass_shot_assist'] == True) | (events['pass_goal_assist'] == True))]
+        assists = kps['pass_goal_assist'] == True
+        layers = []
+        for is_assist, color in ((False, 'orange'), (True, 'green')):
+            rows = kps[assists == is_assist]
+            details = [('xA', rows['xA'].fillna(0).round(2)), ('Outcome', 'Assist' if is_assist else 'Shot assist')]
+            layers.append(_lines(rows, color, 'pass_end_x', 'pass_end_y', width=3))
+            layers.append(_points(rows, 'white', 80))
+            layers.append(_points(rows, color, 250, hover(rows, details), 'pass_end_x', 'pass_end_y'))
+        return layers
+
+    if card == 'Ball Carrying':
+        dribbles = events[events['type'].isin(['Carry', 'Dribble'])]
+        carries = dribbles[dribbles['is_progressive_carry'] == True]
+        take_ons = dribbles[dribbles['type'] == 'Dribble']
+        outcome = take_ons['dribble_outcome'].fillna('Incomplete')
+        return [_lines(carries, 'orange', 'carry_end_x', 'carry_end_y', transparent=True,
+                       hover=hover(carries, [('Action', 'Progressive carry')])),
+                _points(take_ons, np.where(outcome == 'Complete', 'green', 'red').tolist(), 250,
+                        hover(take_ons, [('Dribble', outcome)]))]
+
+    if card == 'Progressive Actions':
+        prog_actions = events[(events['is_progressive'] == True) | (events['is_progressive_carry'] == True)]
+        carries = prog_actions[prog_actions['type'] == 'Carry']
+        passes = prog_actions[(prog_actions['type'] == 'Pass') & (prog_actions['completed_pass'] == True)]
+        return [_lines(carries, 'magenta', 'carry_end_x', 'carry_end_y', transparent=True,
+                       hover=hover(carries, [('Action', 'Progressive carry')])),
+                _lines(passes, 'orange', 'pass_end_x', 'pass_end_y', transparent=True,
+                       hover=hover(passes, [('Action', 'Progressive pass')]))]
+
+    raise ValueError(f"No pitch map for card {card!r}")
+
+
+def hex_values(hex_counts, layer, player_id, player_mins, view):
+    """Per-hexagon values of a hex map view and the (vmin, vmax) to colour them by (None = their own range)"""
+    if view == 'vs League Average':
+        values = hex_counts.difference_p90(layer, player_id, player_mins)
+        limit = np.nanmax(np.abs(values)) if np.isfinite(values).any() else 1
+        return values, (-limit, limit)
+    if view == 'League Average':
+        return hex_counts.league_p90(layer), None
+    return hex_counts.player_p90(layer, player_id, player_mins), None
+
+
+# --- matplotlib backend -------------------------------------------------------
+
+def mpl_card_map(card, events, match_teams=None):
+    """mplsoccer figure of a card's map"""
+    from mplsoccer import Pitch, VerticalPitch
+
+    if card in VERTICAL_CARDS:
+        pitch = VerticalPitch(pitch_type='statsbomb', pitch_color=PITCH_COLOR, line_color=LINE_COLOR,
+                              half=True, pad_top=6, corner_arcs=True,)
+    else:
+        pitch = Pitch(pitch_type='statsbomb', pitch_color=PITCH_COLOR, line_color=LINE_COLOR,
+                      pad_top=6, corner_arcs=True,)
+    fig, ax = pitch.draw(figsize=(8, 12))
+
+    for layer in card_layers(card, events):
+        if not len(layer['x']):
+            continue
+        if layer['kind'] == 'lines':
+            pitch.lines(layer['x'], layer['y'], layer['x_end'], layer['y_end'], comet=True, transparent=layer['transparent'],
+                        linewidth=layer['width'], color=layer['color'], ax=ax)
+        else:
+            pitch.scatter(layer['x'], layer['y'], ax=ax, color=layer['color'], marker='.', s=layer['size'])
+    return fig
+
+
+def mpl_hex_map(hex_counts, layer, player_id, player_mins, view):
+    """Hexbin pitch map for a Touches/Pressures layer, drawn from the pre-binned league counts"""
+    from mplsoccer import Pitch
+    from matplotlib.colors import LinearSegmentedColormap
+    from idp_hexbins import draw_hexbin
+
+    pitch = Pitch(line_color='white', line_zorder=2, pitch_color=PITCH_COLOR)
+    fig, ax = pitch.draw(figsize=(12, 8))
+
+    values, limits = hex_values(hex_counts, layer, player_id, player_mins, view)
+    if limits is not None:
+        diverging_cmap = LinearSegmentedColormap.from_list("Above/Below Average", DIVERGING_COLORS, N=11)
+        draw_hexbin(pitch, ax, hex_counts, values, edgecolors='#f4f4f4', cmap=diverging_cmap, vmin=limits[0], vmax=limits[1])
+    else:
+        flamingo_cmap = LinearSegmentedColormap.from_list("Flamingo - 10 colors", FLAMINGO_COLORS, N=10)
+        draw_hexbin(pitch, ax, hex_counts, values, edgecolors='#f4f4f4', cmap=flamingo_cmap)
+    return fig
+
+
+def figure_png(fig):
+    """PNG bytes of a matplotlib figure, saved the way st.pyplot would"""
+    import matplotlib.pyplot as plt
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+# --- Plotly backend -----------------------------------------------------------
+
+def _arc(cx, cy, radius, start, stop, steps=24):
+    angles = np.radians(np.linspace(start, stop, steps))
+    return list(zip(cx + radius * np.cos(angles), cy + radius * np.sin(angles)))
+
+
+def pitch_markings():
+    """StatsBomb pitch markings as polylines of (x, y) points"""
+    arc_angle = np.degrees(np.arccos(6 / 10))  # where the penalty arc meets the box, 6 yards beyond the spot
+    lines = [
+        [(0, 0), (120, 0), (120, 80), (0, 80), (0, 0)],
+        [(60, 0), (60, 80)],
+        _arc(60, 40, 10, 0, 360, 48),
+        _arc(60, 40, 0.4, 0, 360, 8),
+    ]
+    for goal_x, side in ((0, 1), (120, -1)):
+        box, six, spot = goal_x + side * 18, goal_x + side * 6, goal_x + side * 12
+        lines += [
+            [(goal_x, 18), (box, 18), (box, 62), (goal_x, 62)],
+            [(goal_x, 30), (six, 30), (six, 50), (goal_x, 50)],
+            [(goal_x, 36), (goal_x - side * 2, 36), (goal_x - side * 2, 44), (goal_x, 44)],
+            _arc(spot, 40, 0.4, 0, 360, 8),
+            _arc(spot, 40, 10, -arc_angle, arc_angle) if side == 1 else _arc(spot, 40, 10, 180 - arc_angle, 180 + arc_angle),
+        ]
+    for corner_x, corner_y, start in ((0, 0, 0), (120, 0, 90), (120, 80, 180), (0, 80, 270)):
+        lines.append(_arc(corner_x, corner_y, 1, start, start + 90, 6))
+    return lines
+
+
+def _polyline_xy(polylines):
+    """x and y lists of several polylines joined with None breaks, for a single line trace"""
+    xs, ys = [], []
+    for line in polylines:
+        xs += [float(x) for x, _ in line] + [None]
+        ys += [float(y) for _, y in line] + [None]
+    return xs, ys
+
+
+def plotly_pitch(vertical=False, height=None):
+    """Empty Plotly pitch: the whole pitch left to right, or the attacking half attacking upwards"""
+    import plotly.graph_objects as go
+
+    xs, ys = _polyline_xy(pitch_markings())
+    if vertical:
+        xs, ys = ys, xs
+    fig = go.Figure(go.Scatter(x=xs, y=ys, mode='lines', line=dict(color=LINE_COLOR, width=1.5),
+                               hoverinfo='skip', showlegend=False))
+    if vertical:
+        x_range, y_range = [-4, 84], [56, 126]
+    else:
+        x_range, y_range = [-4, 124], [84, -4]
+    axis = dict(visible=False, showgrid=False, zeroline=False)
+    fig.update_layout(
+        xaxis=dict(range=x_range, constrain='domain', **axis),
+        yaxis=dict(range=y_range, scaleanchor='x', scaleratio=1, **axis),
+        paper_bgcolor=PITCH_COLOR,
+        plot_bgcolor=PITCH_COLOR,
+        font=dict(color='white'),
+        margin=dict(l=10, r=10, t=10, b=10),
+        height=height or (640 if vertical else 520),
+        showlegend=False,
+        hoverlabel=dict(bgcolor='#200020', font=dict(color='white')),
+        dragmode='pan',
+    )
+    return fig
+
+
+def _plotly_layer(layer, vertical):
+    import plotly.graph_objects as go
+
+    hoverinfo = 'skip' if layer['hover'] is None else 'text'
+    if layer['kind'] == 'lines':
+        n = len(layer['x'])
+        x = np.column_stack([layer['x'], layer['x_end'], np.full(n, np.nan)]).ravel()
+        y = np.column_stack([layer['y'], layer['y_end'], np.full(n, np.nan)]).ravel()
+        text = None if layer['hover'] is None else [t for label in layer['hover'] for t in (label, label, None)]
+        if vertical:
+            x, y = y, x
+        return go.Scattergl(x=x, y=y, mode='lines', line=dict(color=layer['color'], width=layer['width']),
+                            opacity=0.6 if layer['transparent'] else 1, text=text, hoverinfo=hoverinfo, connectgaps=False)
+
+    x, y = (layer['y'], layer['x']) if vertical else (layer['x'], layer['y'])
+    size = np.sqrt(layer['size']) * PLOTLY_MARKER_SCALE
+    return go.Scattergl(x=x, y=y, mode='markers', marker=dict(color=layer['color'], size=size, line=dict(width=0)),
+                        text=layer['hover'], hoverinfo=hoverinfo)
+
+
+def plotly_card_map(card, events, match_teams=None):
+    """Plotly WebGL figure of a card's map, with hover labels when `match_teams` is given"""
+    vertical = card in VERTICAL_CARDS
+    fig = plotly_pitch(vertical)
+    for layer in card_layers(card, events, match_teams):
+        if len(layer['x']):
+            fig.add_trace(_plotly_layer(layer, vertical))
+    return fig
+
+
+def _color_steps(anchors, n):
+    """`n` evenly spaced colours of the linear ramp through `anchors`, as LinearSegmentedColormap.from_list(N=n)"""
+    rgb = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in anchors], dtype=float)
+    stops = np.linspace(0, 1, len(anchors))
+    return ['#%02x%02x%02x' % tuple(int(round(np.interp(step, stops, rgb[:, k]))) for k in range(3))
+            for step in np.linspace(0, 1, n)]
+
+
+def plotly_hex_map(hex_counts, layer, player_id, player_mins, view):
+    """Plotly hex map of a Touches/Pressures layer, coloured in the same steps as the matplotlib map"""
+    import plotly.graph_objects as go
+    from idp_hexbins import hex_polygon
+
+    values, limits = hex_values(hex_counts, layer, player_id, player_mins, view)
+    shown = np.flatnonzero(~np.isnan(values))
+    colors = _color_steps(DIVERGING_COLORS, 11) if limits is not None else _color_steps(FLAMINGO_COLORS, 10)
+    fig = plotly_pitch(vertical=False, height=540)
+    if not len(shown):
+        return fig
+
+    vmin, vmax = limits if limits is not None else (np.nanmin(values), np.nanmax(values))
+    scaled = (values[shown] - vmin) / (vmax - vmin) if vmax > vmin else np.zeros(len(shown))
+    steps = np.clip((scaled * len(colors)).astype(int), 0, len(colors) - 1)
+    polygon = hex_polygon(hex_counts.extent, hex_counts.gridsize)
+    centers = hex_counts.centers[shown]
+
+    for step in np.unique(steps):
+        in_step = centers[steps == step]
+        xs, ys = _polyline_xy([np.vstack([polygon, polygon[:1]]) + center for center in in_step])
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', fill='toself', fillcolor=colors[step],
+                                 line=dict(color='#f4f4f4', width=1), hoverinfo='skip'))
+    # re-draw the markings over the hexagons, as line_zorder=2 does on the matplotlib map
+    fig.add_trace(fig.data[0])
+
+    fmt = '{:+.2f} per 90 vs league' if limits is not None else '{:.2f} per 90'
+    fig.add_trace(go.Scattergl(x=centers[:, 0], y=centers[:, 1], mode='markers', marker=dict(size=18, opacity=0),
+                               text=[fmt.format(value) for value in values[shown]], hoverinfo='text'))
+    return fig
+
+
+# --- backend dispatch ---------------------------------------------------------
+
+def card_map(card, events, match_teams=None, backend=None):
+    """A card's map figure from the deployment's backend (matplotlib Figure or Plotly Figure)"""
+    if (backend or MAP_BACKEND) == 'plotly':
+        return plotly_card_map(card, events, match_teams)
+    return mpl_card_map(card, events)
+
+
+def hex_map(hex_counts, layer, player_id, player_mins, view, backend=None):
+    if (backend or MAP_BACKEND) == 'plotly':
+        return plotly_hex_map(hex_counts, layer, player_id, player_mins, view)
+    return mpl_hex_map(hex_counts, layer, player_id, player_mins, view)
+
+
+def figure_payload(fig, backend=None):
+    """Bytes the server sends the browser for a map: the PNG, or the Plotly JSON spec"""
+    if (backend or MAP_BACKEND) == 'plotly':
+        return fig.to_json().encode()
+    return figure_png(fig)
+
+
+def benchmark(players=10):
+    """Server render time (figure build + serialisation) and payload size per card and backend"""
+    from idp_data import load_event_table, load_form_series, load_hex_counts, load_match_teams
+    from idp_hexbins import HEX_LAYERS
+
+    table = load_event_table()
+    player_ids = sorted(table.rows, key=lambda p: table.rows[p][1] - table.rows[p][0], reverse=True)[:players]
+    events = {player_id: table.frame(player_id) for player_id in player_ids}
+    minutes = load_form_series().matches.groupby('player_id')['Minutes'].sum()
+    hex_counts, match_teams = load_hex_counts(), load_match_teams()
+
+    jobs = [(card, lambda player_id, backend, card=card: card_map(card, events[player_id], match_teams, backend))
+            for card in PITCH_CARDS]
+    jobs += [(f'{layer} ({view})', lambda player_id, backend, layer=layer, view=view:
+              hex_map(hex_counts, layer, player_id, float(minutes.get(player_id, 0)), view, backend))
+             for layer in HEX_LAYERS for view in HEX_MAP_VIEWS]
+
+    print(f"{len(player_ids)} players, {sum(len(e) for e in events.values())} events")
+    print(f"{'map':<32}{'backend':<12}{'render ms':>10}{'payload KB':>12}")
+    for name, render in jobs:
+        for backend in MAP_BACKENDS:
+            render(player_ids[0], backend)  # warm imports and fonts
+            seconds, sizes = [], []
+            for player_id in player_ids:
+                started = time.perf_counter()
+                payload = figure_payload(render(player_id, backend), backend)
+                seconds.append(time.perf_counter() - started)
+                sizes.append(len(payload))
+            print(f"{name:<32}{backend:<12}{statistics.median(seconds) * 1000:>10.1f}{statistics.median(sizes) / 1024:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Activity Map rendering backends")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('benchmark', help="Compare server render time and payload size of matplotlib and Plotly maps")
+    bench.add_argument('--players', type=int, default=10, help="Players with the most events to render")
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        benchmark(args.players)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""League-wide player identity index.
+
+Resolves the name a coach typed, or any id a data source uses, to the
+player_id of the season and event files. It is built from two sources:
+
+- the Racing Mins roster, for the club's own spelling of each name;
+- the season percentiles, for every league player's Player, Team,
+  player_id, offline_player_id and statsbomb_id.
+
+Names are compared after folding accents, case and punctuation, so
+'Elli Pikkujamsa' finds 'Elli Pikkujämsä'. Every name is also indexed by
+first + last name and by initial + last name. So 'Savannah DeMelo' finds
+'Savannah Marie DeMelo' and 'Sarah Weber' finds 'S.Weber'.
+
+An initial alias never overrides a first name that disagrees with it, so
+'Sam Weber' does not find 'Sarah Weber'; a first name that starts with the
+other ('Sam' and 'Samantha') or a bare initial counts as agreeing. If
+several players share an alias, the alias resolves only when a team is given.
+All lookups are dict hits.
+"""
+import re
+import unicodedata
+
+import pandas as pd
+
+
+def normalise_name(name):
+    """Lower-case ASCII words of a name: 'S.Weber' -> 's weber', 'Pikkujämsä' -> 'pikkujamsa'"""
+    if not isinstance(name, str):
+        return ''
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r"[^a-z0-9]+", ' ', ascii_name.lower().replace("'", '')).split())
+
+
+def name_aliases(name):
+    """Looser keys for a normalised name: first + last, and first initial + last"""
+    words = name.split()
+    if len(words) < 2:
+        return []
+    aliases = [f"{words[0]} {words[-1]}", f"{words[0][0]} {words[-1]}"]
+    return [alias for alias in dict.fromkeys(aliases) if alias != name]
+
+
+def first_names_agree(first, other):
+    """Whether two normalised first names can be the same person: equal, an initial, or one a prefix of the other"""
+    return len(first) == 1 or len(other) == 1 or first.startswith(other) or other.startswith(first)
+
+
+def _add(index, key, player_id):
+    index.setdefault(key, set()).add(player_id)
+
+
+class PlayerIndex:
+    def __init__(self, season_data, game_overview=None):
+        self.players = {}    # player_id -> {'Player', 'Team'}
+        self.ids = {}        # player_id, offline_player_id or statsbomb_id -> player_id
+        self.roster = {}     # Racing Mins name -> player_id, in roster order
+        self.names = {}      # normalised full name -> player_ids
+        self.aliases = {}    # first + last / initial + last -> player_ids
+        self.first_names = {}  # player_id -> normalised first names it is known by
+
+        id_columns = [col for col in ['player_id', 'offline_player_id', 'statsbomb_id'] if col in season_data.columns]
+        league = season_data.sort_values('Minutes', ascending=False) if 'Minutes' in season_data.columns else season_data
+        for row in league.drop_duplicates('player_id')[['Player', 'Team'] + id_columns].itertuples(index=False):
+            row = row._asdict()
+            player_id = int(row['player_id'])
+            self.players[player_id] = {'Player': row['Player'], 'Team': row['Team']}
+            self._add_name(row['Player'], player_id)
+            for col in id_columns:
+                if pd.notna(row[col]):
+                    self.ids.setdefault(int(row[col]), player_id)
+
+        if game_overview is not None:
+            for name, player_id in game_overview.drop_duplicates('Player')[['Player', 'player_id']].itertuples(index=False):
+                if pd.isna(player_id):
+                    continue
+                player_id = self.ids.get(int(player_id), int(player_id))
+                self.roster[name] = player_id
+                self.ids.setdefault(player_id, player_id)
+                self.players.setdefault(player_id, {'Player': name, 'Team': None})
+                self._add_name(name, player_id)
+
+    def _add_name(self, name, player_id):
+        key = normalise_name(name)
+        if not key:
+            return
+        _add(self.names, key, player_id)
+        _add(self.first_names, player_id, key.split()[0])
+        for alias in name_aliases(key):
+            _add(self.aliases, alias, player_id)
+
+    def _agreeing(self, player_ids, first):
+        """The players none of whose known first names contradicts `first`"""
+        return {player_id for player_id in player_ids
+                if all(first_names_agree(first, known) for known in self.first_names.get(player_id, ()))}
+
+    def _pick(self, player_ids, team):
+        if len(player_ids) == 1:
+            return next(iter(player_ids))
+        if team is not None:
+            on_team = [player_id for player_id in player_ids if self.players[player_id]['Team'] == team]
+            if len(on_team) == 1:
+                return on_team[0]
+        return None
+
+    def resolve(self, name, team=None):
+        """player_id for a name (or id), or None if it is unknown or ambiguous"""
+        if name in self.roster:
+            return self.roster[name]
+        if not isinstance(name, str):
+            return None if pd.isna(name) else self.ids.get(int(name))
+        key = normalise_name(name)
+        first = key.split()[0] if ' ' in key else None
+        for lookup in ([key] + name_aliases(key) if key else []):
+            for index in (self.names, self.aliases):
+                if lookup in index:
+                    player_ids = index[lookup] if first is None else self._agreeing(index[lookup], first)
+                    player_id = self._pick(player_ids, team) if player_ids else None
+                    if player_id is not None:
+                        return player_id
+        return None
+
+    def squad(self):
+        """player_ids of the Racing Mins roster, in roster order"""
+        return tuple(dict.fromkeys(self.roster.values()))
+
+    def __len__(self):
+        return len(self.players)
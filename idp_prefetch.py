@@ -0,0 +1,177 @@
+"""Speculative prefetch of the player pages a coach is likely to open next.
+
+Review meetings click through the sidebar's player pages in order. While
+one player page is shown, the app hands the prefetcher the nav order. The
+prefetcher then warms the shared cache for the next and previous players,
+and for the most visited ones, on a small thread pool. The next page then
+starts warm.
+
+- Bounded: IDP_PREFETCH_WORKERS threads, and at most IDP_PREFETCH_AHEAD
+  players queued per visit.
+- Cancelled on navigation: each visit replaces the wanted set. Queued
+  players that are no longer wanted are dropped, and running ones stop at
+  their next step. Players still wanted carry on where they are.
+- CPU budget: prefetch steps may use IDP_PREFETCH_CPU_SECONDS of thread
+  CPU time per rolling minute. Steps beyond that are skipped, so
+  speculation never starves the pages being served.
+- Measured: entries built while prefetching are marked in the cache
+  (idp_data.prefetching). stats() reports how many were later used by a
+  page, and how many visits landed on an already prefetched player.
+
+Set IDP_PREFETCH=0 to turn it off.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from idp_data import cache_info, prefetching
+
+
+PREFETCH_ENABLED = os.environ.get('IDP_PREFETCH', '1') != '0'
+WORKERS = int(os.environ.get('IDP_PREFETCH_WORKERS', 2))
+AHEAD = int(os.environ.get('IDP_PREFETCH_AHEAD', 4))
+CPU_SECONDS = float(os.environ.get('IDP_PREFETCH_CPU_SECONDS', 20))
+CPU_WINDOW = 60
+
+
+class Cancelled(Exception):
+    pass
+
+
+def neighbours(page, order, popular=(), limit=AHEAD):
+    """Pages to warm after `page`: next, previous, then the most visited, without repeats"""
+    wanted = []
+    if page in order:
+        i = order.index(page)
+        wanted += [order[j] for j in (i + 1, i - 1, i + 2) if 0 <= j < len(order)]
+    wanted += list(popular)
+    return [other for other in dict.fromkeys(wanted) if other != page][:limit]
+
+
+class Prefetcher:
+    """Warms the cache for likely next pages on a bounded pool, within a CPU budget
+
+    `steps(page)` is a generator that does the page's work, yielding a label after
+    each step. Steps run under idp_data.prefetching(), so the cache knows the
+    entries are speculative, and cancellation and the budget are checked between them.
+    """
+
+    def __init__(self, steps, workers=WORKERS, ahead=AHEAD, cpu_seconds=CPU_SECONDS, log=print):
+        self.steps = steps
+        self.ahead = ahead
+        self.cpu_seconds = cpu_seconds
+        self.log = log
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='idp-prefetch')
+        self.wanted = set()
+        self.futures = {}         # page -> future of a wanted page
+        self.warm = set()         # pages fully prefetched since their last visit
+        self.visits = Counter()
+        self.cpu = deque()        # (monotonic time, thread CPU seconds) of recent steps
+        self.counts = Counter()   # visits, warm_visits, pages, steps, cancelled, throttled, failed
+        self.recent = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def visit(self, page, order):
+        """Record a page view and queue its likely successors, cancelling speculation that is no longer wanted"""
+        with self._lock:
+            self.visits[page] += 1
+            self.counts['visits'] += 1
+            if page in self.warm:
+                self.counts['warm_visits'] += 1
+                self.warm.discard(page)
+            popular = [other for other, _ in self.visits.most_common(self.ahead + 1)]
+            targets = [other for other in neighbours(page, order, popular, self.ahead) if other not in self.warm]
+            self.wanted = set(targets)
+            for other, future in self.futures.items():
+                if other not in self.wanted and future.cancel():
+                    self.counts['cancelled'] += 1
+            self.futures = {other: self.futures[other] if other in self.futures and not self.futures[other].done()
+                            else self.pool.submit(self._run, other) for other in targets}
+        return targets
+
+    def cpu_used(self):
+        """Prefetch thread CPU seconds over the last CPU_WINDOW seconds"""
+        cutoff = time.monotonic() - CPU_WINDOW
+        with self._lock:
+            while self.cpu and self.cpu[0][0] < cutoff:
+                self.cpu.popleft()
+            return sum(seconds for _, seconds in self.cpu)
+
+    def _check(self, page):
+        if page not in self.wanted:
+            raise Cancelled("navigated away")
+        if self.cpu_used() >= self.cpu_seconds:
+            with self._lock:
+                self.counts['throttled'] += 1
+            raise Cancelled("CPU budget spent")
+
+    def _run(self, page):
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        done, status = 0, 'warm'
+        work = self.steps(page)
+        try:
+            while True:
+                self._check(page)
+                step_started = time.thread_time()
+                with prefetching():
+                    label = next(work, None)
+                with self._lock:
+                    self.cpu.append((time.monotonic(), time.thread_time() - step_started))
+                if label is None:
+                    break
+                with self._lock:
+                    self.counts['steps'] += 1
+                done += 1
+            with self._lock:
+                self.warm.add(page)
+                self.counts['pages'] += 1
+        except Cancelled as e:
+            status = f"stopped: {e}"
+            with self._lock:
+                self.counts['cancelled'] += 1
+        except Exception as e:
+            status = f"failed: {e}"
+            with self._lock:
+                self.counts['failed'] += 1
+            self.log(f"prefetch of {page} failed: {e}")
+        finally:
+            work.close()
+        with self._lock:
+            self.recent.appendleft({
+                'page': page,
+                'status': status,
+                'steps': done,
+                'seconds': round(time.perf_counter() - started, 2),
+                'cpu_seconds': round(time.thread_time() - cpu_started, 2),
+            })
+
+    def stats(self):
+        info = cache_info()
+        cpu_used = self.cpu_used()
+        with self._lock:
+            counts = dict(self.counts)
+            recent = list(self.recent)
+        visits = counts.get('visits', 0)
+        return {
+            'visits': visits,
+            'warm_visits': counts.get('warm_visits', 0),
+            'page_hit_rate': round(counts.get('warm_visits', 0) / visits * 100) if visits else 0,
+            'pages': counts.get('pages', 0),
+            'steps': counts.get('steps', 0),
+            'cancelled': counts.get('cancelled', 0),
+            'throttled': counts.get('throttled', 0),
+            'failed': counts.get('failed', 0),
+            'entries_prefetched': info['prefetched'],
+            'entries_used': info['prefetch_used'],
+            'entry_hit_rate': round(info['prefetch_used'] / info['prefetched'] * 100) if info['prefetched'] else 0,
+            'cpu_seconds': round(cpu_used, 2),
+            'cpu_budget': self.cpu_seconds,
+            'recent': recent,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            self.wanted = set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,251 @@
+"""Composite ratings for the player pages.
+
+Season rows for the selected position groups are pooled per player, weighted by
+minutes, re-ranked into percentiles and combined into the composite ratings shown
+on the radar.
+"""
+import numpy as np
+import pandas as pd
+
+
+SPECIAL_COLS = ['Player', 'pos_group', 'Team', 'Competition', 'Season', 'Minutes', 'Number', 'Foot', 'player_id', 'Position', 'Detailed Position', 'Position Group', 'offline_player_id', 'statsbomb_id']
+
+PHYS_COLS = [
+    'Distance', 'Running Distance', 'HSR Distance', 'Count HSR',
+    'Sprinting Distance', 'Sprint Count', 'HI Distance', 'HI Count',
+    'Medium Accels', 'High Accels', 'Medium Decels', 'High Decels',
+    'Walking to HSR Count', 'Walking to Sprint Count',
+    'Top Speed', 'Time to Sprint',
+    'Time to HSR', 'Walking Distance', '% of Distance Walking',
+    '% of Distance HI', '% of Distance Sprinting']
+
+PHYS_PCT_COLS = [
+    'pctDistance',
+    'pctRunning Distance', 'pctHSR Distance',
+    'pctCount HSR', 'pctSprinting Distance', 'pctSprint Count',
+    'pctHI Distance', 'pctHI Count', 'pctMedium Accels', 'pctHigh Accels',
+    'pctMedium Decels', 'pctHigh Decels', 'pctWalking to HSR Count',
+    'pctWalking to Sprint Count', 'pctTop Speed',
+    'pctTime to Sprint', 'pctTime to HSR', 'pctWalking Distance',
+    'pct% of Distance Walking', 'pct% of Distance HI',
+    'pct% of Distance Sprinting', 'pct% of HI Distance Sprinting'
+]
+
+ALL_RATINGS = ['Speed', 'Intensity', 'Explosivness', 'Agility', 'Defensive Output', 'Defending High', 'High Pressing', 'Tackle Accuracy', 'Heading', 'Ball Retention', 'Ball Progression', 'Verticality', 'Carrying', 'Chance Creation', 'Crossing', 'Poaching', 'Finishing', 'Goal Threat', 'Receiving Forward', 'Set Piece Threat', 'Shot Stopping', 'Short Distribution', 'Long Distribution', 'Stepping Out', 'Saving Big Chances', '1v1 Saving']
+
+# Radar ratings per position group, in the order they are added to the radar
+POSITION_RATINGS = {
+    'CB': ['Speed', 'Tackle Accuracy', 'Defending High', 'Defensive Output', 'Heading', 'Ball Retention', 'Ball Progression', 'Verticality'],
+    'FB/WB': ['Crossing', 'Chance Creation', 'Receiving Forward', 'Speed', 'High Pressing', 'Tackle Accuracy', 'Defensive Output', 'Ball Retention', 'Ball Progression', 'Verticality', 'Heading'],
+    'CM': ['Tackle Accuracy', 'Defensive Output', 'High Pressing', 'Heading', 'Set Piece Threat', 'Ball Retention', 'Ball Progression', 'Carrying', 'Receiving Forward', 'Chance Creation', 'Speed', 'Intensity', 'Goal Threat', 'Verticality'],
+    'AM': ['Chance Creation', 'Carrying', 'Speed', 'Goal Threat', 'Defensive Output', 'High Pressing', 'Chance Creation', 'Ball Progression', 'Ball Retention', 'Crossing', 'Intensity', 'Poaching', 'Finishing'],
+    'W': ['Chance Creation', 'Carrying', 'Speed', 'Goal Threat', 'Defensive Output', 'High Pressing', 'Chance Creation', 'Ball Progression', 'Ball Retention', 'Crossing', 'Intensity', 'Poaching', 'Finishing'],
+    'ST': ['Finishing', 'Poaching', 'High Pressing', 'Speed', 'Intensity', 'Defensive Output', 'Chance Creation', 'Ball Retention', 'Carrying', 'Goal Threat', 'Heading', 'Set Piece Threat'],
+}
+
+# Raw metrics worth showing per position group
+POSITION_METRICS = {
+    'CB': ['Top Speed', 'Average Defensive Action Distance',
+           'Tackle %', 'Tackles Won',
+           'Interceptions', 'Blocks',
+           'Aerial Wins', 'Aerial %',
+           'Progressive Passes', 'Passes into Final Third',
+           'Progressive Carries', 'Ball Retention %'],
+    'FB/WB': ['Top Speed', 'HI Distance',
+              'Key Passes', 'Big Chances Created',
+              'xA', 'Assists',
+              'Cross Shot Assists', 'Cross into Box %',
+              'Tackle %', 'Tackles Won',
+              'Attacking Third Pressures', 'Attacking Half Pressure Regains'],
+    'CM': ['Top Speed', 'HI Distance',
+           'xA', 'Assists',
+           'xG', 'Goals',
+           'Progressive Passes', 'Progressive Carries',
+           'Tackle %', 'Ball Recoveries',
+           'Attacking Third Pressures', 'Attacking Half Pressure Regains'],
+    'AM': ['Top Speed', 'HI Distance',
+           'Goals', 'xG',
+           'Box Receptions', 'Goal Conversion',
+           'Assists', 'xA',
+           'Progressive Carries', 'Dribble %',
+           'Attacking Third Pressures', 'Ball Recoveries'],
+    'W': ['Top Speed', 'HI Distance',
+          'Goals', 'xG',
+          'Box Receptions', 'Goal Conversion',
+          'Assists', 'xA',
+          'Progressive Carries', 'Dribble %',
+          'Attacking Third Pressures', 'Ball Recoveries'],
+    'ST': ['Goals', 'xG',
+           'Shots', 'Box Receptions',
+           'Goal Conversion', 'Big Chance Conversion',
+           'Key Passes', 'Ball Retention %',
+           'Attacking Third Pressures', 'Ball Recoveries',
+           'Top Speed', 'HI Distance'],
+}
+
+
+def position_minutes(season_data, player_id):
+    """Minutes per position group for a player, most played first"""
+    player_data = season_data[season_data['player_id'] == player_id]
+    minutes = {k: int(v) for k, v in player_data.groupby('Position Group')['Minutes'].sum().to_dict().items()}
+    return dict(sorted(minutes.items(), key=lambda item: item[1], reverse=True))
+
+
+def position_pool(season_data, positions):
+    """Season rows for the selected position groups, most minutes first"""
+    return season_data[season_data['Position Group'].isin(positions)].sort_values(by='Minutes', ascending=False)
+
+
+def _pooled(rows):
+    """Minutes-weighted sums of season rows per player"""
+    rows = rows.copy()
+    weighted = [col for col in rows.columns if col not in SPECIAL_COLS]
+    rows[weighted] = rows[weighted].mul(rows['Minutes'], axis=0)
+
+    aggs = {col: 'sum' for col in weighted}
+    aggs['Position Group'] = 'first'
+    aggs['pos_group'] = 'first'
+    aggs['Team'] = 'first'
+    aggs['Competition'] = 'first'
+    aggs['Season'] = 'first'
+    aggs['Minutes'] = 'sum'
+    aggs['Number'] = 'first'
+    aggs['Foot'] = 'first'
+    aggs['player_id'] = 'first'
+    aggs['Position'] = 'first'
+    aggs['Detailed Position'] = 'first'
+    aggs['offline_player_id'] = 'first'
+    aggs['statsbomb_id'] = 'first'
+
+    return rows.groupby('Player').agg(aggs).reset_index()
+
+
+def _per_minute(players, percentile=None):
+    """Turn pooled sums into per minute averages, adding pct<col> = percentile(col) as each column is done"""
+    for col in players.columns:
+        if col not in SPECIAL_COLS and col != 'Top Speed':
+            players[col] = players[col] / players['Minutes']
+            if percentile is not None and col not in PHYS_COLS + PHYS_PCT_COLS: players[f'pct{col}'] = percentile(col)
+    return players
+
+
+def build_comp_data(season_data, positions, player_id, comp_player_name=None):
+    """Per-player comparison table for the selected position groups with composite ratings
+
+    Players at or below the pool's median minutes are dropped, except the player
+    themself and the comparison player.
+    """
+    comp_data = position_pool(season_data, positions)
+    median_mins = np.median(comp_data['Minutes'])
+
+    comp_data = _pooled(comp_data[(comp_data['player_id'] == player_id) | (comp_data['Player'] == comp_player_name) | (comp_data['Minutes'] > median_mins)])
+    _per_minute(comp_data, lambda col: round(comp_data[col].rank(pct=True) * 100, 2))
+
+    return add_ratings(comp_data)
+
+
+def primary_positions(season_data, player_ids):
+    """Most played position group of each player that has season data"""
+    minutes = season_data[season_data['player_id'].isin(player_ids)].groupby(['player_id', 'Position Group'])['Minutes'].sum()
+    return {player_id: position for player_id, position in minutes.groupby(level=0).idxmax()}
+
+
+def rate_against_pool(season_data, positions, players, player_id=None):
+    """Ratings of each player in `players` (names) against the pool for `positions`.
+
+    The pool is what build_comp_data(season_data, positions, player_id) compares with:
+    rows above the median minutes plus the page's player. It is pooled once, and each
+    player is ranked against it with their own row swapped in, so every row matches
+    that player's row when they are added as the comparison player.
+    """
+    pool = position_pool(season_data, positions)
+    median_mins = np.median(pool['Minutes'])
+    league = _per_minute(_pooled(pool[(pool['Minutes'] > median_mins) | (pool['player_id'] == player_id)]))
+    league_names = league['Player'].to_numpy()
+    rated = _pooled(pool[pool['Player'].isin(players)])
+
+    def percentile(col):
+        # average rank among the other players plus themself, as pandas' rank(pct=True) gives it
+        reference = league[col].to_numpy(dtype=float)
+        pct = []
+        for name, value in zip(rated['Player'], rated[col].to_numpy(dtype=float)):
+            others = reference[(league_names != name) & ~np.isnan(reference)]
+            rank = (others < value).sum() + ((others == value).sum() + 2) / 2
+            pct.append(np.nan if np.isnan(value) else rank / (len(others) + 1))
+        return np.round(np.array(pct) * 100, 2)
+
+    return add_ratings(_per_minute(rated, percentile))
+
+
+def build_squad_ratings(season_data, player_ids):
+    """Ratings of several players against their primary position group, one pass per group"""
+    positions = primary_positions(season_data, player_ids)
+    squad = []
+    for position in dict.fromkeys(positions.values()):
+        group_ids = [player_id for player_id, group in positions.items() if group == position]
+        names = season_data.loc[season_data['player_id'].isin(group_ids), 'Player'].unique()
+        squad.append(rate_against_pool(season_data, [position], names))
+
+    if not squad:
+        return pd.DataFrame()
+    return pd.concat(squad, ignore_index=True)
+
+
+def add_ratings(comp_data):
+    """Add the composite rating columns (0-100) built from the percentile columns"""
+    comp_data['Shot Stopping'] = (0.05 * comp_data['pctGK Shots on Target Faced']) + (0.1 * comp_data['pctBig Chances Save %']) + (0.7 * comp_data['pctGoals Prevented']) + (0.15 * comp_data['pctGK Save %'])
+    comp_data['Short Distribution'] = (0.15 * comp_data['pctForward Pass %']) + (0.2 * comp_data['pctPressured Pass %']) + (0.65 * comp_data['pctShort Pass %'])
+    comp_data['Long Distribution'] = (0.2 * comp_data['pctProgressive Passes']) + (0.1 * comp_data['pctPasses into Final Third']) +  (0.35 * comp_data['pctLong Passes Completed']) + (0.1 * comp_data['pctPass OBV']) + (0.25 * comp_data['pctLong Pass %'])
+    comp_data['Stepping Out'] = (0.1 * comp_data['pctGK Avg. Distance'])
+    comp_data['Saving Big Chances'] = (0.25 * comp_data['pctBig Chances Faced']) + (0.75 * comp_data['pctBig Chances Save %'] )
+    comp_data['1v1 Saving'] = (1 * comp_data['pctGK 1v1s Save Rate'])
+
+    comp_data['Chance Creation'] = (0.3 * comp_data['pctxA']) + (0.15 * comp_data['pctKey Passes']) + (0.25 * comp_data['pctBig Chances Created']) + (0.1 * comp_data['pctPass OBV']) + (0.2 * comp_data['pctAssists'])
+    comp_data['Ball Progression'] = (0.2 * comp_data['pctPass OBV']) + (0.15 * comp_data['pctPasses into Final Third']) + (0.25 * comp_data['pctProgressive Carries']) + (0.3 * comp_data['pctProgressive Passes']) + (0.1 * comp_data['pctLong Passes Completed'])
+    comp_data['Ball Retention'] = (0.15 * comp_data['pctForward Pass %']) + (0.55 * comp_data['pctBall Retention %']) + (0.2 * comp_data['pctPressured Pass %']) + (0.1 * comp_data['pctShort Pass %'])
+    comp_data['Verticality'] = (0.25 * comp_data['pct% of Passes Progressive']) + (0.6 * comp_data['pct% of Passes Forward']) + (0.15 * (1- comp_data['pct% of Passes Backward']))
+    comp_data['Carrying'] = (0.25 * comp_data['pctTake Ons']) + (0.1 * comp_data['pctCarries']) + (0.5 * comp_data['pctProgressive Carries']) + (0.15 * comp_data['pctDribble %'])
+    comp_data['Poaching'] = (0.55 * comp_data['pctxG']) + (0.2 * comp_data['pctxG/Shot']) + (0.2 * comp_data['pctBox Receptions']) + (0.05 * comp_data['pctSix Yard Box Receptions'])
+    comp_data['Finishing'] = (0.25 * comp_data['pctGoals per xG']) + (0.15 * comp_data['pctxGOT per xG']) + (0.45 * comp_data['pctGoal Conversion']) + (0.15 * comp_data['pctGoals'])
+    comp_data['Goal Threat'] = (0.3 * comp_data['pctxG']) + (0.3 * comp_data['pctGoals']) + (0.2 * comp_data['pctBox Receptions']) + (0.1 * comp_data['pctGoal Conversion']) + (0.1 * comp_data['pctxGOT per xG'])
+    comp_data['Crossing'] = (0.3 * comp_data['pctCrosses Completed into Box']) + (0.2 * comp_data['pctCross into Box %']) + (0.25 * comp_data['pctCross Shot Assists']) + (0.25 * comp_data['pctCross Assists'])
+    comp_data['Heading'] = (0.7 * comp_data['pctAerial %']) + (0.3 * comp_data['pctAerial Wins'])
+    comp_data['Set Piece Threat'] = (0.75 * comp_data['pctAttacking SP Aerial Wins']) + (0.25 * comp_data['pctAttacking SP Aerial %'])
+
+    # comp_data['Speed'] = (0.4 * comp_data['pctPSV-99']) + (0.45 * comp_data['pctPSV-85']) + (0.15 * comp_data['pctSprinting Distance'])
+    # comp_data['HSR Distance'] = (0.4 * comp_data['pctDistance']) + (0.6 * comp_data['pctHI Running Distance'])
+
+    comp_data['High Pressing'] = (0.25 * comp_data['pctAttacking Half Pressures']) + (0.15 * comp_data['pctAttacking Third Pressures']) + (0.2 * comp_data['pctAttacking Half Pressure Regains']) + (0.1 * comp_data['pctPressure Regains Leading to Shots']) + (0.3 * comp_data['pctAverage Defensive Action Distance'])
+    comp_data['Defending High'] = (0.2 * comp_data['pctAttacking Half Pressures']) + (0.05 * comp_data['pctAttacking Half Pressure Regains']) + (0.75 * comp_data['pctAverage Defensive Action Distance'])
+    comp_data['Tackle Accuracy'] = (0.2 * (100 - comp_data['pctDribbled Past'])) + (0.65 * comp_data['pctTackle %']) + (0.15 * comp_data['pctTackles Won'])
+    comp_data['Defensive Output'] = (0.1 * comp_data['pctBlocks']) + (0.3 * comp_data['pctTackles Won']) + (0.4 * comp_data['pctBall Recoveries']) + (0.2 * comp_data['pctInterceptions'])
+    comp_data['Receiving Forward'] = (0.6 * comp_data['pctFinal Third Receptions']) + (0.15 * comp_data['pctBox Receptions']) + (0.15 * comp_data['pctShots']) + (0.1 * comp_data['pctxG'])
+
+    comp_data['Speed'] = (1 * comp_data['pctTop Speed'])
+    comp_data['Intensity'] = (0.1 * comp_data['pctDistance']) + (0.3 * comp_data['pctRunning Distance']) + (0.2 * comp_data['pctHSR Distance']) + (0.15 * comp_data['pctSprinting Distance']) + (0.15 * comp_data['pctSprint Count']) + (0.1 * comp_data['pct% of Distance HI'])
+    comp_data['Explosiveness'] = (0.3 * comp_data['pctWalking to Sprint Count']) + (0.3 * comp_data['pctWalking to HSR Count']) + (0.2 * (100 - comp_data['pctTime to HSR'])) + (0.2 * (100 - comp_data['pctTime to Sprint']))
+    comp_data['Agility'] = (0.2 * comp_data['pctHigh Decels']) + (0.2 * comp_data['pctHigh Accels']) + (0.3 * comp_data['pctMedium Decels']) + (0.3 * comp_data['pctMedium Accels'])
+
+    return comp_data
+
+
+def ratings_for_positions(positions):
+    """Radar ratings for the selected position groups, without repeats"""
+    ratings = []
+    for position, position_ratings in POSITION_RATINGS.items():
+        if position in positions:
+            for rating in position_ratings:
+                if rating not in ratings:
+                    ratings.append(rating)
+    return ratings
+
+
+def metrics_for_positions(positions):
+    """Raw metrics shown for the selected position groups, without repeats"""
+    metrics = []
+    for position, position_metrics in POSITION_METRICS.items():
+        if position in positions:
+            for metric in position_metrics:
+                if metric not in metrics:
+                    metrics.append(metric)
+    return metrics
@@ -0,0 +1,515 @@
+"""The training log (Sheet1 of the IDP workbook): safe writes and in-memory indexes.
+
+Writes take an exclusive lock on the workbook, re-read it, apply the change and
+replace the file atomically (write a temp file, then rename), so two coaches
+saving at once can't lose each other's entries. Session ids come from a durable
+sequence kept next to the workbook.
+
+The indexes live for the whole server process and are shared by every session.
+Each one remembers the workbook version (file mtime) it reflects. Entries added or
+removed through the app are applied in place. Any other change to the file (another
+process, a hand edit) triggers a rebuild from the loaded frame on the next sync.
+"""
+import bisect
+import os
+import re
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from idp_data import EXCEL_FILE, file_version, read_training_log
+from idp_files import file_lock, replace_atomically
+
+TRAINING_COLUMNS = ['Player', 'Type', 'Detail', 'Date', 'Coach', 'Notes', 'Session_ID']
+
+
+def workbook_lock(path=EXCEL_FILE):
+    """Exclusive lock on the workbook, across threads and processes"""
+    return file_lock(path)
+
+
+def write_training_log(df, path=EXCEL_FILE):
+    """Atomically replace the training log sheet, keeping the workbook's other sheets"""
+    sheets = pd.read_excel(path, sheet_name=None) if os.path.exists(path) else {}
+    sheets['Sheet1'] = df
+
+    def write(f):
+        with pd.ExcelWriter(f, engine='openpyxl') as writer:
+            for name, sheet in sheets.items():
+                sheet.to_excel(writer, sheet_name=name, index=False)
+
+    replace_atomically(path, write)
+
+
+def _read_locked(path):
+    """Training log and its version, for use while holding the workbook lock"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=TRAINING_COLUMNS), None
+    return read_training_log(path), file_version(path)
+
+
+def _reserve_session_ids(path, df, count=1):
+    """First of `count` new session ids, recorded in the sequence file. Call with the lock held."""
+    seq_path = path + '.seq'
+    last = 0
+    if os.path.exists(seq_path):
+        with open(seq_path) as f:
+            last = int(f.read().strip() or 0)
+    if 'Session_ID' in df.columns and df['Session_ID'].notna().any():
+        last = max(last, int(df['Session_ID'].max()))
+    replace_atomically(seq_path, lambda f: f.write(str(last + count).encode()))
+    return last + 1
+
+
+def allocate_session_ids(count=1, path=EXCEL_FILE):
+    """Reserve `count` consecutive session ids and return the first"""
+    with workbook_lock(path):
+        df, _ = _read_locked(path)
+        return _reserve_session_ids(path, df, count)
+
+
+def add_training_entries(entries, path=EXCEL_FILE):
+    """Append entries to the log in one locked write and return their session id
+
+    Entries without a Session_ID share one newly allocated id (a group session).
+    """
+    with workbook_lock(path):
+        df, loaded_version = _read_locked(path)
+        entries = [dict(entry) for entry in entries]
+        if any(entry.get('Session_ID') is None for entry in entries):
+            session_id = _reserve_session_ids(path, df)
+            for entry in entries:
+                if entry.get('Session_ID') is None:
+                    entry['Session_ID'] = session_id
+
+        df = pd.concat([df, pd.DataFrame(entries)], ignore_index=True)
+        # Sort by date (newest first)
+        df = df.sort_values("Date", ascending=False)
+        write_training_log(df, path)
+        entries_written(path, added=entries, loaded_version=loaded_version)
+    return entries[0]['Session_ID'] if entries else None
+
+
+def training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id=None):
+    return {
+        "Player": player_name,
+        "Type": training_type,
+        "Detail": training_detail,
+        "Date": training_date.strftime("%Y-%m-%d"),
+        "Coach": coach_name,
+        "Notes": notes,
+        "Session_ID": session_id
+    }
+
+
+def add_training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id=None, path=EXCEL_FILE):
+    """Add one entry to the log and return its session id"""
+    entry = training_entry(player_name, training_type, training_detail, training_date, coach_name, notes, session_id)
+    return add_training_entries([entry], path)
+
+
+def _matching_rows(df, entry):
+    match = pd.Series(True, index=df.index)
+    for col in TRAINING_COLUMNS:
+        if col == 'Session_ID':
+            match &= pd.to_numeric(df[col], errors='coerce') == pd.to_numeric(entry.get(col), errors='coerce')
+        else:
+            match &= df[col].map(_text) == _text(entry.get(col))
+    return df.index[match]
+
+
+def remove_training_entry(entry, path=EXCEL_FILE):
+    """Remove one row equal to `entry` from the log; False if it is no longer there"""
+    with workbook_lock(path):
+        df, loaded_version = _read_locked(path)
+        rows = _matching_rows(df, entry)
+        if len(rows) == 0:
+            return False
+        df = df.drop(index=rows[0]).reset_index(drop=True)
+        write_training_log(df, path)
+        entries_written(path, removed=[entry], loaded_version=loaded_version)
+    return True
+
+
+def _text(value):
+    """Cell value as a string, with blanks as ''"""
+    return '' if value is None or pd.isna(value) else str(value)
+
+
+class WorkbookIndex(ABC):
+    """Base class for an index kept in step with the training workbook"""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self.lock = threading.RLock()
+
+    def sync(self, df):
+        """Rebuild from `df` unless the index already reflects the file on disk
+
+        The index is stamped with the version `df` was read at (read_training_log
+        records it), so a file changed after that is rebuilt on the next sync.
+        """
+        with self.lock:
+            if self.version is None or self.version != file_version(self.path):
+                self.rebuild(df)
+                self.version = df.attrs.get('file_version')
+        return self
+
+    def apply(self, added=(), removed=(), loaded_version=None):
+        """Apply entries written by this process, if the index was current when they were loaded"""
+        with self.lock:
+            if self.version is None or self.version != loaded_version:
+                # Out of step already; the next sync rebuilds from the file
+                self.version = None
+                return
+            for entry in removed:
+                self.remove(entry)
+            for entry in added:
+                self.add(entry)
+            self.version = file_version(self.path)
+
+    @abstractmethod
+    def rebuild(self, df):
+        """Index every entry of `df` from scratch"""
+
+    @abstractmethod
+    def add(self, entry):
+        """Index one entry saved by this process"""
+
+    @abstractmethod
+    def remove(self, entry):
+        """Forget one entry removed by this process"""
+
+
+class TrainingCalendar(WorkbookIndex):
+    """Dense day x player session counts, split by (Type, Detail)
+
+    `counts[c, d, p]` is the number of entries for player `p` on day `origin + d` with
+    the c-th (Type, Detail) pair, and `totals` is the same summed over all pairs.
+    Entries without a player or a date have no cell and are left out.
+    """
+
+    def rebuild(self, df):
+        self.players = {}
+        self.combos = {}
+        self.origin = None
+        self.counts = np.zeros((0, 0, 0), dtype=np.int32)
+        self.totals = np.zeros((0, 0), dtype=np.int32)
+        if df is None or df.empty:
+            return
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        placed = dates.notna() & (df['Player'].map(_text).str.strip() != '')
+        if not placed.any():
+            return
+        df, dates = df[placed], dates[placed].to_numpy().astype('datetime64[D]')
+
+        player_codes, players = pd.factorize(df['Player'])
+        combo_codes, combos = pd.factorize(pd.MultiIndex.from_arrays([df['Type'].fillna(''), df['Detail'].fillna('')]))
+
+        self.origin = dates.min()
+        day_codes = (dates - self.origin).astype(int)
+        self.players = {player: i for i, player in enumerate(players)}
+        self.combos = {combo: i for i, combo in enumerate(combos)}
+        self.counts = np.zeros((len(combos), day_codes.max() + 1, len(players)), dtype=np.int32)
+        np.add.at(self.counts, (combo_codes, day_codes, player_codes), 1)
+        self.totals = self.counts.sum(axis=0)
+
+    def _grow(self, combos=0, front_days=0, days=0, players=0):
+        """Pad the matrices with empty layers, days and players"""
+        self.counts = np.pad(self.counts, ((0, combos), (front_days, days), (0, players)))
+        self.totals = np.pad(self.totals, ((front_days, days), (0, players)))
+
+    def _locate(self, entry, grow):
+        """(combo, day, player) cell of an entry, growing the matrices if `grow` is set (None without a player or date)"""
+        date = pd.to_datetime(entry.get('Date'), errors='coerce')
+        player = entry.get('Player')
+        if pd.isna(date) or not _text(player).strip():
+            return None
+        day = np.datetime64(date.date(), 'D')
+        combo_key = (_text(entry.get('Type')), _text(entry.get('Detail')))
+
+        if not grow:
+            if self.origin is None or player not in self.players or combo_key not in self.combos:
+                return None
+            cell = (self.combos[combo_key], int((day - self.origin).astype(int)), self.players[player])
+            return cell if 0 <= cell[1] < self.counts.shape[1] else None
+
+        if self.origin is None:
+            self.origin = day
+        if day < self.origin:
+            self._grow(front_days=int((self.origin - day).astype(int)))
+            self.origin = day
+        if player not in self.players:
+            self.players[player] = len(self.players)
+        if combo_key not in self.combos:
+            self.combos[combo_key] = len(self.combos)
+
+        cell = (self.combos[combo_key], int((day - self.origin).astype(int)), self.players[player])
+        combos, days, players = [max(0, i + 1 - n) for i, n in zip(cell, self.counts.shape)]
+        if combos or days or players:
+            # Grow by at least a month at a time so daily inserts don't copy the matrix every time
+            self._grow(combos, days=max(days, 31) if days else 0, players=players)
+        return cell
+
+    def add(self, entry):
+        cell = self._locate(entry, grow=True)
+        if cell is None:
+            return
+        self.counts[cell] += 1
+        self.totals[cell[1:]] += 1
+
+    def remove(self, entry):
+        cell = self._locate(entry, grow=False)
+        if cell is not None and self.counts[cell] > 0:
+            self.counts[cell] -= 1
+            self.totals[cell[1:]] -= 1
+
+    def matrix(self, start, end, types=None, details=None, players=None):
+        """Day x player counts for [start, end] as (days, players, counts)
+
+        With no Type/Detail filter this is a slice of `totals`; filters sum the
+        matching (Type, Detail) layers first.
+        """
+        with self.lock:
+            start = np.datetime64(pd.to_datetime(start).date(), 'D')
+            end = np.datetime64(pd.to_datetime(end).date(), 'D')
+            days = np.arange(start, end + 1, dtype='datetime64[D]')
+            names = list(players) if players is not None else list(self.players)
+            out = np.zeros((len(days), len(names)), dtype=np.int32)
+            if self.origin is None or len(days) == 0:
+                return days, names, out
+
+            if types is None and details is None:
+                source = self.totals
+            else:
+                layers = [i for (type_, detail), i in self.combos.items()
+                          if (types is None or type_ in types) and (details is None or detail in details)]
+                source = self.counts[layers].sum(axis=0) if layers else np.zeros_like(self.totals)
+
+            lo = int((start - self.origin).astype(int))
+            hi = int((end - self.origin).astype(int)) + 1
+            src_lo, src_hi = max(lo, 0), min(hi, source.shape[0])
+            if src_lo < src_hi:
+                columns = [self.players.get(name) for name in names]
+                known = [j for j, c in enumerate(columns) if c is not None]
+                out[src_lo - lo:src_hi - lo, known] = source[src_lo:src_hi][:, [columns[j] for j in known]]
+            return days, names, out
+
+
+VOCABULARY_FIELDS = ['Player', 'Type', 'Detail', 'Coach']
+
+DEFAULT_TYPES = ["Individual", 'Combined', 'Group', 'Video', 'Unit Meeting', 'Player Meeting']
+
+VOCABULARY_ORDERS = ['Alphabetical', 'Most Used', 'Most Recent']
+
+
+def _day(value):
+    return pd.to_datetime(value).strftime('%Y-%m-%d')
+
+
+class TrainingVocabulary(WorkbookIndex):
+    """Distinct values of the dropdown columns with usage counts and last-used dates
+
+    `usage[field][value]` maps each date the value was used on to the number of
+    entries that day. Sorted option lists are memoised until the next change, so
+    building a dropdown doesn't depend on the size of the history.
+    """
+
+    defaults = {'Type': DEFAULT_TYPES}
+
+    def rebuild(self, df):
+        self.usage = {field: {} for field in VOCABULARY_FIELDS}
+        self._options = {}
+        if df is None or df.empty:
+            return
+        days = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+        for field in VOCABULARY_FIELDS:
+            counts = df.assign(Date=days).groupby([field, 'Date']).size()
+            for (value, day), n in counts.items():
+                if _text(value):
+                    self.usage[field].setdefault(str(value), {})[day] = int(n)
+
+    def add(self, entry):
+        day = _day(entry['Date'])
+        for field in VOCABULARY_FIELDS:
+            value = _text(entry.get(field))
+            if value:
+                dates = self.usage[field].setdefault(value, {})
+                dates[day] = dates.get(day, 0) + 1
+        self._options = {}
+
+    def remove(self, entry):
+        day = _day(entry['Date'])
+        for field in VOCABULARY_FIELDS:
+            value = _text(entry.get(field))
+            dates = self.usage[field].get(value)
+            if not dates or day not in dates:
+                continue
+            dates[day] -= 1
+            if dates[day] <= 0:
+                del dates[day]
+            if not dates:
+                del self.usage[field][value]
+        self._options = {}
+
+    def count(self, field, value):
+        return sum(self.usage[field].get(value, {}).values())
+
+    def last_used(self, field, value):
+        dates = self.usage[field].get(value)
+        return max(dates) if dates else None
+
+    def options(self, field, order='Alphabetical', among=None):
+        """Dropdown options for `field` in the given order
+
+        Values come from the log plus the field's defaults, or only from `among`
+        (e.g. the roster) when it is given.
+        """
+        key = (field, order, tuple(among) if among is not None else None)
+        with self.lock:
+            if key not in self._options:
+                if among is not None:
+                    values = sorted(set(among))
+                else:
+                    values = sorted(set(self.usage[field]) | set(self.defaults.get(field, [])))
+                # Python's sort is stable, so ties stay alphabetical
+                if order == 'Most Used':
+                    values.sort(key=lambda value: self.count(field, value), reverse=True)
+                elif order == 'Most Recent':
+                    values.sort(key=lambda value: self.last_used(field, value) or '', reverse=True)
+                self._options[key] = values
+            return list(self._options[key])
+
+
+SEARCH_FIELDS = ['Detail', 'Notes']
+
+STOP_WORDS = {'a', 'an', 'and', 'at', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+
+def tokenize(text):
+    """Case- and accent-folded words of a text, without stop words: 'Mégane's touch' -> ['meganes', 'touch']"""
+    text = unicodedata.normalize('NFKD', _text(text).replace("'", '').replace('\u2019', ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return [word for word in re.findall(r"\w+", text) if word not in STOP_WORDS]
+
+
+def _entry_key(entry, day=None):
+    """What identifies an entry for removal: its columns, with the date as a day"""
+    session_id = pd.to_numeric(entry.get('Session_ID'), errors='coerce')
+    if day is None:
+        day = _day(entry['Date']) if pd.notna(entry.get('Date')) else ''
+    return tuple(day if col == 'Date' else _text(entry.get(col)) for col in TRAINING_COLUMNS[:-1]) + \
+        (None if pd.isna(session_id) else int(session_id),)
+
+
+class TrainingSearch(WorkbookIndex):
+    """Inverted index over the Detail and Notes text of the training log
+
+    `postings[term]` is the set of ids of entries containing the term and `terms` the
+    sorted vocabulary, so each query word is matched as a prefix with two bisections.
+    Entries are kept by id with their key, so removing one entry drops only its postings.
+    """
+
+    def rebuild(self, df):
+        self.entries = {}
+        self.keys = {}
+        self.postings = {}
+        self.terms = []
+        self.next_id = 0
+        if df is None or df.empty:
+            return
+        days = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d').fillna('')
+        for entry, day in zip(df[TRAINING_COLUMNS].to_dict('records'), days):
+            self._insert(entry, day)
+        self.terms = sorted(self.postings)
+
+    def _insert(self, entry, day=None):
+        doc = self.next_id
+        self.next_id += 1
+        key = _entry_key(entry, day)
+        self.entries[doc] = {'Player': _text(entry.get('Player')), 'Type': _text(entry.get('Type')),
+                             'Detail': _text(entry.get('Detail')), 'Date': key[3], 'Coach': _text(entry.get('Coach')),
+                             'Notes': _text(entry.get('Notes')), 'Session_ID': key[-1]}
+        self.keys.setdefault(key, []).append(doc)
+        terms = set()
+        for field in SEARCH_FIELDS:
+            terms.update(tokenize(entry.get(field)))
+        for term in terms:
+            self.postings.setdefault(term, set()).add(doc)
+        return terms
+
+    def add(self, entry):
+        for term in self._insert(entry):
+            if len(self.postings[term]) == 1:
+                bisect.insort(self.terms, term)
+
+    def remove(self, entry):
+        docs = self.keys.get(_entry_key(entry))
+        if not docs:
+            return
+        doc = docs.pop()
+        if not docs:
+            del self.keys[_entry_key(entry)]
+        stored = self.entries.pop(doc)
+        for term in set(tokenize(stored['Detail']) + tokenize(stored['Notes'])):
+            postings = self.postings[term]
+            postings.discard(doc)
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    def _matching(self, word):
+        """Entries with a term starting with `word`"""
+        lo = bisect.bisect_left(self.terms, word)
+        hi = bisect.bisect_left(self.terms, word + '\uffff')
+        if hi - lo == 1:
+            return self.postings[self.terms[lo]]
+        return set().union(*(self.postings[term] for term in self.terms[lo:hi]))
+
+    def search(self, query, players=None, coaches=None, start=None, end=None):
+        """Entries whose Detail or Notes contain every word of `query` (each as a prefix), newest first
+
+        A query with no words left once stop words are dropped matches nothing.
+        """
+        with self.lock:
+            docs = set()
+            for i, word in enumerate(sorted(set(tokenize(query)), key=len, reverse=True)):
+                matched = self._matching(word)
+                docs = matched if i == 0 else docs & matched
+                if not docs:
+                    break
+            start = _day(start) if start is not None else None
+            end = _day(end) if end is not None else None
+            rows = [self.entries[doc] for doc in docs]
+            rows = [row for row in rows
+                    if (players is None or row['Player'] in players)
+                    and (coaches is None or row['Coach'] in coaches)
+                    and (start is None or row['Date'] >= start)
+                    and (end is None or row['Date'] <= end)]
+        rows.sort(key=lambda row: row['Date'], reverse=True)
+        return pd.DataFrame(rows, columns=TRAINING_COLUMNS)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def training_index(cls, path):
+    """Process-wide instance of index `cls` for the workbook at `path`"""
+    with _indexes_lock:
+        key = (cls, os.path.abspath(path))
+        if key not in _indexes:
+            _indexes[key] = cls(path)
+        return _indexes[key]
+
+
+def entries_written(path, added=(), removed=(), loaded_version=None):
+    """Tell every index of `path` about entries this process just saved"""
+    with _indexes_lock:
+        indexes = [index for (cls, index_path), index in _indexes.items() if index_path == os.path.abspath(path)]
+    for index in indexes:
+        index.apply(added, removed, loaded_version)
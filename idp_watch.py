@@ -0,0 +1,266 @@
+"""Watch the data files and image folder, and refresh caches when they change.
+
+When an analyst replaces a parquet file, edits the workbook or drops new PNGs
+into the images folder, the watcher does three things:
+
+- bumps that dataset's version counter;
+- drops only the cache entries built from it, so unrelated warm caches stay
+  warm;
+- re-warms the dropped league-wide tables, and runs the incremental build
+  (idp_build) of the steps that read the file. No step reads the workbook,
+  so the app's own training-log saves only refresh the tables built from it.
+
+Users see the new data on their next rerun, without anyone restarting the server.
+
+It uses inotify on Linux and falls back to polling file stats every
+IDP_WATCH_POLL seconds elsewhere. Changes are acted on once a file has been
+quiet for IDP_WATCH_DEBOUNCE seconds, so a half-copied drop is never read.
+
+The app starts a watcher in its own process unless IDP_WATCH=0. To keep the
+shared disk cache warm for every worker from outside the app:
+
+    python idp_watch.py [--poll]
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from idp_data import EXCEL_FILE, MINS_FILE, SEASON_FILE, EVENTS_FILE, IMAGES_FOLDER, invalidate
+
+
+WATCH_ENABLED = os.environ.get('IDP_WATCH', '1') != '0'
+POLL_SECONDS = float(os.environ.get('IDP_WATCH_POLL', 2))
+DEBOUNCE_SECONDS = float(os.environ.get('IDP_WATCH_DEBOUNCE', 1))
+
+WATCHED = {
+    EXCEL_FILE: 'Training log & bios',
+    MINS_FILE: 'Racing minutes',
+    SEASON_FILE: 'Season percentiles',
+    EVENTS_FILE: 'League events',
+    IMAGES_FOLDER: 'Match report images',
+}
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal inotify reader over libc: watch directories, read changed paths"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self.watches[wd] = directory
+
+    def read(self, timeout):
+        """Paths changed within `timeout` seconds (empty if none)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths, offset = [], 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b'\0')
+            paths.append(os.path.join(self.watches.get(wd, ''), os.fsdecode(name)))
+            offset += _EVENT_HEADER.size + length
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _signature(path):
+    """What polling compares: size and mtime of a file, or of every file in a folder"""
+    try:
+        if os.path.isdir(path):
+            return tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size) for entry in os.scandir(path)))
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def rewarm(names, paths=(), log=print):
+    """Rebuild the dropped league-wide tables, then the derived artifacts built from the changed `paths`"""
+    from idp_data import (load_bios, load_training_log, load_game_overview, load_season_data, load_event_table,
+                          load_match_teams, load_image_manifest, load_player_index, load_event_bitmaps, load_availability)
+    from idp_build import build, steps_using
+    loaders = {
+        'bios': load_bios,
+        'training_log': load_training_log,
+        'game_overview': load_game_overview,
+        'availability': load_availability,
+        'season_data': load_season_data,
+        'event_table': load_event_table,
+        'event_bitmaps': load_event_bitmaps,
+        'match_teams': load_match_teams,
+        'image_manifest': load_image_manifest,
+        'player_index': load_player_index,
+    }
+    for name in names:
+        if name in loaders:
+            loaders[name]()
+    steps = steps_using(path for path in paths if path != EXCEL_FILE)
+    if not steps:
+        return []
+    rows, _ = build(only=steps, log=lambda message: None)
+    built = [row['step'] for row in rows if row['status'] == 'built']
+    failed = [row['step'] for row in rows if row['status'] == 'failed']
+    if failed:
+        log(f"rebuild failed for {', '.join(failed)}")
+    return built
+
+
+class DataWatcher(threading.Thread):
+    """Background thread that invalidates and re-warms caches when a watched dataset changes"""
+
+    def __init__(self, paths=None, poll=POLL_SECONDS, debounce=DEBOUNCE_SECONDS, force_polling=False, log=print):
+        super().__init__(daemon=True, name='idp-data-watcher')
+        self.paths = {os.path.abspath(path): path for path in (paths or WATCHED)}
+        self.poll = poll
+        self.debounce = debounce
+        self.force_polling = force_polling
+        self.log = log
+        self.mode = None
+        self.versions = {path: 0 for path in self.paths.values()}
+        self.history = deque(maxlen=50)
+        self._stop_event = threading.Event()
+
+    def _watched(self, changed):
+        """The watched dataset a changed path belongs to, or None"""
+        changed = os.path.abspath(changed)
+        for absolute, path in self.paths.items():
+            if changed == absolute or changed.startswith(absolute + os.sep):
+                return path
+        return None
+
+    def handle(self, paths):
+        """Bump versions, drop dependent cache entries and re-warm them"""
+        started = time.perf_counter()
+        dropped = []
+        for path in paths:
+            self.versions[path] += 1
+            dropped += invalidate(path)
+        try:
+            built = rewarm(dropped, paths, self.log)
+        except Exception as e:
+            self.log(f"re-warming after {', '.join(paths)} failed: {e}")
+            built = []
+        change = {
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'datasets': ', '.join(WATCHED.get(path, path) for path in paths),
+            'versions': ', '.join(str(self.versions[path]) for path in paths),
+            'dropped': len(dropped),
+            'rebuilt': ', '.join(built),
+            'seconds': round(time.perf_counter() - started, 2),
+        }
+        self.history.appendleft(change)
+        self.log(f"{change['datasets']} changed: dropped {change['dropped']} cache entries, rebuilt {change['rebuilt'] or 'nothing'} in {change['seconds']}s")
+
+    def _run_inotify(self):
+        inotify = Inotify()
+        try:
+            directories = {path if os.path.isdir(path) else os.path.dirname(path) for path in self.paths}
+            for directory in directories:
+                inotify.add(directory)
+            self.mode = 'inotify'
+            pending, last_event = set(), 0
+            while not self._stop_event.is_set():
+                for changed in inotify.read(min(self.poll, self.debounce)):
+                    path = self._watched(changed)
+                    if path is not None:
+                        pending.add(path)
+                        last_event = time.monotonic()
+                if pending and time.monotonic() - last_event >= self.debounce:
+                    self.handle(sorted(pending))
+                    pending = set()
+        finally:
+            inotify.close()
+
+    def _run_polling(self):
+        self.mode = 'polling'
+        signatures = {path: _signature(path) for path in self.paths.values()}
+        pending = {}
+        while not self._stop_event.wait(self.poll):
+            for path, before in signatures.items():
+                now = _signature(path)
+                if now != before:
+                    signatures[path] = now
+                    pending[path] = time.monotonic()
+            ready = [path for path, changed_at in pending.items() if time.monotonic() - changed_at >= self.debounce]
+            if ready:
+                for path in ready:
+                    del pending[path]
+                self.handle(sorted(ready))
+
+    def run(self):
+        if not self.force_polling:
+            try:
+                self._run_inotify()
+                return
+            except OSError as e:
+                self.log(f"inotify unavailable ({e}), polling every {self.poll}s instead")
+        self._run_polling()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def status(self):
+        return {'mode': self.mode, 'versions': dict(self.versions), 'history': list(self.history)}
+
+
+def start_watcher(**kwargs):
+    watcher = DataWatcher(**kwargs)
+    watcher.start()
+    return watcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the data files and keep the caches fresh")
+    parser.add_argument('--poll', action='store_true', help="Poll file stats instead of using inotify")
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS, help="Polling interval in seconds")
+    args = parser.parse_args()
+
+    watcher = start_watcher(poll=args.interval, force_polling=args.poll)
+    print(f"watching {', '.join(WATCHED)}")
+    try:
+        while watcher.is_alive():
+            watcher.join(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""The JSON API served locally through handle() and make_server(), with no outside network."""
+import http.client
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import pytest
+
+import idp_api
+import idp_diskcache
+from idp_data import EVENTS_FILE, SEASON_FILE, load_bios, load_comp_data, load_card_metrics, load_season_data, player_id_for
+from idp_ratings import position_minutes
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(idp_diskcache, 'DISK_CACHE_FILE', str(tmp_path / 'cache.sqlite'))
+
+
+@pytest.fixture(scope='module')
+def player():
+    """A squad player with season data: (name, player_id, minutes by position)"""
+    for name in load_bios()['Player']:
+        player_id = player_id_for(name)
+        minutes = position_minutes(load_season_data(), player_id) if player_id is not None else {}
+        if minutes:
+            return name, player_id, minutes
+    pytest.skip("No squad player has season data")
+
+
+def get(path, etag=None):
+    status, headers, body = idp_api.handle(path, etag)
+    return status, headers, json.loads(body) if body else None
+
+
+def test_players():
+    status, headers, body = get('/players')
+    assert status == 200
+    assert body['players'] == load_bios()['Player'].tolist()
+    assert headers['ETag']
+
+
+def test_not_modified(player):
+    name = player[0]
+    status, headers, first = get(f"/players/{quote(name)}/training")
+    assert status == 200
+    status, again, body = get(f"/players/{quote(name)}/training", headers['ETag'])
+    assert (status, again['ETag'], body) == (304, headers['ETag'], None)
+    assert get(f"/players/{quote(name)}/training", '"stale"')[0] == 200
+
+
+def test_dated_responses_change_etag_with_the_day(player, monkeypatch):
+    name = player[0]
+    bio_etag = get(f"/players/{quote(name)}")[1]['ETag']
+    overview_etag = get(f"/players/{quote(name)}/overview")[1]['ETag']
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(idp_api, 'date', Tomorrow)
+    assert get(f"/players/{quote(name)}", bio_etag)[0] == 200
+    assert get(f"/players/{quote(name)}/overview", overview_etag)[0] == 304
+
+
+@pytest.mark.parametrize('resource', ['ratings', 'maps'])
+def test_season_file_change_changes_etag(player, resource, monkeypatch):
+    handler, files = idp_api.PLAYER_ROUTES[resource]
+    monkeypatch.setattr(idp_api, '_bodies', OrderedDict())  # keep the stand-in bodies out of the shared cache
+    monkeypatch.setitem(idp_api.PLAYER_ROUTES, resource, (lambda name, query: {'player': name}, files))
+    path = f"/players/{quote(player[0])}/{resource}"
+    etag = get(path)[1]['ETag']
+    assert get(path, etag)[0] == 304
+
+    data_version = idp_api.data_version
+    monkeypatch.setattr(idp_api, 'data_version',
+                        lambda *paths: tuple(v + 1 if p == SEASON_FILE and v else v for p, v in zip(paths, data_version(*paths))))
+    status, headers, _ = get(path, etag)
+    assert status == 200
+    assert headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('path', ['/players/Nobody%20At%20All', '/players/Nobody%20At%20All/ratings', '/teams', '/players/x/y/z'])
+def test_not_found(path):
+    status, _, body = get(path)
+    assert status == 404
+    assert body['error']
+
+
+def test_ratings(player):
+    name, player_id, minutes = player
+    status, _, body = get(f"/players/{quote(name)}/ratings")
+    assert status == 200
+    assert body['positions'] == [next(iter(minutes))]
+    assert body['position_minutes'] == minutes
+
+
+def test_ratings_for_a_position_not_played(player):
+    name, _, minutes = player
+    other = next(p for p in load_season_data()['Position Group'].dropna().unique() if p not in minutes)
+    status, _, body = get(f"/players/{quote(name)}/ratings?positions={quote(other)}")
+    assert status == 400
+    assert other in body['error']
+
+
+@pytest.mark.parametrize('query', ['', 'the+and+of'])
+def test_search_without_words(query):
+    status, _, body = get(f"/search?q={query}")
+    assert status == 400
+    assert body['error']
+
+
+@pytest.mark.skipif(not os.path.exists(EVENTS_FILE), reason="league events file not present")
+def test_maps_use_the_page_minutes(player):
+    name, player_id, minutes = player
+    comp_data = load_comp_data([next(iter(minutes))], player_id)
+    page_minutes = comp_data[comp_data['player_id'] == player_id].iloc[0].get('Minutes', 0)
+    status, _, body = get(f"/players/{quote(name)}/maps")
+    assert status == 200
+    assert body == json.loads(json.dumps(idp_api.to_json(load_card_metrics(player_id, page_minutes))))
+
+
+def test_server(player):
+    server = idp_api.make_server('127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=30)
+        connection.request('GET', f"/players/{quote(player[0])}")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())['Player'] == player[0]
+
+        connection.request('GET', f"/players/{quote(player[0])}", headers={'If-None-Match': response.getheader('ETag')})
+        response = connection.getresponse()
+        assert (response.status, response.read()) == (304, b'')
+
+        connection.request('GET', '/players/Nobody%20At%20All')
+        response = connection.getresponse()
+        assert response.status == 404
+        response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,92 @@
+"""Memory-mapped Arrow twins in idp_arrow: per-player and per-match slices checked against pandas filters."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idp_arrow
+import idp_diskcache
+from idp_arrow import open_arrow
+from idp_data import EVENTS_FILE, load_card_metrics, load_player_events, load_player_matches, squad_player_ids
+
+
+@pytest.fixture
+def events_file(tmp_path, monkeypatch):
+    """An unsorted events parquet of four players over five matches, some rows without a player"""
+    rng = np.random.default_rng(5)
+    n = 2000
+    events = pd.DataFrame({
+        'id': [f'e{i}' for i in range(n)],
+        'player_id': rng.choice([3.0, 1.0, 4.0, 2.0, np.nan], n),
+        'match_id': rng.choice([105, 101, 103, 102, 104], n),
+        'x': rng.uniform(0, 120, n),
+    })
+    path = str(tmp_path / 'events.parquet')
+    events.to_parquet(path, index=False)
+    monkeypatch.setitem(idp_arrow.ARROW_SUBKEYS, path, 'match_id')
+    return path, events
+
+
+def expected(events, player_id, match_ids=None):
+    rows = events[events['player_id'] == player_id]
+    if match_ids is not None:
+        rows = rows[rows['match_id'].isin(match_ids)]
+    return rows.sort_values(['match_id', 'id']).reset_index(drop=True)
+
+
+def frame(table, player_id, match_ids=None):
+    return table.frame(player_id, subvalues=match_ids).sort_values(['match_id', 'id']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('match_ids', [None, [103], [101, 105], [105, 101, 104], [999], []])
+def test_slices_match_pandas_filters(events_file, match_ids):
+    path, events = events_file
+    table = open_arrow(path, key='player_id')
+    for player_id in [1.0, 2.0, 3.0, 4.0, 7.0]:
+        pd.testing.assert_frame_equal(frame(table, player_id, match_ids), expected(events, player_id, match_ids), check_dtype=False)
+
+
+def test_row_ranges_cover_each_player_and_match(events_file):
+    path, events = events_file
+    table = open_arrow(path, key='player_id')
+    assert len(table) == len(events)
+    counts = events.dropna(subset=['player_id']).groupby(['player_id', 'match_id']).size()
+    assert {(p, m): stop - start for p, matches in table.subrows.items() for m, (start, stop) in matches.items()} == counts.to_dict()
+    assert {p: stop - start for p, (start, stop) in table.rows.items()} == counts.groupby(level=0).sum().to_dict()
+
+
+def test_twin_is_reexported_when_the_parquet_changes(events_file):
+    path, events = events_file
+    open_arrow(path, key='player_id')
+    assert idp_arrow._is_current(path, 'player_id')
+
+    events[events['player_id'] != 4.0].to_parquet(path, index=False)
+    assert not idp_arrow._is_current(path, 'player_id')
+    table = open_arrow(path, key='player_id')
+    assert 4.0 not in table.rows
+    assert idp_arrow._is_current(path, 'player_id')
+
+
+def test_twin_sorted_the_old_way_is_reexported(events_file, monkeypatch):
+    path, events = events_file
+    monkeypatch.delitem(idp_arrow.ARROW_SUBKEYS, path)
+    idp_arrow.export_arrow(path, 'player_id')
+    monkeypatch.setitem(idp_arrow.ARROW_SUBKEYS, path, 'match_id')
+    assert not idp_arrow._is_current(path, 'player_id')
+    table = open_arrow(path, key='player_id')
+    pd.testing.assert_frame_equal(frame(table, 2.0, [102, 104]), expected(events, 2.0, [102, 104]), check_dtype=False)
+
+
+@pytest.mark.skipif(not os.path.exists(EVENTS_FILE), reason="league events file not present")
+def test_every_match_reproduces_the_season_cards(tmp_path, monkeypatch):
+    monkeypatch.setattr(idp_diskcache, 'DISK_CACHE_FILE', str(tmp_path / 'cache.sqlite'))
+    from idp_api import to_json
+    player_id = next((p for p in squad_player_ids() if len(load_player_matches(p))), None)
+    if player_id is None:
+        pytest.skip("No squad player has events")
+    matches = load_player_matches(player_id)
+    assert matches['Events'].sum() == len(load_player_events(player_id))
+    season = json.dumps(to_json(load_card_metrics(player_id, 900)), sort_keys=True)
+    assert json.dumps(to_json(load_card_metrics(player_id, 900, matches['match_id'].tolist())), sort_keys=True) == season
@@ -0,0 +1,75 @@
+"""The squad availability matrix, checked against per-player sums over the Racing Mins rows."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from idp_availability import CAME_ON, NO_RECORD, NOT_IN_SQUAD, STARTED, UNUSED, AvailabilityMatrix
+from idp_data import load_game_overview
+
+
+def summed_overview(game_overview, player):
+    """Season Overview numbers summed straight from a player's rows (the page's original computation)"""
+    possible_minutes = game_overview.groupby('match_id')['Minutes'].max().sum()
+    games = game_overview[game_overview['Player'] == player]
+    started, came_on = int((games['Started'] == True).sum()), int((games['Came On'] == True).sum())
+    minutes = int(games['Minutes'].sum())
+    return {
+        'Possible Matches': int(game_overview['match_id'].nunique()),
+        'Made Squad': int((games['In Squad'] == True).sum()),
+        'Played': started + came_on,
+        'Started': started,
+        'Came On': came_on,
+        'Minutes': minutes,
+        '% of Mins': int(minutes / possible_minutes * 100) if possible_minutes else 0,
+    }
+
+
+def row(player, match_id, day, status, minutes=0):
+    return {'Player': player, 'match_id': match_id, 'match_date': f'2025-04-{day:02d}', 'Opponent': f'Team {match_id}',
+            'Venue': 'Home', 'In Squad': status != 'out', 'Started': status == 'start', 'Came On': status == 'sub on',
+            'Minutes': minutes if status in ('start', 'sub on') else (0 if status != 'out' else None)}
+
+
+@pytest.fixture
+def game_overview():
+    rows = [
+        row('Ada', 1, 5, 'start', 90), row('Bea', 1, 5, 'bench'), row('Cal', 1, 5, 'out'),
+        row('Ada', 3, 19, 'start', 96), row('Bea', 3, 19, 'bench'), row('Cal', 3, 19, 'sub on', 20),
+        row('Ada', 2, 12, 'sub on', 30), row('Bea', 2, 12, 'bench'), row('Cal', 2, 12, 'start', 90),
+        row('Ada', 4, 26, 'start', 90), row('Bea', 4, 26, 'sub on', 5),
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_overview_matches_the_summed_rows(game_overview):
+    availability = AvailabilityMatrix(game_overview)
+    for player in ['Ada', 'Bea', 'Cal', 'Nobody']:
+        assert availability.overview(player) == summed_overview(game_overview, player)
+
+
+def test_overview_matches_the_summed_rows_of_racing_mins():
+    game_overview = load_game_overview()
+    availability = AvailabilityMatrix(game_overview)
+    assert len(availability) == game_overview['Player'].nunique()
+    for player in game_overview['Player'].unique():
+        assert availability.overview(player) == summed_overview(game_overview, player), player
+
+
+def test_matrix_cells_and_streaks(game_overview):
+    availability = AvailabilityMatrix(game_overview)
+    assert availability.matches['match_id'].tolist() == [1, 2, 3, 4]
+    assert availability.status[availability.player_rows['Bea']].tolist() == [UNUSED, UNUSED, UNUSED, CAME_ON]
+    assert availability.status[availability.player_rows['Cal']].tolist() == [NOT_IN_SQUAD, STARTED, CAME_ON, NO_RECORD]
+    totals = availability.totals
+    assert (totals.loc['Bea', 'Unused Streak'], totals.loc['Bea', 'Longest Unused Streak']) == (0, 3)
+    assert availability.matches['Length'].tolist() == [90, 90, 96, 90]
+    assert availability.minutes_in('Ada', [2, 3, 99]) == 126
+    assert availability.minutes_in('Nobody', [1]) == 0
+    assert availability.opponents() == {1: 'Team 1', 2: 'Team 2', 3: 'Team 3', 4: 'Team 4'}
+
+
+def test_duplicate_rows_count_once(game_overview):
+    doubled = pd.concat([game_overview, game_overview.iloc[:1]], ignore_index=True)
+    availability = AvailabilityMatrix(doubled)
+    assert availability.overview('Ada') == summed_overview(game_overview, 'Ada')
+    assert np.array_equal(availability.status, AvailabilityMatrix(game_overview).status)
@@ -0,0 +1,82 @@
+"""Bitmap event filters in idp_bitmaps, checked against the same filters as pandas boolean masks."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from idp_arrow import ArrowTable, _sorted
+from idp_bitmaps import DERIVED_FLAGS, FLAG_COLUMNS, PRESETS, EventBitmaps, describe
+
+
+@pytest.fixture(scope='module')
+def events():
+    """Random events of three players over four matches, with null flags and an object-typed flag column"""
+    rng = np.random.default_rng(11)
+    n = 1500
+    events = pd.DataFrame({
+        'id': np.arange(n),
+        'player_id': rng.choice([1.0, 2.0, 3.0], n),
+        'match_id': rng.choice([10, 11, 12, 13], n),
+        'type': rng.choice(['Pass', 'Shot', 'Carry', 'Pressure', None], n, p=[0.4, 0.15, 0.2, 0.2, 0.05]),
+        'shot_outcome': rng.choice(['Goal', 'Saved', None], n),
+        'shot_type': rng.choice(['Penalty', 'Open Play', None], n),
+        'pass_type': rng.choice(['Free Kick', 'Corner', 'Throw-in', None], n),
+        'dribble_outcome': rng.choice(['Complete', 'Incomplete', None], n),
+    })
+    for column in FLAG_COLUMNS:
+        events[column] = pd.array(rng.choice([True, False, None], n), dtype='boolean')
+    events['counter_shot'] = rng.choice([True, None], n).astype(object)  # True/None objects, as some exports have
+    return events
+
+
+@pytest.fixture(scope='module')
+def bitmaps(events):
+    table = _sorted(pa.Table.from_pandas(events, preserve_index=False), ['player_id', 'match_id'])
+    return EventBitmaps(ArrowTable(table, 'player_id', 'match_id'))
+
+
+def mask(events, spec):
+    """Boolean mask of the rows matching a filter, straight from the columns"""
+    if isinstance(spec, str):
+        if spec.startswith('type:'):
+            return events['type'] == spec.removeprefix('type:')
+        if spec in DERIVED_FLAGS:
+            _, column, values = DERIVED_FLAGS[spec]
+            return events[column].isin(values)
+        return events[spec].fillna(False).astype(bool)
+    op, args = spec
+    if op == 'not':
+        return ~mask(events, args)
+    masks = [mask(events, arg) for arg in args]
+    combined = masks[0]
+    for other in masks[1:]:
+        combined = combined & other if op == 'and' else combined | other
+    return combined
+
+
+@pytest.mark.parametrize('name', list(PRESETS) + ['not pass', 'goal or penalty'])
+@pytest.mark.parametrize('match_ids', [None, [11], [10, 13], [99]])
+def test_filters_match_boolean_masks(events, bitmaps, name, match_ids):
+    spec = PRESETS.get(name) or {'not pass': ('not', 'type:Pass'), 'goal or penalty': ('or', ['goal', 'penalty'])}[name]
+    for player_id in [1.0, 2.0, 3.0]:
+        rows = events[(events['player_id'] == player_id) & mask(events, spec)]
+        if match_ids is not None:
+            rows = rows[rows['match_id'].isin(match_ids)]
+        assert bitmaps.count(player_id, spec, match_ids) == len(rows)
+        selected = bitmaps.select(player_id, spec, match_ids, columns=['id', 'match_id'])
+        assert sorted(selected['id']) == sorted(rows['id'])
+
+
+def test_unknown_player_and_flags(bitmaps):
+    assert bitmaps.count(99.0, 'type:Shot') == 0
+    assert bitmaps.select(99.0, 'type:Shot', columns=['id']).empty
+    with pytest.raises(ValueError, match='Unknown event flag'):
+        bitmaps.evaluate(1.0, ('and', ['type:Shot', 'no_such_flag']))
+    with pytest.raises(ValueError, match='Unknown filter operator'):
+        bitmaps.evaluate(1.0, ('xor', ['goal', 'penalty']))
+
+
+def test_describe():
+    labels = {'pressure_in_prev_15s': 'Within 15s of a pressure', 'counter_shot': 'Counter-attack shot'}
+    assert describe(PRESETS['Transition shots'], labels) == 'Shot and (Within 15s of a pressure or Counter-attack shot)'
+    assert describe(('and', ['type:Shot', 'goal', ('not', 'penalty')])) == 'Shot and goal and not penalty'
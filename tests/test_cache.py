@@ -0,0 +1,57 @@
+"""The process-wide cache in idp_data: one build per missing entry, and no lock left behind per key."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import idp_data
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.txt'
+    path.write_text('v1')
+    yield str(path)
+    idp_data.clear_cache()
+
+
+def test_concurrent_callers_share_one_build(data_file):
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    with ThreadPoolExecutor(8) as pool:
+        values = list(pool.map(lambda _: idp_data.cached(('test', 'shared'), [data_file], build), range(8)))
+    assert values == ['value'] * 8
+    assert len(builds) == 1
+    assert not idp_data._build_locks
+
+
+def test_build_locks_do_not_grow_with_keys(data_file):
+    for i in range(500):
+        idp_data.cached(('test', 'key', i), [data_file], lambda: i)
+    assert not idp_data._build_locks
+
+
+def test_failed_build_releases_its_lock(data_file):
+    def build():
+        raise ValueError("broken")
+
+    with pytest.raises(ValueError):
+        idp_data.cached(('test', 'broken'), [data_file], build)
+    assert not idp_data._build_locks
+
+
+def test_nested_builds(data_file):
+    inner = lambda: idp_data.cached(('test', 'inner'), [data_file], lambda: 1)
+    threads = [threading.Thread(target=idp_data.cached, args=(('test', 'outer', i), [data_file], inner)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert not idp_data._build_locks
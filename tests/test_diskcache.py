@@ -0,0 +1,76 @@
+"""The on-disk result cache in idp_diskcache: keys follow the input files and the code that builds a result."""
+import importlib
+import sys
+
+import pytest
+
+import idp_diskcache
+
+
+@pytest.fixture
+def source_folder(tmp_path, monkeypatch):
+    """A folder standing in for the app's source folder, importable as modules"""
+    monkeypatch.setattr(idp_diskcache, '_SOURCE_FOLDER', str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / 'data.txt').write_text('v1')
+    yield tmp_path
+    for name in ('cache_builder', 'cache_helper'):
+        sys.modules.pop(name, None)
+
+
+def write_module(folder, name, source):
+    (folder / f'{name}.py').write_text(source)
+    sys.modules.pop(name, None)
+    importlib.invalidate_caches()
+    return importlib.import_module(name)
+
+
+def key_for(folder, module):
+    data = str(folder / 'data.txt')
+    return idp_diskcache.cache_key(('result', 1), [data], lambda: module.build(data))
+
+
+def test_key_is_stable_for_unchanged_code_and_data(source_folder):
+    builder = write_module(source_folder, 'cache_builder', "def build(path):\n    return open(path).read()\n")
+    assert key_for(source_folder, builder) == key_for(source_folder, builder)
+    assert key_for(source_folder, builder).startswith('result:1|')
+
+
+def test_builder_source_change_changes_key(source_folder):
+    builder = write_module(source_folder, 'cache_builder', "def build(path):\n    return open(path).read()\n")
+    before = key_for(source_folder, builder)
+    builder = write_module(source_folder, 'cache_builder', "def build(path):\n    return open(path).read().upper()\n")
+    assert key_for(source_folder, builder) != before
+
+
+def test_lazily_imported_helper_change_changes_key(source_folder):
+    write_module(source_folder, 'cache_helper', "def shout(text):\n    return text.upper()\n")
+    builder = write_module(source_folder, 'cache_builder',
+                           "def build(path):\n    from cache_helper import shout\n    return shout(open(path).read())\n")
+    before = key_for(source_folder, builder)
+    write_module(source_folder, 'cache_helper', "def shout(text):\n    return text.upper() + '!'\n")
+    assert key_for(source_folder, builder) != before
+
+
+def test_input_change_changes_key(source_folder):
+    builder = write_module(source_folder, 'cache_builder', "def build(path):\n    return open(path).read()\n")
+    before = key_for(source_folder, builder)
+    (source_folder / 'data.txt').write_text('v22')
+    assert key_for(source_folder, builder) != before
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('hex_map', ['hex_map|1']),
+    ('comp_data:ST', ['comp_data:ST,CM:7|1']),
+    ('comp_data:S_', []),
+    ('comp%', []),
+    ('100%', ['100%|1']),
+])
+def test_prefix_matches_literally(tmp_path, prefix, expected):
+    path = str(tmp_path / 'cache.sqlite')
+    keys = ['hex_map|1', 'hexXmap|1', 'comp_data:ST,CM:7|1', 'comp_data:SW:7|1', '100%|1', '1000|1']
+    for key in keys:
+        idp_diskcache.put(key, 'value', path=path)
+    assert sorted(row[0] for row in idp_diskcache.entries(prefix, path=path)) == expected
+    assert idp_diskcache.purge(prefix, path=path) == len(expected)
+    assert sorted(row[0] for row in idp_diskcache.entries(path=path)) == sorted(set(keys) - set(expected))
@@ -0,0 +1,66 @@
+"""League metric distributions in idp_distributions, checked against the pct columns of build_comp_data."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from idp_data import load_season_data, squad_player_ids
+from idp_distributions import MetricDistributions, build_metric_distributions, swarm_offsets
+from idp_ratings import PHYS_COLS, PHYS_PCT_COLS, build_comp_data, primary_positions
+
+
+@pytest.fixture(scope='module')
+def season_data():
+    return load_season_data()
+
+
+def test_percentiles_match_comp_data(season_data):
+    positions = primary_positions(season_data, squad_player_ids())
+    if not positions:
+        pytest.skip("No squad player has season data")
+    checked = 0
+    for player_id, position in list(positions.items())[:6]:
+        distributions = build_metric_distributions(season_data, [position])
+        comp_data = build_comp_data(season_data, [position], player_id)
+        row = comp_data[comp_data['player_id'] == player_id].iloc[0]
+        for metric in distributions.metrics:
+            if metric == 'Top Speed' or metric in PHYS_COLS + PHYS_PCT_COLS or f'pct{metric}' not in row:
+                continue  # physical pct columns come averaged from the season file, not ranked
+            assert distributions.value(player_id, metric) == pytest.approx(row[metric], nan_ok=True)
+            assert distributions.percentile(player_id, metric) == pytest.approx(row[f'pct{metric}'], nan_ok=True), metric
+            checked += 1
+    assert checked
+
+
+@pytest.mark.parametrize('player_id, own', [(99, None), (10, 2.0), (10, 5.0)])
+def test_percentile_is_rank_pct_among_the_pool_and_the_player(player_id, own):
+    """A player outside the pool, or in it with another value, ranks as pandas would with their row swapped in"""
+    pool = np.array([1.0, 2.0, 2.0, 3.0, np.nan, 5.0, 8.0])
+    pool_ids = list(range(10, 17))
+    if own is not None:
+        pool[0] = own
+    others = pool[1:] if player_id in pool_ids else pool
+    for value in [0.5, 2.0, 4.0, 5.0, 9.0]:
+        distributions = MetricDistributions(['CM'], ['m'], [player_id], np.array([[value]]),
+                                            pool_ids, [str(i) for i in pool_ids], pool[:, None])
+        league = pd.Series(np.r_[value, others])
+        assert distributions.percentile(player_id, 'm') == round(league.rank(pct=True)[0] * 100, 2)
+
+
+def test_quantiles_and_unknown_players(season_data):
+    distributions = build_metric_distributions(season_data, ['CM'])
+    metric = distributions.metrics[0]
+    values, names = distributions.sorted[metric]
+    assert (np.diff(values) >= 0).all() and len(names) == len(values)
+    np.testing.assert_allclose(distributions.quantiles(metric), np.quantile(values, (0.1, 0.5, 0.9)))
+    assert np.isnan(distributions.value('nobody', metric)) and np.isnan(distributions.percentile('nobody', metric))
+
+
+def test_swarm_offsets_spread_close_values():
+    values = np.sort(np.r_[np.zeros(5), np.linspace(0.5, 1, 3), [1.0, 1.0]])
+    offsets = swarm_offsets(values, bins=4)
+    assert offsets[:5].tolist() == [0, 1, -1, 2, -2]
+    bins = np.minimum((values * 4).astype(int), 3)
+    for b in set(bins):
+        assert len(set(offsets[bins == b])) == (bins == b).sum()
+    assert swarm_offsets(np.array([])).size == 0
+    assert swarm_offsets(np.array([3.0, 3.0])).tolist() == [0, 1]
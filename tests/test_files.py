@@ -0,0 +1,26 @@
+"""Atomic file replacement keeps the replaced file's permissions."""
+import os
+import stat
+
+from idp_files import replace_atomically
+
+
+def test_replace_keeps_the_mode(tmp_path):
+    path = str(tmp_path / 'MitchIDPs.xlsx')
+    with open(path, 'wb') as f:
+        f.write(b'old')
+    os.chmod(path, 0o664)
+    replace_atomically(path, lambda f: f.write(b'new'))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o664
+    with open(path, 'rb') as f:
+        assert f.read() == b'new'
+
+
+def test_new_file_gets_the_umask_mode(tmp_path):
+    path = str(tmp_path / 'new.json')
+    umask = os.umask(0o022)
+    try:
+        replace_atomically(path, lambda f: f.write(b'{}'))
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
@@ -0,0 +1,67 @@
+"""Prefix-sum form windows in idp_form, checked against pandas rolling sums over the same matches."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from idp_form import FORM_METRICS, FORM_RATINGS, MIN_WINDOW_MINUTES_PER_MATCH, FormSeries
+
+
+@pytest.fixture(scope='module')
+def matches():
+    """Three players with 1, 4 and 12 matches of random counts and minutes, in match order"""
+    rng = np.random.default_rng(7)
+    rows = []
+    for player_id, count in [(1, 1), (2, 4), (3, 12)]:
+        for i in range(count):
+            row = {'player_id': player_id, 'match_id': 100 + i, 'match_date': pd.Timestamp('2025-03-01') + pd.Timedelta(days=7 * i),
+                   'Minutes': float(rng.choice([0, 12, 45, 90]))}
+            row.update({metric: float(rng.integers(0, 6)) for metric in FORM_METRICS})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def pandas_p90(matches, n):
+    """Trailing n-match per 90 values per player from pandas rolling sums"""
+    grouped = matches.groupby('player_id', sort=False)
+    totals = grouped[FORM_METRICS].rolling(n, min_periods=1).sum().reset_index(drop=True)
+    minutes = grouped['Minutes'].rolling(n, min_periods=1).sum().reset_index(drop=True)
+    p90 = totals.mul(90).div(minutes, axis=0).where(minutes > 0, 0.0)
+    return p90, minutes, grouped.cumcount().add(1).clip(upper=n)
+
+
+@pytest.mark.parametrize('n', [1, 3, 5, 10])
+def test_rolling_matches_pandas_rolling(matches, n):
+    series = FormSeries(matches)
+    p90, minutes, length = pandas_p90(matches, n)
+    for player_id, rows in matches.groupby('player_id').groups.items():
+        trend = series.rolling(player_id, n)
+        assert len(trend) == len(rows)
+        np.testing.assert_allclose(trend[FORM_METRICS].to_numpy(), p90.loc[rows].to_numpy())
+        np.testing.assert_allclose(trend['Window Minutes'], minutes.loc[rows])
+        assert trend['Window Matches'].tolist() == length.loc[rows].tolist()
+
+
+@pytest.mark.parametrize('n', [3, 5])
+def test_league_reference_and_percentiles(matches, n):
+    series = FormSeries(matches)
+    p90, minutes, length = pandas_p90(matches, n)
+    keep = (length == n) & (minutes >= MIN_WINDOW_MINUTES_PER_MATCH * n)
+    reference = np.sort(p90[keep].to_numpy(), axis=0)
+    np.testing.assert_allclose(series.league_reference(n), reference)
+
+    trend = series.rolling(3, n)
+    for metric in FORM_METRICS:
+        expected = [(reference[:, FORM_METRICS.index(metric)] <= value).sum() * 100 / len(reference) for value in trend[metric]]
+        np.testing.assert_allclose(trend[f'pct{metric}'], expected)
+    for rating, weights in FORM_RATINGS.items():
+        np.testing.assert_allclose(trend[rating], sum(weight * trend[f'pct{metric}'] for metric, weight in weights.items()))
+
+
+def test_window_p90(matches):
+    series = FormSeries(matches)
+    player = matches[matches['player_id'] == 3]
+    last = player.iloc[4:8]
+    expected = last[FORM_METRICS].sum() * 90 / last['Minutes'].sum()
+    assert series.window_p90(3, 4, end=8) == pytest.approx(expected.to_dict())
+    assert series.window_p90(99, 3) is None
+    assert series.rolling(99, 3).empty
@@ -0,0 +1,97 @@
+"""Pre-binned hexagon counts in idp_hexbins, checked against matplotlib's own hexbin of the raw events."""
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from idp_hexbins import HEX_EXTENT, HEX_GRIDSIZE, HEX_LAYERS, HEX_MINCNT, build_hex_counts, count_layers, draw_hexbin, hex_centers, hex_index
+
+
+@pytest.fixture(scope='module')
+def events():
+    """Touches and pressures of three players, some on the lines, off the pitch or without a location"""
+    rng = np.random.default_rng(3)
+    n = 3000
+    x = rng.uniform(-5, 125, n)
+    y = rng.uniform(-5, 85, n)
+    x[:40], y[:40] = rng.integers(0, 13, 40) * 10.0, rng.integers(0, 7, 40) * 80 / 6  # hexagon centres and edges
+    x[40:50] = np.nan
+    return pd.DataFrame({
+        'player_id': rng.choice([11.0, 22.0, 33.0, np.nan], n, p=[0.4, 0.3, 0.25, 0.05]),
+        'type': rng.choice(['Pass', 'Ball Receipt*', 'Shot', 'Pressure', 'Carry'], n),
+        'x': x, 'y': y,
+    })
+
+
+def matplotlib_hexbin(x, y, **kwargs):
+    """(centres, values) of matplotlib's hexbin over the app's grid"""
+    fig, ax = plt.subplots()
+    try:
+        collection = ax.hexbin(x, y, gridsize=HEX_GRIDSIZE, extent=HEX_EXTENT, **kwargs)
+        return collection.get_offsets(), collection.get_array()
+    finally:
+        plt.close(fig)
+
+
+def test_centres_and_counts_match_matplotlib(events):
+    located = events.dropna(subset=['x', 'y'])
+    centres, counts = matplotlib_hexbin(located['x'], located['y'])
+    np.testing.assert_allclose(hex_centers(), centres)
+
+    index = hex_index(events['x'], events['y'])
+    assert (index[events['x'].isna().to_numpy()] == -1).all()
+    np.testing.assert_array_equal(np.bincount(index[index >= 0], minlength=len(centres)), counts)
+
+
+def test_league_counts_match_per_player_binning(events):
+    minutes = pd.Series({11.0: 900.0, 22.0: 450.0, 44.0: 90.0})
+    hex_counts = build_hex_counts(events, minutes)
+    assert hex_counts.player_ids.tolist() == [11.0, 22.0, 33.0]
+    assert hex_counts.minutes.tolist() == [900.0, 450.0, 0.0]
+    for player_id in hex_counts.player_ids:
+        expected = count_layers(events[events['player_id'] == player_id])
+        for layer, counts in expected.items():
+            np.testing.assert_array_equal(hex_counts.player_counts(layer, player_id), counts)
+
+
+def test_player_and_league_p90(events):
+    hex_counts = build_hex_counts(events, pd.Series({11.0: 900.0, 22.0: 450.0, 33.0: 180.0}))
+    counts = hex_counts.player_counts('Touches', 22.0)
+    p90 = hex_counts.player_p90('Touches', 22.0, 450.0)
+    np.testing.assert_allclose(p90[counts >= HEX_MINCNT], counts[counts >= HEX_MINCNT] / 5)
+    assert np.isnan(p90[counts < HEX_MINCNT]).all()
+
+    league = hex_counts.counts['Touches'].sum(axis=0) * 90 / 1530
+    np.testing.assert_allclose(np.nan_to_num(hex_counts.league_p90('Touches')), league)
+    np.testing.assert_allclose(np.nan_to_num(hex_counts.difference_p90('Touches', 22.0, 450.0)), counts / 5 - league)
+
+
+def test_for_events_keeps_the_league_view(events):
+    hex_counts = build_hex_counts(events, pd.Series({11.0: 900.0, 22.0: 450.0, 33.0: 180.0}))
+    some = events[(events['player_id'] == 11.0)].iloc[:100]
+    subset = hex_counts.for_events(11.0, some)
+    np.testing.assert_array_equal(subset.player_counts('Pressures', 11.0), count_layers(some)['Pressures'])
+    np.testing.assert_array_equal(subset.league_p90('Pressures'), hex_counts.league_p90('Pressures'))
+    np.testing.assert_array_equal(subset.player_counts('Pressures', 22.0), hex_counts.player_counts('Pressures', 22.0))
+
+
+def test_draw_hexbin_shows_the_raw_hexbin(events):
+    mplsoccer = pytest.importorskip('mplsoccer')
+    hex_counts = build_hex_counts(events, pd.Series({11.0: 900.0}))
+    values = hex_counts.player_counts('Touches', 11.0)
+    values[values < HEX_MINCNT] = np.nan
+
+    pitch = mplsoccer.Pitch(pitch_type='statsbomb')
+    fig, ax = pitch.draw()
+    try:
+        drawn = draw_hexbin(pitch, ax, hex_counts, values)
+        offsets, shown = drawn.get_offsets(), drawn.get_array()
+    finally:
+        plt.close(fig)
+    touches = events[(events['player_id'] == 11.0) & events['type'].isin(HEX_LAYERS['Touches'])].dropna(subset=['x'])
+    raw_offsets, raw = matplotlib_hexbin(touches['x'], touches['y'], mincnt=HEX_MINCNT)
+    np.testing.assert_allclose(offsets, raw_offsets)
+    np.testing.assert_array_equal(shown, raw)
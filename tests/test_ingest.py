@@ -0,0 +1,98 @@
+"""Streaming ingestion of event drops: derived columns, deduplication and batch-size independence."""
+import json
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from idp_ingest import ingest
+
+
+def event(event_id, type_, player_id, minute, second=0, match_id=1, team='Home', location=(60.0, 40.0), **extra):
+    row = {'id': event_id, 'type': type_, 'player_id': player_id, 'match_id': match_id, 'period': 1,
+           'minute': minute, 'second': second, 'team': team, 'location': list(location),
+           'pass_end_location': None, 'carry_end_location': None, 'pass_outcome': None,
+           'shot_key_pass_id': None, 'shot_statsbomb_xg': None, 'shot_outcome': None, 'play_pattern': 'Regular Play'}
+    row.update(extra)
+    return row
+
+
+EVENTS = [
+    # a key pass into the box and the shot it set up, in different batches with batch_size=2
+    event('p1', 'Pass', 7, 10, location=(70, 40), pass_end_location=[110, 40]),
+    event('c1', 'Carry', 8, 11, location=(50, 10), carry_end_location=[55, 12]),
+    event('pr1', 'Pressure', 9, 12, team='Away', location=(30, 40)),
+    event('s1', 'Shot', 8, 12, second=5, location=(110, 40), shot_key_pass_id='p1', shot_statsbomb_xg=0.3, shot_outcome='Goal'),
+    event('p2', 'Pass', 7, 20, location=(40, 40), pass_end_location=[100, 40], pass_outcome='Incomplete'),
+    event('pr2', 'Pressure', 9, 30, team='Away', location=(90, 40)),
+    event('c2', 'Carry', 8, 40, location=(80, 40), carry_end_location=[105, 40]),
+]
+
+
+def write_parquet(path, rows):
+    pd.DataFrame(rows).to_parquet(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def drop(tmp_path):
+    return write_parquet(tmp_path / 'drop.parquet', EVENTS)
+
+
+def ingested(path):
+    return pd.read_parquet(path).set_index('id')
+
+
+def test_derived_columns(drop, tmp_path):
+    output = str(tmp_path / 'events.parquet')
+    ingest([drop], output, log=lambda _: None)
+    events = ingested(output)
+    assert events.loc['p1', ['completed_pass', 'is_progressive', 'is_box_entry']].tolist() == [True, True, True]
+    assert events.loc['p1', 'xA'] == pytest.approx(0.3)
+    assert events.loc['p2', ['completed_pass', 'is_box_entry']].tolist() == [False, False]
+    assert not events.loc['c1', 'is_progressive_carry'] and events.loc['c2', ['is_progressive_carry', 'is_box_entry']].tolist() == [True, True]
+    assert events.loc['s1', ['x', 'y']].tolist() == [110, 40]
+    # pressures are linked to shots of their own team within the window only
+    assert not events.loc['pr1', 'pressure_leading_to_shot']
+    assert not events.loc['s1', 'pressure_in_prev_15s']
+
+
+def test_pressure_linked_to_a_later_shot_of_its_team(tmp_path):
+    rows = [event('pr', 'Pressure', 1, 5, team='Home'), event('s', 'Shot', 2, 5, second=10, team='Home', shot_statsbomb_xg=0.1),
+            event('late', 'Pressure', 1, 8, team='Home')]
+    output = str(tmp_path / 'events.parquet')
+    ingest([write_parquet(tmp_path / 'drop.parquet', rows)], output, log=lambda _: None)
+    events = ingested(output)
+    assert events.loc['pr', 'pressure_leading_to_shot'] and not events.loc['late', 'pressure_leading_to_shot']
+    assert events.loc['s', 'pressure_in_prev_15s']
+
+
+def test_batch_size_does_not_change_the_result(drop, tmp_path):
+    whole, batched = str(tmp_path / 'whole.parquet'), str(tmp_path / 'batched.parquet')
+    ingest([drop], whole, log=lambda _: None)
+    ingest([drop], batched, batch_size=2, log=lambda _: None)
+    columns = ['xA', 'completed_pass', 'is_progressive', 'is_progressive_carry', 'is_box_entry', 'pressure_leading_to_shot']
+    pd.testing.assert_frame_equal(ingested(whole)[columns].sort_index(), ingested(batched)[columns].sort_index())
+
+
+def test_duplicates_are_skipped_and_existing_rows_kept(drop, tmp_path):
+    output = str(tmp_path / 'events.parquet')
+    ingest([drop], output, log=lambda _: None)
+    again = write_parquet(tmp_path / 'again.parquet', EVENTS[:3] + [event('n1', 'Pass', 7, 50), event('n1', 'Pass', 7, 50)])
+    summary = ingest([again], output, batch_size=2, log=lambda _: None)
+    assert (summary['events read'], summary['duplicates skipped'], summary['events written']) == (5, 4, 1)
+    events = pq.read_table(output).to_pandas()
+    assert sorted(events['id']) == sorted([row['id'] for row in EVENTS] + ['n1'])
+
+
+def test_csv_drop(tmp_path):
+    rows = [dict(row, location=json.dumps(row['location']),
+                 pass_end_location=json.dumps(row['pass_end_location']) if row['pass_end_location'] else None)
+            for row in EVENTS if row['type'] in ('Pass', 'Shot')]
+    path = str(tmp_path / 'drop.csv')
+    pd.DataFrame(rows).drop(columns=['carry_end_location']).to_csv(path, index=False)
+    output = str(tmp_path / 'events.parquet')
+    ingest([path], output, log=lambda _: None)
+    events = ingested(output)
+    assert events.loc['p1', ['x', 'is_box_entry']].tolist() == [70, True]
+    assert events.loc['p1', 'xA'] == pytest.approx(0.3)
@@ -0,0 +1,38 @@
+"""Name resolution in the player index, on a small made-up league."""
+import pandas as pd
+
+from idp_players import PlayerIndex
+
+
+def make_index():
+    season_data = pd.DataFrame({
+        'Player': ['Sarah Weber', 'Savannah Marie DeMelo', 'Elli Pikkujämsä', 'Jo Smith', 'Jane Smith'],
+        'Team': ['Racing', 'Racing', 'Racing', 'Racing', 'Gotham'],
+        'player_id': [1, 2, 3, 4, 5],
+        'Minutes': [700, 900, 800, 500, 400],
+    })
+    game_overview = pd.DataFrame({'Player': ['S.Weber', 'Savannah DeMelo'], 'player_id': [1, 2]})
+    return PlayerIndex(season_data, game_overview)
+
+
+def test_full_and_looser_names():
+    index = make_index()
+    assert index.resolve('S.Weber') == 1
+    assert index.resolve('sarah weber') == 1
+    assert index.resolve('S Weber') == 1
+    assert index.resolve('Savannah DeMelo') == 2
+    assert index.resolve('Elli Pikkujamsa') == 3
+
+
+def test_initial_alias_does_not_override_a_different_first_name():
+    index = make_index()
+    assert index.resolve('Sam Weber') is None
+    assert index.resolve('Sam Weber', team='Racing') is None
+    assert index.resolve('Sav DeMelo') == 2
+
+
+def test_shared_initial_alias_needs_a_team():
+    index = make_index()
+    assert index.resolve('J Smith') is None
+    assert index.resolve('J Smith', team='Gotham') == 5
+    assert index.resolve('Jo Smith') == 4
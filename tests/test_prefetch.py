@@ -0,0 +1,114 @@
+"""Speculative page prefetch: what gets warmed, cancellation on navigation, the CPU budget and the hit counts."""
+import threading
+
+import pytest
+
+import idp_data
+from idp_prefetch import Prefetcher, neighbours
+
+
+ORDER = ['Ada', 'Bea', 'Cal', 'Dee', 'Eve']
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.txt'
+    path.write_text('v1')
+    idp_data.clear_cache()
+    yield str(path)
+    idp_data.clear_cache()
+
+
+def page_steps(data_file, built):
+    """A player page's work: two cached steps"""
+    def steps(page):
+        for part in ('card', 'map'):
+            idp_data.cached(('page', page, part), [data_file], lambda: built.append((page, part)) or part)
+            yield part
+    return steps
+
+
+def finish(prefetcher):
+    for future in list(prefetcher.futures.values()):
+        future.result(timeout=10)
+
+
+def test_neighbours():
+    assert neighbours('Cal', ORDER) == ['Dee', 'Bea', 'Eve']
+    assert neighbours('Ada', ORDER, popular=['Eve', 'Ada', 'Bea']) == ['Bea', 'Cal', 'Eve']
+    assert neighbours('Zed', ORDER, popular=['Bea']) == ['Bea']
+    assert neighbours('Cal', ORDER, limit=2) == ['Dee', 'Bea']
+
+
+def test_prefetched_pages_are_warm_and_counted(data_file):
+    built = []
+    prefetcher = Prefetcher(page_steps(data_file, built), workers=2, ahead=2, log=lambda _: None)
+    try:
+        assert prefetcher.visit('Bea', ORDER) == ['Cal', 'Ada']
+        finish(prefetcher)
+        assert sorted(built) == [('Ada', 'card'), ('Ada', 'map'), ('Cal', 'card'), ('Cal', 'map')]
+
+        prefetcher.visit('Cal', ORDER)
+        for _ in page_steps(data_file, built)('Cal'):   # the page itself, served from the prefetched entries
+            pass
+        finish(prefetcher)
+        assert ('Cal', 'card') in built and built.count(('Cal', 'card')) == 1
+        stats = prefetcher.stats()
+        assert (stats['visits'], stats['warm_visits'], stats['page_hit_rate']) == (2, 1, 50)
+        assert stats['entries_used'] == 2 and stats['entries_prefetched'] >= 4
+    finally:
+        prefetcher.shutdown()
+
+
+def test_navigating_away_stops_a_running_prefetch(data_file):
+    started, release = threading.Event(), threading.Event()
+
+    def steps(page):
+        started.set()
+        yield 'first'
+        release.wait(5)
+        yield 'second'
+        yield 'third'
+
+    prefetcher = Prefetcher(steps, workers=1, ahead=1, log=lambda _: None)
+    try:
+        prefetcher.visit('Ada', ORDER)
+        future = prefetcher.futures['Bea']
+        assert started.wait(5)
+        prefetcher.visit('Eve', ORDER)   # Bea is no longer wanted
+        release.set()
+        future.result(timeout=10)
+        finish(prefetcher)
+        stopped = next(run for run in prefetcher.stats()['recent'] if run['page'] == 'Bea')
+        assert stopped['status'] == 'stopped: navigated away' and stopped['steps'] < 3
+        assert 'Bea' not in prefetcher.warm
+    finally:
+        prefetcher.shutdown()
+
+
+def test_cpu_budget_skips_steps(data_file):
+    built = []
+    prefetcher = Prefetcher(page_steps(data_file, built), workers=1, ahead=1, cpu_seconds=0, log=lambda _: None)
+    try:
+        prefetcher.visit('Ada', ORDER)
+        finish(prefetcher)
+        assert built == []
+        assert prefetcher.stats()['throttled'] == 1
+    finally:
+        prefetcher.shutdown()
+
+
+def test_failures_are_logged_and_counted(data_file):
+    def steps(page):
+        yield 'first'
+        raise RuntimeError("no data")
+
+    logged = []
+    prefetcher = Prefetcher(steps, workers=1, ahead=1, log=logged.append)
+    try:
+        prefetcher.visit('Ada', ORDER)
+        finish(prefetcher)
+        assert prefetcher.stats()['failed'] == 1
+        assert logged == ["prefetch of Bea failed: no data"]
+    finally:
+        prefetcher.shutdown()
@@ -0,0 +1,62 @@
+"""Batched ratings in idp_ratings, checked against the per-player build_comp_data tables they stand in for."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from idp_data import load_season_data, squad_player_ids
+from idp_ratings import build_comp_data, build_squad_ratings, position_pool, primary_positions, rate_against_pool
+
+
+def assert_same_row(row, expected):
+    """Every column of `expected` but the by-product pctpctMatches Played has the same value in `row`"""
+    columns = [col for col in expected.index if col != 'pctpctMatches Played']
+    numeric = [col for col in columns if pd.api.types.is_number(expected[col]) or expected[col] is None]
+    np.testing.assert_allclose(row[numeric].to_numpy(dtype=float), expected[numeric].to_numpy(dtype=float), equal_nan=True, err_msg=row['Player'])
+    assert row[[c for c in columns if c not in numeric]].tolist() == expected[[c for c in columns if c not in numeric]].tolist()
+
+
+@pytest.fixture(scope='module')
+def season_data():
+    return load_season_data()
+
+
+def test_squad_ratings_match_each_players_comp_data(season_data):
+    player_ids = squad_player_ids()
+    squad = build_squad_ratings(season_data, player_ids)
+    positions = primary_positions(season_data, player_ids)
+    if not positions:
+        pytest.skip("No squad player has season data")
+    assert sorted(squad['player_id']) == sorted(positions)
+
+    for player_id, position in positions.items():
+        comp_data = build_comp_data(season_data, [position], player_id)
+        expected = comp_data[comp_data['player_id'] == player_id].iloc[0]
+        assert_same_row(squad[squad['player_id'] == player_id].iloc[0], expected)
+
+
+def test_primary_positions_are_the_most_played(season_data):
+    player_ids = squad_player_ids()
+    for player_id, position in primary_positions(season_data, player_ids).items():
+        minutes = season_data[season_data['player_id'] == player_id].groupby('Position Group')['Minutes'].sum()
+        assert minutes[position] == minutes.max()
+
+
+def test_no_players_gives_an_empty_frame(season_data):
+    assert build_squad_ratings(season_data, []).empty
+
+
+def test_comparison_ratings_match_comp_data_with_that_comparison_player(season_data):
+    player_id = next((p for p in squad_player_ids() if p in set(season_data['player_id'])), None)
+    if player_id is None:
+        pytest.skip("No squad player has season data")
+    positions = [next(iter(primary_positions(season_data, [player_id]).values()))]
+    pool = position_pool(season_data, positions)
+    median_mins = np.median(pool['Minutes'])
+    below = pool.loc[(pool['Minutes'] <= median_mins) & (pool['player_id'] != player_id), 'Player'].unique()[:3]
+    above = pool.loc[(pool['Minutes'] > median_mins) & (pool['player_id'] != player_id), 'Player'].unique()[:3]
+    assert len(below) and len(above)
+
+    rated = rate_against_pool(season_data, positions, list(below) + list(above), player_id)
+    for name in list(below) + list(above):
+        comp_data = build_comp_data(season_data, positions, player_id, comp_player_name=name)
+        assert_same_row(rated[rated['Player'] == name].iloc[0], comp_data[comp_data['Player'] == name].iloc[0])
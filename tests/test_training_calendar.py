@@ -0,0 +1,45 @@
+"""The day x player calendar matrix behind the training heatmaps."""
+import pandas as pd
+
+from idp_training import TrainingCalendar
+
+
+def entry(player, day, detail='Finishing'):
+    return {'Player': player, 'Type': 'Individual', 'Detail': detail, 'Date': day, 'Coach': 'Coach', 'Notes': '', 'Session_ID': 1}
+
+
+def calendar(rows):
+    index = TrainingCalendar('unused.xlsx')
+    index.rebuild(pd.DataFrame(rows))
+    return index
+
+
+def test_counts_match_a_groupby():
+    rows = [entry('A', '2025-08-01'), entry('A', '2025-08-01', 'Heading'), entry('B', '2025-08-03'), entry('A', '2025-08-05')]
+    days, players, counts = calendar(rows).matrix('2025-08-01', '2025-08-05')
+    expected = pd.DataFrame(rows).groupby(['Date', 'Player']).size().unstack(fill_value=0)
+    expected = expected.reindex(index=[str(d) for d in days], columns=players, fill_value=0)
+    assert (counts == expected.to_numpy()).all()
+
+
+def test_blank_player_is_not_counted_against_another():
+    index = calendar([entry('A', '2025-08-01'), entry(None, '2025-08-02'), entry('B', '2025-08-02')])
+    days, players, counts = index.matrix('2025-08-01', '2025-08-02')
+    assert players == ['A', 'B']
+    assert counts.tolist() == [[1, 0], [0, 1]]
+
+
+def test_blank_date_is_skipped():
+    index = calendar([entry('A', '2025-08-01'), entry('B', None)])
+    assert index.matrix('2025-08-01', '2025-08-01')[2].tolist() == [[1]]
+    assert calendar([entry('A', None)]).matrix('2025-08-01', '2025-08-01')[2].size == 0
+
+
+def test_add_and_remove_skip_entries_without_a_cell():
+    index = calendar([entry('A', '2025-08-01')])
+    index.add(entry(None, '2025-08-01'))
+    index.add(entry('A', None))
+    index.remove(entry('A', None))
+    index.add(entry('A', '2025-08-02'))
+    index.remove(entry('A', '2025-08-01'))
+    assert index.matrix('2025-08-01', '2025-08-02')[2].tolist() == [[0], [1]]
@@ -0,0 +1,62 @@
+"""Concurrent workbook writes from threads and processes must not lose rows or reuse session ids."""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import idp_training
+from idp_data import read_training_log
+from idp_training import TRAINING_COLUMNS, add_training_entries, remove_training_entry, training_entry
+
+
+def _entry(i):
+    return training_entry(f"Player {i}", 'Individual', 'Stress', date(2025, 8, 1 + i % 28), 'Coach', f"note {i}")
+
+
+def _add(path, i):
+    return add_training_entries([_entry(i)], path)
+
+
+def _add_group(path, i):
+    return add_training_entries([_entry(i), _entry(i + 1000)], path)
+
+
+def _remove(path, entry):
+    return remove_training_entry(entry, path)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'MitchIDPs.xlsx')
+    idp_training.write_training_log(pd.DataFrame(columns=TRAINING_COLUMNS), path)
+    # entries to remove while the others are being added
+    seeded = [dict(_entry(i), Session_ID=i + 1) for i in range(500, 520)]
+    add_training_entries(seeded, path)
+    return path, seeded
+
+
+@pytest.mark.parametrize('executor', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_concurrent_adds_and_removes(workbook, executor):
+    path, seeded = workbook
+    with executor(max_workers=6) as pool:
+        singles = [pool.submit(_add, path, i) for i in range(20)]
+        groups = [pool.submit(_add_group, path, i) for i in range(20, 30)]
+        removals = [pool.submit(_remove, path, entry) for entry in seeded[::2]]
+        single_ids = [future.result() for future in singles]
+        group_ids = [future.result() for future in groups]
+        assert all(future.result() for future in removals)
+
+    df = read_training_log(path)
+    notes = set(df['Notes'])
+    assert notes == ({f"note {i}" for i in range(30)} | {f"note {i}" for i in range(1020, 1030)}
+                     | {entry['Notes'] for entry in seeded[1::2]})
+    assert len(df) == len(notes)
+
+    # every write got its own id, none collides with a seeded one, and group members share theirs
+    ids = single_ids + group_ids
+    assert len(set(ids)) == len(ids)
+    assert not set(ids) & {entry['Session_ID'] for entry in seeded}
+    for i, session_id in zip(range(20, 30), group_ids):
+        assert set(df.loc[df['Notes'].isin([f"note {i}", f"note {i + 1000}"]), 'Session_ID']) == {session_id}
+    assert df['Session_ID'].nunique() == len(ids) + len(seeded[1::2])
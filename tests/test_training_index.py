@@ -0,0 +1,34 @@
+"""Workbook indexes stay in step with the file they were built from."""
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from idp_data import read_training_log
+from idp_training import TRAINING_COLUMNS, TrainingSearch, WorkbookIndex, add_training_entries, training_entry, write_training_log
+
+
+def test_sync_with_a_frame_read_before_a_change(tmp_path):
+    path = str(tmp_path / 'MitchIDPs.xlsx')
+    write_training_log(pd.DataFrame(columns=TRAINING_COLUMNS), path)
+    add_training_entries([training_entry('Sarah Weber', 'Individual', 'Finishing', date(2025, 8, 1), 'Coach', 'volleys')], path)
+    stale = read_training_log(path)
+
+    add_training_entries([training_entry('Sarah Weber', 'Individual', 'Heading', date(2025, 8, 2), 'Coach', 'crosses')], path)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+
+    index = TrainingSearch(path).sync(stale)
+    assert len(index.search('crosses')) == 0
+    index.sync(read_training_log(path))
+    assert len(index.search('crosses')) == 1
+    assert len(index.search('volleys')) == 1
+
+
+def test_index_without_every_method_cannot_be_created():
+    class Incomplete(WorkbookIndex):
+        def rebuild(self, df):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete('unused.xlsx')
@@ -0,0 +1,35 @@
+"""Word search over the training log's Detail and Notes."""
+import pandas as pd
+
+from idp_training import TrainingSearch, tokenize
+
+
+def make_index():
+    df = pd.DataFrame([
+        {'Player': 'Sarah Weber', 'Type': 'Individual', 'Detail': 'Finishing', 'Date': '2025-08-01',
+         'Coach': 'Coach', 'Notes': "Mégane's crossing drill", 'Session_ID': 1},
+        {'Player': 'Ellie Jean', 'Type': 'Group', 'Detail': 'Pressing', 'Date': '2025-08-02',
+         'Coach': 'Coach', 'Notes': 'Press in the final third', 'Session_ID': 2},
+    ])
+    index = TrainingSearch('unused.xlsx')
+    index.rebuild(df)
+    return index
+
+
+def test_tokenize_keeps_accented_words_whole():
+    assert tokenize("Mégane's first touch") == ['meganes', 'first', 'touch']
+    assert tokenize('Pikkujämsä') == ['pikkujamsa']
+    assert tokenize('the and of') == []
+
+
+def test_accented_and_folded_queries_match():
+    index = make_index()
+    assert index.search('Mégane')['Session_ID'].tolist() == [1]
+    assert index.search('megane')['Session_ID'].tolist() == [1]
+    assert index.search('press third')['Session_ID'].tolist() == [2]
+
+
+def test_stop_word_query_matches_nothing():
+    index = make_index()
+    assert index.search('the of').empty
+    assert index.search('').empty
@@ -0,0 +1,72 @@
+"""The dropdown vocabulary index: options, counts and last-used dates, kept in step with the log."""
+import pandas as pd
+import pytest
+
+from idp_training import DEFAULT_TYPES, VOCABULARY_FIELDS, TrainingVocabulary
+
+
+def entry(player, day, type_='Individual', detail='Finishing', coach='Coach A'):
+    return {'Player': player, 'Type': type_, 'Detail': detail, 'Date': day, 'Coach': coach, 'Notes': '', 'Session_ID': 1}
+
+
+ROWS = [
+    entry('Bea', '2025-08-01'),
+    entry('Bea', '2025-08-01', detail='Heading'),
+    entry('Ada', '2025-08-03', 'Group', 'Heading', 'Coach B'),
+    entry('Cal', '2025-07-20', 'Video', 'Pressing'),
+    entry('Cal', '2025-07-21', 'Video', 'Pressing'),
+    entry('Cal', '2025-07-22', 'Video', 'Pressing'),
+]
+
+
+def vocabulary(rows):
+    index = TrainingVocabulary('unused.xlsx')
+    index.rebuild(pd.DataFrame(rows))
+    return index
+
+
+def expected_options(rows, field, order):
+    """Options computed straight from the rows, ties broken alphabetically"""
+    df = pd.DataFrame(rows)
+    values = sorted(set(df[field].dropna()) | set(DEFAULT_TYPES if field == 'Type' else []))
+    counts = df[field].value_counts()
+    last = df.groupby(field)['Date'].max()
+    if order == 'Most Used':
+        return sorted(values, key=lambda value: -counts.get(value, 0))
+    if order == 'Most Recent':
+        return sorted(values, key=lambda value: last.get(value, ''), reverse=True)
+    return values
+
+
+@pytest.mark.parametrize('field', VOCABULARY_FIELDS)
+@pytest.mark.parametrize('order', ['Alphabetical', 'Most Used', 'Most Recent'])
+def test_options_match_the_log(field, order):
+    assert vocabulary(ROWS).options(field, order) == expected_options(ROWS, field, order)
+
+
+def test_counts_and_last_used():
+    index = vocabulary(ROWS)
+    assert index.count('Player', 'Cal') == 3
+    assert index.count('Detail', 'Heading') == 2
+    assert index.count('Player', 'Nobody') == 0
+    assert index.last_used('Coach', 'Coach A') == '2025-08-01'
+    assert index.last_used('Type', 'Combined') is None
+
+
+def test_options_among_a_roster():
+    assert vocabulary(ROWS).options('Player', 'Most Used', among=['Bea', 'Dee', 'Cal']) == ['Cal', 'Bea', 'Dee']
+
+
+def test_add_and_remove_match_a_rebuild():
+    index = vocabulary(ROWS)
+    added = [entry('Dee', '2025-08-04', 'Combined', 'Crossing', 'Coach C'), entry('Ada', '2025-08-05')]
+    for row in added:
+        index.add(row)
+    index.remove(ROWS[2])
+    index.remove(ROWS[3])
+    rows = [row for row in ROWS if row not in (ROWS[2], ROWS[3])] + added
+    rebuilt = vocabulary(rows)
+    assert index.usage == rebuilt.usage
+    for field in VOCABULARY_FIELDS:
+        for order in ['Alphabetical', 'Most Used', 'Most Recent']:
+            assert index.options(field, order) == expected_options(rows, field, order)